@@ -1,4 +1,8 @@
 import argparse
+import os
+import signal
+
+import waitress
 from flask import (
     Flask,
     request as flask_request,
@@ -15,8 +19,10 @@ from consts import (
     FILE_LOG_LEVEL,
     FLASK_ADDRESS,
     FLASK_PORT,
+    CONFIG_CACHE_DIR,
+    CONFIG_CACHE_FILE,
 )
-from modules.config_parser import Config
+from modules.config_reloader import ConfigReloader
 from modules.errors import determine_exit_code
 from modules.webhooks.webhook_processor import WebhookProcessor
 
@@ -37,7 +43,8 @@ logging.init(app_name=APP_NAME,
              log_file_dir=args.log,
              file_log_level=FILE_LOG_LEVEL)
 
-_config = Config(app_name=APP_NAME, config_path=f"{args.config}")
+_config_reloader = ConfigReloader(app_name=APP_NAME, config_path=f"{args.config}",
+                                  cache_file_path=os.path.join(CONFIG_CACHE_DIR, CONFIG_CACHE_FILE))
 
 
 def run_with_potential_exit_on_error(func):
@@ -52,26 +59,76 @@ def run_with_potential_exit_on_error(func):
 
     return wrapper
 
-@run_with_potential_exit_on_error
-def start_webhooks_server(config: Config) -> None:
+def create_app(config_reloader: ConfigReloader, renders_dir: str, logs_dir: str) -> Flask:
+    """
+    Create the webhooks WSGI application.
+
+    :param config_reloader: Holds the active config, requests read it when they arrive.
+    :param renders_dir: The directory to render pre-rolls in.
+    :param logs_dir: The directory the run loop writes its last run file to.
+    :return: The Flask application.
+    """
     api = Flask(APP_NAME)
+    # Requests read the active config when they arrive, in-flight requests keep the config they started with
 
     @api.route('/ping', methods=['GET'])
     def ping():
-        return WebhookProcessor.process_ping(request=flask_request, config=config)
+        return WebhookProcessor.process_ping(request=flask_request, config=config_reloader.config)
 
     @api.route('/recently-added', methods=['POST'])
     def recently_added():
+        config = config_reloader.config
         if not config.advanced.auto_generation.recently_added.enabled:
             return 'Recently added preroll generation is disabled', 200
-        return WebhookProcessor.process_recently_added(request=flask_request, config=config, output_dir=args.renders)
+        return WebhookProcessor.process_recently_added(request=flask_request, config=config, output_dir=renders_dir)
+
+    @api.route('/recently-added/stats', methods=['GET'])
+    def recently_added_stats():
+        return WebhookProcessor.process_recently_added_stats()
+
+    @api.route('/render-status', methods=['GET'])
+    def render_status():
+        return WebhookProcessor.process_render_status()
 
     @api.route('/last-run-within', methods=['GET'])
     def last_run_within():
-        return WebhookProcessor.process_last_run_within(request=flask_request, logs_folder=args.log)
+        return WebhookProcessor.process_last_run_within(request=flask_request, logs_folder=logs_dir)
+
+    return api
+
+
+def _raise_system_exit(signal_number, frame):
+    # The server stops accepting requests and finishes the ones in progress on SystemExit, as it does for Ctrl+C
+    raise SystemExit(0)
+
+
+@run_with_potential_exit_on_error
+def start_webhooks_server(config_reloader: ConfigReloader) -> None:
+    config_reloader.start()
+    WebhookProcessor.init_render_jobs(config=config_reloader.config, output_dir=args.renders)
+
+    api = create_app(config_reloader=config_reloader, renders_dir=args.renders, logs_dir=args.log)
+
+    # Server settings only apply at startup, unlike the rest of the config
+    server_config = config_reloader.config.advanced.webhook_server
+    server = waitress.create_server(api,
+                                    host=FLASK_ADDRESS,
+                                    port=FLASK_PORT,
+                                    threads=server_config.threads,
+                                    connection_limit=server_config.connection_limit,
+                                    channel_timeout=server_config.channel_timeout,
+                                    ident=APP_NAME)
+    signal.signal(signal.SIGTERM, _raise_system_exit)
 
-    api.run(host=FLASK_ADDRESS, port=FLASK_PORT, debug=True, use_reloader=False)
+    logging.info(f"Listening for webhooks on {FLASK_ADDRESS}:{FLASK_PORT} with {server_config.threads} threads")
+    try:
+        server.run()  # Returns once stopped by SIGINT or SIGTERM
+    finally:
+        logging.info("Shutting down webhook server...")
+        server.close()
+        config_reloader.stop()
+        WebhookProcessor.shutdown_render_jobs(timeout=server_config.shutdown_timeout)
 
 
 if __name__ == "__main__":
-    start_webhooks_server(config=_config)
+    start_webhooks_server(config_reloader=_config_reloader)
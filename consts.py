@@ -1,9 +1,17 @@
+import os
+import tempfile
+
 APP_NAME = "Plex Prerolls"
 APP_DESCRIPTION = "A tool to manage prerolls for Plex"
 DEFAULT_CONFIG_PATH = "config.yaml"
 DEFAULT_LOG_DIR = "logs/"
 LAST_RUN_CHECK_FILE = "last_run.txt"  # Should be in the logs directory
+HOLIDAYS_CACHE_FILE = "holidays_cache.json"  # Should be in the logs directory
+# Loading the compiled config cache can run code, so it is kept out of the user-mounted volumes
+CONFIG_CACHE_DIR = os.path.join(tempfile.gettempdir(), "plex_prerolls")
+CONFIG_CACHE_FILE = "config_cache.pickle"  # Should be in the config cache directory
 DEFAULT_RENDERS_DIR = "renders"
+RENDER_JOBS_DATABASE_FILE = "render_jobs.db"  # Should be in the renders directory
 ASSETS_DIR = "assets"
 AUTO_GENERATED_PREROLLS_DIR = "/auto_rolls"
 AUTO_GENERATED_RECENTLY_ADDED_PREROLL_PREFIX = "recently-added-preroll"
@@ -11,3 +19,4 @@ CONSOLE_LOG_LEVEL = "INFO"
 FILE_LOG_LEVEL = "DEBUG"
 FLASK_ADDRESS = "0.0.0.0"
 FLASK_PORT = 8283
+WEBHOOK_MAX_BODY_SIZE = 10 * 1024 * 1024  # In bytes, well above the payload and thumbnail Plex sends
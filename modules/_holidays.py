@@ -1,4 +1,8 @@
+import json
+import os
+import threading
 from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
 
 import modules.logs as logging
 
@@ -25,6 +29,172 @@ def _get_country_from_alpha2(alpha2: str, year: int, subdivision: str = None) ->
     return country
 
 
+def _build_holiday_index(country_instance: HolidayBase) -> Dict[str, List[date]]:
+    """
+    Build a lowercase holiday name to sorted dates index for a country-year.
+
+    :param country_instance: The HolidayBase instance to index.
+    :return: A dictionary of lowercase holiday names to the sorted dates they occur on.
+    """
+    index: Dict[str, List[date]] = {}
+    for holiday_date in country_instance:
+        # Multiple holidays on the same date are combined into a single name, split them back out
+        for name in country_instance.get_list(holiday_date):
+            index.setdefault(name.lower(), []).append(holiday_date)
+
+    return {name: sorted(dates) for name, dates in index.items()}
+
+
+class HolidayResolver:
+    """
+    Resolves holiday names to dates, memoized in-process and optionally cached on disk.
+
+    Holiday dates for a given country, subdivision, name and year never change for a given version of the holidays
+    package, so the on-disk cache is discarded whenever the package version changes.
+
+    The disk cache is written shortly after new dates are resolved, once for all dates resolved in the meantime, e.g.
+    all holidays of all schedules when the config is loaded.
+    """
+
+    def __init__(self, cache_file_path: str = None, save_delay_seconds: float = 1):
+        """
+        :param cache_file_path: The path to the disk cache file, no disk cache if not provided.
+        :param save_delay_seconds: How long to wait after the first newly resolved dates before writing the disk cache.
+        """
+        self._cache_file_path = cache_file_path
+        self._save_delay_seconds = save_delay_seconds
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Serializes writes, separate so resolving never waits on file I/O
+        self._unsaved = False
+        self._save_scheduled = False
+        self._indexes: Dict[Tuple[str, Optional[str], int], Optional[Dict[str, List[date]]]] = {}
+        self._dates: Dict[str, List[date]] = self._load_disk_cache()
+
+    def _load_disk_cache(self) -> Dict[str, List[date]]:
+        if not self._cache_file_path or not os.path.exists(self._cache_file_path):
+            return {}
+
+        try:
+            with open(self._cache_file_path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read holiday cache file {self._cache_file_path}: {e}")
+            return {}
+
+        if data.get("holidays_version") != holidays.__version__:
+            logging.debug("Holiday cache was built with a different holidays version, ignoring it")
+            return {}
+
+        return {key: [date.fromisoformat(value) for value in values]
+                for key, values in data.get("dates", {}).items()}
+
+    def _schedule_save(self):
+        # Called with the lock held
+        self._unsaved = True
+        if not self._cache_file_path or self._save_scheduled:
+            return
+
+        self._save_scheduled = True
+        timer = threading.Timer(interval=self._save_delay_seconds, function=self.save)
+        timer.daemon = True
+        timer.start()
+
+    def save(self):
+        """
+        Write any newly resolved dates to the disk cache now.
+        """
+        if not self._cache_file_path:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                self._save_scheduled = False
+                if not self._unsaved:
+                    return
+                self._unsaved = False
+                dates = dict(self._dates)
+
+            self._write_disk_cache(dates=dates)
+
+    def _write_disk_cache(self, dates: Dict[str, List[date]]):
+        data = {
+            "holidays_version": holidays.__version__,
+            "dates": {key: [value.isoformat() for value in values] for key, values in dates.items()},
+        }
+
+        try:
+            temporary_file_path = f"{self._cache_file_path}.tmp"
+            with open(temporary_file_path, 'w') as file:
+                json.dump(data, file)
+            os.replace(temporary_file_path, self._cache_file_path)
+        except OSError as e:
+            logging.warning(f"Could not write holiday cache file {self._cache_file_path}: {e}")
+
+    def _get_index(self, country_alpha2: str, year: int,
+                   country_subdivision: str = None) -> Optional[Dict[str, List[date]]]:
+        key = (country_alpha2, country_subdivision or None, year)
+        if key not in self._indexes:
+            country_instance = _get_country_from_alpha2(alpha2=country_alpha2, year=year,
+                                                        subdivision=country_subdivision)
+            self._indexes[key] = _build_holiday_index(country_instance=country_instance) if country_instance else None
+
+        return self._indexes[key]
+
+    def get_dates(self,
+                  country_alpha2: str,
+                  holiday_name: str,
+                  year: int,
+                  country_subdivision: str = None,
+                  name_match_exact: bool = False) -> List[date]:
+        """
+        Get the date(s) of a holiday by its name for a specific country and year.
+
+        :param country_alpha2: The ISO 3166-1 alpha-2 country code.
+        :param holiday_name: The name of the holiday to look for (case-insensitive).
+        :param year: The year to search for the holiday.
+        :param country_subdivision: The subdivision code (e.g., state or province) if applicable.
+        :param name_match_exact: If True, matches the holiday name exactly; otherwise, allows partial matches.
+        :return: A sorted list of dates when the holiday occurs in the specified year, or an empty list if not found.
+        """
+        key = "|".join([country_alpha2, country_subdivision or "", holiday_name.lower(), str(year),
+                        "exact" if name_match_exact else "contains"])
+
+        with self._lock:
+            if key in self._dates:
+                return list(self._dates[key])
+
+            index = self._get_index(country_alpha2=country_alpha2, year=year,
+                                    country_subdivision=country_subdivision)
+            if index is None:
+                return []  # Invalid country or subdivision, error has already been logged
+
+            name = holiday_name.lower()
+            if name_match_exact:
+                dates = index.get(name, [])
+            else:
+                dates = sorted({holiday_date
+                                for indexed_name, indexed_dates in index.items() if name in indexed_name
+                                for holiday_date in indexed_dates})
+
+            self._dates[key] = dates
+            self._schedule_save()
+
+            return list(dates)
+
+
+_resolver = HolidayResolver()
+
+
+def init_cache(cache_file_path: str):
+    """
+    Persist resolved holiday dates to a file, so they do not need to be recalculated after a restart.
+
+    :param cache_file_path: The path to the cache file.
+    """
+    global _resolver
+    _resolver = HolidayResolver(cache_file_path=cache_file_path)
+
+
 # https://holidays.readthedocs.io/en/latest/examples/#date-from-holiday-name
 def get_date_from_holiday_name(country_alpha2: str,
                                holiday_name: str,
@@ -41,11 +211,8 @@ def get_date_from_holiday_name(country_alpha2: str,
     :param name_match_exact: If True, matches the holiday name exactly; otherwise, allows partial matches.
     :return: A sorted list of dates when the holiday occurs in the specified year, or an empty list if not found.
     """
-    year = year or datetime.now().year
-    country_instance = _get_country_from_alpha2(alpha2=country_alpha2, year=year, subdivision=country_subdivision)
-    if not country_instance:
-        return []
-
-    dates = country_instance.get_named(holiday_name=holiday_name, lookup="iexact" if name_match_exact else "icontains")
-
-    return sorted(dates)
+    return _resolver.get_dates(country_alpha2=country_alpha2,
+                               holiday_name=holiday_name,
+                               year=year or datetime.now().year,
+                               country_subdivision=country_subdivision,
+                               name_match_exact=name_match_exact)
@@ -1,286 +1,302 @@
+import hashlib
 import json
 import os
-from typing import List, Union
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional, Tuple, Union
 
 import confuse
-import yaml
 
 import modules.files as files
 import modules.logs as logging
+import modules.recurrence as recurrence_module
+from modules.recurrence import DateRangeRecurrence, compile_date_range
 from consts import AUTO_GENERATED_PREROLLS_DIR, AUTO_GENERATED_RECENTLY_ADDED_PREROLL_PREFIX
 
+# The config is compiled once into the frozen dataclasses below, so reading a setting is a plain attribute access.
+# Each class is built from the raw (already parsed) YAML data, validating values as it goes.
 
-class YAMLElement:
-    def __init__(self, data):
-        self.data = data
+_MISSING = object()
 
-    def _get_value(self, key: str, default=None):
-        try:
-            return self.data[key].get()
-        except confuse.NotFoundError:
-            return default
-        except Exception:
-            try:
-                return self.data[key]
-            except Exception:
-                return default
-
-
-class ConfigSection(YAMLElement):
-    def __init__(self, section_key: str, data, parent_key: str = None):
-        self.section_key = section_key
-        try:
-            data = data[self.section_key]
-        except confuse.NotFoundError:
-            pass
-        self._parent_key = parent_key
-        super().__init__(data=data)
-
-    @property
-    def full_key(self):
-        if self._parent_key is None:
-            return self.section_key
-        return f"{self._parent_key}_{self.section_key}".upper()
-
-    def _get_subsection(self, key: str, default=None):
-        try:
-            return ConfigSection(section_key=key, parent_key=self.full_key, data=self.data)
-        except confuse.NotFoundError:
-            return default
-
-
-class FloatingHolidayConfig(YAMLElement):
-    def __init__(self, data):
-        super().__init__(data=data)
-
-    @property
-    def name(self) -> str:
-        return self._get_value(key="name", default=None)
-
-    @property
-    def country(self) -> str:
-        return self._get_value(key="country", default=None)
-
-    @property
-    def subdivision(self) -> str:
-        return self._get_value(key="subdivision", default=None)
 
-    @property
-    def offset_start(self) -> int:
-        return self._get_value(key="offset_start", default=0)
+def _freeze(instance, **values):
+    # Frozen dataclasses can only be populated by bypassing their __setattr__
+    for name, value in values.items():
+        object.__setattr__(instance, name, value)
 
-    @property
-    def offset_end(self) -> int:
-        return self._get_value(key="offset_end", default=0)
 
-    def __repr__(self):
-        return (f"FloatingHolidayConfig(name={self.name}, country={self.country}, "
-                f"subdivision={self.subdivision}, offset_start={self.offset_start}, "
-                f"offset_end={self.offset_end})")
+def _subsection(data: Optional[dict], key: str) -> dict:
+    value = (data or {}).get(key)
+    return value if isinstance(value, dict) else {}
 
 
-class PathGlobbingPairConfig(YAMLElement):
-    def __init__(self, data):
-        super().__init__(data=data)
+def _value(data: Optional[dict], key: str, default, expected_type, path: str):
+    """
+    Get and validate a value from raw config data.
 
-    @property
-    def local_root_folder(self) -> str:
-        return self._get_value(key="root_path", default="/")
+    :param data: The raw config data.
+    :param key: The key of the value.
+    :param default: The value to use if the key is missing or empty.
+    :param expected_type: The type (or tuple of types) the value must be.
+    :param path: The location of the data in the config file, for error messages.
+    :return: The value, or the default.
+    """
+    value = (data or {}).get(key, _MISSING)
+    if value is _MISSING or value is None:
+        return default
 
-    @property
-    def remote_root_folder(self) -> str:
-        return self._get_value(key="plex_path", default="/")
+    expected_types = expected_type if isinstance(expected_type, tuple) else (expected_type,)
+    # bool is a subclass of int, but "weight: true" is not a valid weight
+    if not isinstance(value, expected_types) or (isinstance(value, bool) and bool not in expected_types):
+        raise ValueError(f"Invalid config value for '{path}.{key}': {value!r}")
 
-    @property
-    def patterns(self) -> List[str]:
-        return self._get_value(key="patterns", default=[])
+    return value
 
-    def __repr__(self):
-        return (f"PathGlobbingPairConfig(local_root_folder={self.local_root_folder}, "
-                f"remote_root_folder={self.remote_root_folder}, "
-                f"patterns={self.patterns})")
 
+def _positive_integer(data: Optional[dict], key: str, default: Optional[int], path: str) -> Optional[int]:
+    value = _value(data=data, key=key, default=default, expected_type=int, path=path)
+    if value is not None and value < 1:
+        raise ValueError(f"Invalid config value for '{path}.{key}': {value!r} (must be at least 1)")
+    return value
 
-class PathGlobbingConfig(YAMLElement):
-    def __init__(self, data):
-        super().__init__(data=data)
 
-    @property
-    def enabled(self) -> bool:
-        return self._get_value(key="enabled", default=False)
+def _strings(data: Optional[dict], key: str, path: str) -> Tuple[str, ...]:
+    values = _value(data=data, key=key, default=[], expected_type=list, path=path)
+    for value in values:
+        if not isinstance(value, str):
+            raise ValueError(f"Invalid config value for '{path}.{key}': {value!r}")
+    return tuple(values)
 
-    @property
-    def pairs(self) -> List[PathGlobbingPairConfig]:
-        data = self._get_value(key="pairs", default=[])
-        return [PathGlobbingPairConfig(data=d) for d in data]
 
-    def __repr__(self):
-        return f"PathGlobbingConfig(enabled={self.enabled}, pairs={self.pairs})"
+@dataclass(frozen=True, slots=True, init=False)
+class FloatingHolidayConfig:
+    name: Optional[str]
+    country: Optional[str]
+    subdivision: Optional[str]
+    offset_start: int
+    offset_end: int
 
+    def __init__(self, data: dict, path: str = "holiday"):
+        _freeze(self,
+                name=_value(data=data, key="name", default=None, expected_type=str, path=path),
+                country=_value(data=data, key="country", default=None, expected_type=str, path=path),
+                subdivision=_value(data=data, key="subdivision", default=None, expected_type=str, path=path),
+                offset_start=_value(data=data, key="offset_start", default=0, expected_type=int, path=path),
+                offset_end=_value(data=data, key="offset_end", default=0, expected_type=int, path=path))
 
-class Entry(YAMLElement):
-    def __init__(self, data):
-        super().__init__(data)
-        self.data = data
 
-    def all_paths(self, advanced_settings: 'AdvancedConfig' = None) -> List[str]:
-        paths = []
-        paths.extend(self.remote_paths)
-
-        if not self.path_globbing or not self.path_globbing.enabled:
-            return paths
-
-        for pair in self.path_globbing.pairs:
-            local_files_root = pair.local_root_folder
-            remote_files_root = pair.remote_root_folder
-            for pattern in pair.patterns:
-                local_files = files.get_all_files_matching_glob_pattern(directory=local_files_root, pattern=pattern)
-                for local_file in local_files:
-                    remote_file = files.translate_local_path_to_remote_path(local_path=local_file,
-                                                                            local_root_folder=local_files_root,
-                                                                            remote_root_folder=remote_files_root)
-                    paths.append(remote_file)
+@dataclass(frozen=True, slots=True, init=False)
+class PathGlobbingPairConfig:
+    local_root_folder: str
+    remote_root_folder: str
+    patterns: Tuple[str, ...]
 
-        return paths
+    def __init__(self, data: dict, path: str = "pairs"):
+        _freeze(self,
+                local_root_folder=_value(data=data, key="root_path", default="/", expected_type=str, path=path),
+                remote_root_folder=_value(data=data, key="plex_path", default="/", expected_type=str, path=path),
+                patterns=_strings(data=data, key="patterns", path=path))
 
-    @property
-    def remote_paths(self) -> List[str]:
-        return self._get_value(key="paths", default=[])
 
-    @property
-    def path_globbing(self) -> PathGlobbingConfig:
-        data = self._get_value(key="path_globbing", default={})
-        return PathGlobbingConfig(data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class PathGlobbingConfig:
+    enabled: bool
+    pairs: Tuple[PathGlobbingPairConfig, ...]
 
-    @property
-    def weight(self) -> int:
-        return self._get_value(key="weight", default=1)
+    def __init__(self, data: dict, path: str = "path_globbing"):
+        pairs = _value(data=data, key="pairs", default=[], expected_type=list, path=path)
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                pairs=tuple(PathGlobbingPairConfig(data=d, path=f"{path}.pairs[{i}]") for i, d in enumerate(pairs)))
 
     @property
-    def disable_always(self) -> bool:
-        return self._get_value(key="disable_always", default=False)
-
-
-class NumericalEntry(Entry):
-    def __init__(self, data):
-        super().__init__(data)
+    def local_root_folders(self) -> List[str]:
+        if not self.enabled:
+            return []
+        return [pair.local_root_folder for pair in self.pairs]
 
-    @property
-    def number(self) -> int:
-        return self._get_value(key="number", default=None)
 
+def _resolve_paths(remote_paths: Tuple[str, ...], path_globbing: PathGlobbingConfig,
+                   glob_cache: files.GlobCache = None) -> List[str]:
+    """
+    Combine explicit remote paths with the Plex-aware paths of all files matched by the path globbing pairs.
 
-class DateRangeEntry(Entry):
-    def __init__(self, data):
-        super().__init__(data=data)
+    :param remote_paths: The explicit remote paths.
+    :param path_globbing: The path globbing configuration.
+    :param glob_cache: An optional per-run memo of glob results, shared across sections.
+    :return: The list of remote paths.
+    """
+    paths = []
+    paths.extend(remote_paths)
 
-    @property
-    def name(self) -> str:
-        return self._get_value(key="name", default=None)
+    if not path_globbing or not path_globbing.enabled:
+        return paths
 
-    @property
-    def start_date(self) -> str:
-        return self._get_value(key="start_date", default=None)
+    glob_cache = glob_cache or files.GlobCache()
 
-    @property
-    def end_date(self) -> str:
-        return self._get_value(key="end_date", default=None)
+    for pair in path_globbing.pairs:
+        local_files_root = pair.local_root_folder
+        remote_files_root = pair.remote_root_folder
+        for pattern in pair.patterns:
+            local_files = glob_cache.get_all_files_matching_glob_pattern(directory=local_files_root, pattern=pattern)
+            for local_file in local_files:
+                remote_file = files.translate_local_path_to_remote_path(local_path=local_file,
+                                                                        local_root_folder=local_files_root,
+                                                                        remote_root_folder=remote_files_root)
+                paths.append(remote_file)
 
-    @property
-    def holiday(self) -> FloatingHolidayConfig:
-        data = self._get_value(key="holiday", default={})
-        return FloatingHolidayConfig(data=data)
+    return paths
 
-    def __repr__(self):
-        return (f"DateRangeEntry(start_date={self.start_date}, end_date={self.end_date}, holiday={self.holiday}, "
-                f"remote_paths={self.remote_paths}, path_globbing={self.path_globbing}, weight={self.weight})")
 
+@dataclass(frozen=True, slots=True, init=False)
+class Entry:
+    remote_paths: Tuple[str, ...]
+    path_globbing: PathGlobbingConfig
+    weight: int
+    disable_always: bool
 
-class WeekEntry(NumericalEntry):
-    def __init__(self, data):
-        super().__init__(data=data)
+    def __init__(self, data: dict, path: str):
+        _freeze(self,
+                remote_paths=_strings(data=data, key="paths", path=path),
+                path_globbing=PathGlobbingConfig(data=_subsection(data=data, key="path_globbing"),
+                                                 path=f"{path}.path_globbing"),
+                weight=_positive_integer(data=data, key="weight", default=1, path=path),
+                disable_always=_value(data=data, key="disable_always", default=False, expected_type=bool, path=path))
 
-    def __repr__(self):
-        return (f"WeekEntry(number={self.number}, remote_paths={self.remote_paths}, "
-                f"path_globbing={self.path_globbing}, weight={self.weight})")
+    def all_paths(self, advanced_settings: 'AdvancedConfig' = None, glob_cache: files.GlobCache = None) -> List[str]:
+        return _resolve_paths(remote_paths=self.remote_paths, path_globbing=self.path_globbing, glob_cache=glob_cache)
 
 
-class MonthEntry(NumericalEntry):
-    def __init__(self, data):
-        super().__init__(data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class NumericalEntry(Entry):
+    number: int
 
-    def __repr__(self):
-        return (f"MonthEntry(number={self.number}, remote_paths={self.remote_paths}, "
-                f"path_globbing={self.path_globbing}, weight={self.weight})")
+    def __init__(self, data: dict, path: str, maximum: int):
+        # Zero-argument super() does not work in slotted dataclasses, call the parent explicitly
+        Entry.__init__(self, data=data, path=path)
+        number = _positive_integer(data=data, key="number", default=None, path=path)
+        if number is None or number > maximum:
+            raise ValueError(f"Invalid config value for '{path}.number': {number!r} (must be between 1 and {maximum})")
+        _freeze(self, number=number)
 
 
-class RunConfig(ConfigSection):
-    def __init__(self, data):
-        super().__init__(section_key="run", data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class DateRangeEntry(Entry):
+    name: Optional[str]
+    start_date: Union[str, date, None]
+    end_date: Union[str, date, None]
+    holiday: FloatingHolidayConfig
+    recurrence: Optional[DateRangeRecurrence] = field(compare=False, repr=False)  # Derived from the dates
 
-    @property
-    def schedule(self) -> str:
-        return self._get_value(key="schedule", default="0 0 * * *")
+    def __init__(self, data: dict, path: str = "date_range.ranges"):
+        Entry.__init__(self, data=data, path=path)
+        name = _value(data=data, key="name", default=None, expected_type=str, path=path)
+        start_date = _value(data=data, key="start_date", default=None, expected_type=(str, date), path=path)
+        end_date = _value(data=data, key="end_date", default=None, expected_type=(str, date), path=path)
+        holiday = FloatingHolidayConfig(data=_subsection(data=data, key="holiday"), path=f"{path}.holiday")
 
-    @property
-    def dry_run(self) -> bool:
-        return self._get_value(key="dry_run", default=False)
+        # Compile the (possibly wildcard) date range once, floating holidays are resolved separately
+        recurrence = None
+        if not holiday.name or not holiday.country:
+            recurrence = compile_date_range(start_date=start_date, end_date=end_date, name=name)
 
+        _freeze(self, name=name, start_date=start_date, end_date=end_date, holiday=holiday, recurrence=recurrence)
 
-class PlexServerConfig(ConfigSection):
-    def __init__(self, data):
-        super().__init__(section_key="plex", data=data)
 
-    @property
-    def url(self) -> str:
-        return self._get_value(key="url", default="")
+@dataclass(frozen=True, slots=True, init=False)
+class WeekEntry(NumericalEntry):
+    def __init__(self, data: dict, path: str = "weekly.weeks"):
+        NumericalEntry.__init__(self, data=data, path=path, maximum=53)
 
-    @property
-    def token(self) -> str:
-        return self._get_value(key="token", default="")
 
-    @property
-    def port(self) -> Union[int, None]:
-        port = self._get_value(key="port", default=None)
+@dataclass(frozen=True, slots=True, init=False)
+class MonthEntry(NumericalEntry):
+    def __init__(self, data: dict, path: str = "monthly.months"):
+        NumericalEntry.__init__(self, data=data, path=path, maximum=12)
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class RunConfig:
+    schedule: str
+    dry_run: bool
+    update_on_schedule_change: bool
+
+    def __init__(self, data: dict, path: str = "run"):
+        _freeze(self,
+                schedule=_value(data=data, key="schedule", default="0 0 * * *", expected_type=str, path=path),
+                dry_run=_value(data=data, key="dry_run", default=False, expected_type=bool, path=path),
+                update_on_schedule_change=_value(data=data, key="update_on_schedule_change", default=False,
+                                                 expected_type=bool, path=path))
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class PlexServerConfig:
+    url: str
+    token: str
+    port: Optional[int]
+    max_pre_roll_length: int  # In bytes, 0 for no limit
+    connection_pool_size: int
+
+    def __init__(self, data: dict, path: str = "plex"):
+        url = _value(data=data, key="url", default="", expected_type=str, path=path)
+        port = _value(data=data, key="port", default=None, expected_type=int, path=path)
         if not port:
             # Try to parse the port from the URL
-            if self.url.startswith("http://"):
+            if url.startswith("http://"):
                 port = 80
-            elif self.url.startswith("https://"):
+            elif url.startswith("https://"):
                 port = 443
 
-        return port
-
-
-class RecentlyAddedAutoGenerationConfig(ConfigSection):
-    def __init__(self, data, parent: 'AutoGenerationConfig'):
-        self._parent = parent
-        super().__init__(section_key="recently_added", data=data)
-
-    @property
-    def enabled(self) -> bool:
-        return self._get_value(key="enabled", default=False)
-
-    @property
-    def count(self) -> int:
-        return self._get_value(key="count", default=10)
-
-    @property
-    def remote_files_root(self) -> str:
-        # The Plex-aware equivalent of the local (internal) path where auto-generated prerolls will be stored
-        return f"{self._parent.remote_path_root}/Recently Added"
-
-    @property
-    def local_files_root(self) -> str:
-        # The local (internal) path where auto-generated prerolls will be stored
-        return f"{self._parent.local_path_root}/Recently Added"
-
-    # Double inheritance doesn't work well with conflicting "data" properties, just re-implement these two functions.
-    def all_paths(self, advanced_settings: 'AdvancedConfig' = None) -> List[str]:
+        max_pre_roll_length = _value(data=data, key="max_pre_roll_length", default=0, expected_type=int, path=path)
+        if max_pre_roll_length < 0:
+            raise ValueError(f"Invalid config value for '{path}.max_pre_roll_length': {max_pre_roll_length!r}")
+
+        _freeze(self,
+                url=url,
+                token=_value(data=data, key="token", default="", expected_type=str, path=path),
+                port=port,
+                max_pre_roll_length=max_pre_roll_length,
+                connection_pool_size=_positive_integer(data=data, key="connection_pool_size", default=10, path=path))
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class RecentlyAddedAutoGenerationConfig:
+    enabled: bool
+    count: int
+    remote_files_root: str  # The Plex-aware equivalent of local_files_root
+    local_files_root: str  # The local (internal) path where auto-generated prerolls will be stored
+    excluded_libraries: Tuple[str, ...]
+    trailer_cutoff_year: int
+    render_workers: int
+    max_queued_renders: int
+
+    def __init__(self, data: dict, remote_path_root: str, local_path_root: str,
+                 path: str = "advanced.auto_generation.recently_added"):
+        excluded_libraries = _value(data=data, key="excluded_libraries", default=[], expected_type=(str, list),
+                                    path=path)
+        # Ensure it's a list even if someone types a comma-separated string
+        if isinstance(excluded_libraries, str):
+            excluded_libraries = excluded_libraries.split(',')
+
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                count=_positive_integer(data=data, key="count", default=10, path=path),
+                remote_files_root=f"{remote_path_root}/Recently Added",
+                local_files_root=f"{local_path_root}/Recently Added",
+                excluded_libraries=tuple(str(lib).strip().lower() for lib in excluded_libraries if str(lib).strip()),
+                trailer_cutoff_year=_positive_integer(data=data, key="trailer_cutoff_year", default=1980,
+                                                      path=path),
+                render_workers=_positive_integer(data=data, key="render_workers", default=1, path=path),
+                max_queued_renders=_positive_integer(data=data, key="max_queued_renders", default=50, path=path))
+
+    def all_paths(self, advanced_settings: 'AdvancedConfig' = None, glob_cache: files.GlobCache = None) -> List[str]:
         paths = []
 
-        local_files = files.get_all_files_matching_glob_pattern(directory=self.local_files_root,
-                                                                pattern=f"{AUTO_GENERATED_RECENTLY_ADDED_PREROLL_PREFIX}*")
+        glob_cache = glob_cache or files.GlobCache()
+        local_files = glob_cache.get_all_files_matching_glob_pattern(
+            directory=self.local_files_root, pattern=f"{AUTO_GENERATED_RECENTLY_ADDED_PREROLL_PREFIX}*")
         for local_file in local_files:
             remote_file = files.translate_local_path_to_remote_path(local_path=local_file,
                                                                     local_root_folder=self.local_files_root,
@@ -289,185 +305,322 @@ class RecentlyAddedAutoGenerationConfig(ConfigSection):
 
         return paths
 
-    @property
-    def excluded_libraries(self) -> List[str]:
-        raw = self._get_value(key="excluded_libraries", default=[])
-        # Ensure it's a list even if someone types a comma-separated string
-        if isinstance(raw, str):
-            return [lib.strip().lower() for lib in raw.split(',') if lib.strip()]
-        elif isinstance(raw, list):
-            return [lib.strip().lower() for lib in raw]
-        else:
-            return []
-
-    @property
-    def trailer_cutoff_year(self) -> int:
-        return self._get_value(key="trailer_cutoff_year", default=1980)
-
 
-class AutoGenerationConfig(ConfigSection):
-    def __init__(self, data):
-        super().__init__(section_key="auto_generation", data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class AutoGenerationConfig:
+    remote_path_root: str  # The Plex-aware equivalent of local_path_root
+    local_path_root: str  # The local (internal) path where auto-generated prerolls will be stored
+    recently_added: RecentlyAddedAutoGenerationConfig
 
-    @property
-    def remote_path_root(self) -> str:
-        # The Plex-aware equivalent of the local (internal) path where auto-generated prerolls will be stored
-        return self._get_value(key="plex_path", default=self.local_path_root)
-
-    @property
-    def local_path_root(self) -> str:
-        # The local (internal) path where auto-generated prerolls will be stored
-        return AUTO_GENERATED_PREROLLS_DIR
+    def __init__(self, data: dict, path: str = "advanced.auto_generation"):
+        local_path_root = AUTO_GENERATED_PREROLLS_DIR
+        remote_path_root = _value(data=data, key="plex_path", default=local_path_root, expected_type=str, path=path)
+        _freeze(self,
+                remote_path_root=remote_path_root,
+                local_path_root=local_path_root,
+                recently_added=RecentlyAddedAutoGenerationConfig(data=_subsection(data=data, key="recently_added"),
+                                                                 remote_path_root=remote_path_root,
+                                                                 local_path_root=local_path_root,
+                                                                 path=f"{path}.recently_added"))
 
     @property
     def cookies_file(self) -> str:
+        # Not part of the snapshot, since the file can be added while the application is running
         cookies_file_path = "/config/yt_dlp_cookies.txt"
         return cookies_file_path if os.path.exists(cookies_file_path) else ""
 
-    @property
-    def recently_added(self) -> RecentlyAddedAutoGenerationConfig:
-        return RecentlyAddedAutoGenerationConfig(data=self.data, parent=self)
-
-
-class AdvancedConfig(ConfigSection):
-    def __init__(self, data):
-        super().__init__(section_key="advanced", data=data)
-
-    @property
-    def auto_generation(self) -> AutoGenerationConfig:
-        return AutoGenerationConfig(data=self.data)
-
-
-class ScheduleSection(ConfigSection):
-    def __init__(self, section_key: str, data):
-        super().__init__(section_key=section_key, data=data)
 
-    @property
-    def enabled(self) -> bool:
-        return self._get_value(key="enabled", default=False)
-
-
-class AlwaysSection(ScheduleSection):
-    def __init__(self, data):
-        super(ScheduleSection, self).__init__(section_key="always", data=data)
-
-    # Double inheritance doesn't work well with conflicting "data" properties, just re-implement these functions
-    def all_paths(self, advanced_settings: 'AdvancedConfig' = None) -> List[str]:
-        paths = []
-        paths.extend(self.remote_paths)
-
-        if not self.path_globbing or not self.path_globbing.enabled:
-            return paths
-
-        for pair in self.path_globbing.pairs:
-            local_files_root = pair.local_root_folder
-            remote_files_root = pair.remote_root_folder
-            for pattern in pair.patterns:
-                local_files = files.get_all_files_matching_glob_pattern(directory=local_files_root, pattern=pattern)
-                for local_file in local_files:
-                    remote_file = files.translate_local_path_to_remote_path(local_path=local_file,
-                                                                            local_root_folder=local_files_root,
-                                                                            remote_root_folder=remote_files_root)
-                    paths.append(remote_file)
-
-        return paths
-
-    @property
-    def remote_paths(self) -> List[str]:
-        return self._get_value(key="paths", default=[])
-
-    @property
-    def path_globbing(self) -> PathGlobbingConfig:
-        data = self._get_value(key="path_globbing", default={})
-        return PathGlobbingConfig(data=data)
-
-    @property
-    def weight(self) -> int:
-        return self._get_value(key="weight", default=1)
-
-    def random_count(self, advanced_settings: 'AdvancedConfig' = None) -> int:
-        return self._get_value(key="count", default=len(self.all_paths(advanced_settings=advanced_settings)))
-
-    def __repr__(self):
-        return (f"AlwaysSection(remote_paths={self.remote_paths}, path_globbing={self.path_globbing}, "
-                f"weight={self.weight}")
-
-
-class DateRangeSection(ScheduleSection):
-    def __init__(self, data):
-        super().__init__(section_key="date_range", data=data)
-
-    @property
-    def ranges(self) -> List[DateRangeEntry]:
-        data = self._get_value(key="ranges", default=[])
-        return [DateRangeEntry(data=d) for d in data]
+@dataclass(frozen=True, slots=True, init=False)
+class LibraryWatcherConfig:
+    enabled: bool
+    use_inotify: bool
+    poll_interval: int
+
+    def __init__(self, data: dict, path: str = "advanced.library_watcher"):
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                use_inotify=_value(data=data, key="use_inotify", default=True, expected_type=bool, path=path),
+                poll_interval=_positive_integer(data=data, key="poll_interval", default=30, path=path))
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class WebhookServerConfig:
+    threads: int
+    connection_limit: int
+    channel_timeout: int  # In seconds, how long an idle (e.g. kept-alive) connection stays open
+    shutdown_timeout: int  # In seconds, how long to wait for running renders when shutting down
+
+    def __init__(self, data: dict, path: str = "advanced.webhook_server"):
+        _freeze(self,
+                threads=_positive_integer(data=data, key="threads", default=4, path=path),
+                connection_limit=_positive_integer(data=data, key="connection_limit", default=100, path=path),
+                channel_timeout=_positive_integer(data=data, key="channel_timeout", default=30, path=path),
+                shutdown_timeout=_positive_integer(data=data, key="shutdown_timeout", default=60, path=path))
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class AdvancedConfig:
+    auto_generation: AutoGenerationConfig
+    library_watcher: LibraryWatcherConfig
+    webhook_server: WebhookServerConfig
+
+    def __init__(self, data: dict, path: str = "advanced"):
+        _freeze(self,
+                auto_generation=AutoGenerationConfig(data=_subsection(data=data, key="auto_generation"),
+                                                     path=f"{path}.auto_generation"),
+                library_watcher=LibraryWatcherConfig(data=_subsection(data=data, key="library_watcher"),
+                                                     path=f"{path}.library_watcher"),
+                webhook_server=WebhookServerConfig(data=_subsection(data=data, key="webhook_server"),
+                                                   path=f"{path}.webhook_server"))
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class AlwaysSection:
+    enabled: bool
+    remote_paths: Tuple[str, ...]
+    path_globbing: PathGlobbingConfig
+    weight: int
+    count: Optional[int]
+
+    def __init__(self, data: dict, path: str = "always"):
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                remote_paths=_strings(data=data, key="paths", path=path),
+                path_globbing=PathGlobbingConfig(data=_subsection(data=data, key="path_globbing"),
+                                                 path=f"{path}.path_globbing"),
+                weight=_positive_integer(data=data, key="weight", default=1, path=path),
+                count=_positive_integer(data=data, key="count", default=None, path=path))
+
+    def all_paths(self, advanced_settings: 'AdvancedConfig' = None, glob_cache: files.GlobCache = None) -> List[str]:
+        return _resolve_paths(remote_paths=self.remote_paths, path_globbing=self.path_globbing, glob_cache=glob_cache)
+
+    def random_count(self, advanced_settings: 'AdvancedConfig' = None, paths: List[str] = None) -> int:
+        """
+        Get the number of paths to randomly sample, defaulting to all of them.
+
+        :param advanced_settings: The advanced settings.
+        :param paths: The already-resolved paths for this section, to avoid resolving them again.
+        :return: The number of paths to sample.
+        """
+        if self.count is not None:
+            return self.count
+
+        if paths is None:
+            paths = self.all_paths(advanced_settings=advanced_settings)
+        return len(paths)
+
+
+@dataclass(frozen=True, slots=True, init=False)
+class DateRangeSection:
+    enabled: bool
+    ranges: Tuple[DateRangeEntry, ...]
+
+    def __init__(self, data: dict, path: str = "date_range"):
+        ranges = _value(data=data, key="ranges", default=[], expected_type=list, path=path)
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                ranges=tuple(DateRangeEntry(data=d, path=f"{path}.ranges[{i}]") for i, d in enumerate(ranges)))
 
     @property
     def range_count(self) -> int:
         return len(self.ranges)
 
 
-class WeeklySection(ScheduleSection):
-    def __init__(self, data):
-        super().__init__(section_key="weekly", data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class WeeklySection:
+    enabled: bool
+    weeks: Tuple[WeekEntry, ...]
 
-    @property
-    def weeks(self) -> List[WeekEntry]:
-        data = self._get_value(key="weeks", default=[])
-        return [WeekEntry(data=d) for d in data]
+    def __init__(self, data: dict, path: str = "weekly"):
+        weeks = _value(data=data, key="weeks", default=[], expected_type=list, path=path)
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                weeks=tuple(WeekEntry(data=d, path=f"{path}.weeks[{i}]") for i, d in enumerate(weeks)))
 
     @property
     def week_count(self) -> int:
         return len(self.weeks)
 
 
-class MonthlySection(ScheduleSection):
-    def __init__(self, data):
-        super().__init__(section_key="monthly", data=data)
+@dataclass(frozen=True, slots=True, init=False)
+class MonthlySection:
+    enabled: bool
+    months: Tuple[MonthEntry, ...]
 
-    @property
-    def months(self) -> List[MonthEntry]:
-        data = self._get_value(key="months", default=[])
-        return [MonthEntry(data=d) for d in data]
+    def __init__(self, data: dict, path: str = "monthly"):
+        months = _value(data=data, key="months", default=[], expected_type=list, path=path)
+        _freeze(self,
+                enabled=_value(data=data, key="enabled", default=False, expected_type=bool, path=path),
+                months=tuple(MonthEntry(data=d, path=f"{path}.months[{i}]") for i, d in enumerate(months)))
 
     @property
     def month_count(self) -> int:
         return len(self.months)
 
 
+@dataclass(frozen=True, slots=True, init=False)
+class ConfigSnapshot:
+    """
+    An immutable, validated copy of the whole config.
+    """
+    run: RunConfig
+    plex: PlexServerConfig
+    always: AlwaysSection
+    date_ranges: DateRangeSection
+    monthly: MonthlySection
+    weekly: WeeklySection
+    advanced: AdvancedConfig
+    source: str  # The raw config as JSON, for display
+
+    def __init__(self, data: dict):
+        _freeze(self,
+                run=RunConfig(data=_subsection(data=data, key="run")),
+                plex=PlexServerConfig(data=_subsection(data=data, key="plex")),
+                always=AlwaysSection(data=_subsection(data=data, key="always")),
+                date_ranges=DateRangeSection(data=_subsection(data=data, key="date_range")),
+                monthly=MonthlySection(data=_subsection(data=data, key="monthly")),
+                weekly=WeeklySection(data=_subsection(data=data, key="weekly")),
+                advanced=AdvancedConfig(data=_subsection(data=data, key="advanced")),
+                source=json.dumps(data, indent=4, default=str))
+
+
+def _snapshot_cache_key(config_file_contents: bytes) -> str:
+    # Any change to the config file, or to the code that compiles it, invalidates a cached snapshot
+    digest = hashlib.sha256(config_file_contents)
+    for module_file in (__file__, recurrence_module.__file__):
+        with open(module_file, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _is_private(path: str) -> bool:
+    # Only trust files that no other user can have written
+    if not hasattr(os, "getuid"):
+        return False
+    stat = os.stat(path)
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def _load_cached_snapshot(cache_file_path: str, cache_key: str) -> Optional[ConfigSnapshot]:
+    if not cache_file_path or not os.path.exists(cache_file_path):
+        return None
+
+    # noinspection PyBroadException
+    try:
+        if not _is_private(path=os.path.dirname(os.path.abspath(cache_file_path))) or \
+                not _is_private(path=cache_file_path):
+            logging.warning(f"Ignoring config cache file {cache_file_path}, it can be written by other users")
+            return None
+        with open(cache_file_path, 'rb') as file:
+            cached = pickle.load(file)
+    except Exception as e:  # pylint: disable=broad-except # a corrupt cache just means a full load
+        logging.warning(f"Could not read config cache file {cache_file_path}: {e}")
+        return None
+
+    if not isinstance(cached, dict) or cached.get("key") != cache_key:
+        return None
+
+    return cached.get("snapshot")
+
+
+def _save_cached_snapshot(cache_file_path: str, cache_key: str, snapshot: ConfigSnapshot):
+    if not cache_file_path:
+        return
+
+    cache_directory = os.path.dirname(os.path.abspath(cache_file_path))
+    temporary_file_path = None
+    try:
+        os.makedirs(cache_directory, mode=0o700, exist_ok=True)
+        # Each process writes its own temporary file, so processes saving at the same time cannot clobber each other
+        with tempfile.NamedTemporaryFile(dir=cache_directory, prefix=f"{os.path.basename(cache_file_path)}.",
+                                         suffix=".tmp", delete=False) as file:
+            temporary_file_path = file.name
+            pickle.dump({"key": cache_key, "snapshot": snapshot}, file)
+        os.replace(temporary_file_path, cache_file_path)
+    except OSError as e:
+        logging.warning(f"Could not write config cache file {cache_file_path}: {e}")
+        if temporary_file_path and os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
+
 class Config:
-    def __init__(self, app_name: str, config_path: str):
-        self.config = confuse.Configuration(app_name)
+    def __init__(self, app_name: str, config_path: str, cache_file_path: str = None):
+        """
+        :param app_name: The name of the application.
+        :param config_path: The path to the config file.
+        :param cache_file_path: Optional path to store the compiled config at, to speed up later loads of the same file.
+        """
+        try:
+            with open(config_path, 'rb') as file:
+                cache_key = _snapshot_cache_key(config_file_contents=file.read())
+        except OSError:
+            raise FileNotFoundError(f"Config file not found: {config_path}")
+
+        snapshot = _load_cached_snapshot(cache_file_path=cache_file_path, cache_key=cache_key)
+        if snapshot:
+            logging.debug(f"Loaded compiled config for {config_path} from cache")
+        else:
+            snapshot = ConfigSnapshot(data=self._read_file(app_name=app_name, config_path=config_path))
+            _save_cached_snapshot(cache_file_path=cache_file_path, cache_key=cache_key, snapshot=snapshot)
+
+        self.snapshot = snapshot
+        self.run = snapshot.run
+        self.plex = snapshot.plex
+        self.always = snapshot.always
+        self.date_ranges = snapshot.date_ranges
+        self.monthly = snapshot.monthly
+        self.weekly = snapshot.weekly
+        self.advanced = snapshot.advanced
+        self.all = self._summary()
+
+        logging.debug(f"Using configuration:\n{self.log()}")
+
+    @staticmethod
+    def _read_file(app_name: str, config_path: str) -> dict:
+        config = confuse.Configuration(app_name)
 
         # noinspection PyBroadException
         try:
-            self.config.set_file(filename=config_path)
+            config.set_file(filename=config_path)
             logging.debug(f"Loaded config from {config_path}")
         except Exception:  # pylint: disable=broad-except # not sure what confuse will throw
             raise FileNotFoundError(f"Config file not found: {config_path}")
 
-        self.run = RunConfig(data=self.config)
-        self.plex = PlexServerConfig(data=self.config)
-        self.always = AlwaysSection(data=self.config)
-        self.date_ranges = DateRangeSection(data=self.config)
-        self.monthly = MonthlySection(data=self.config)
-        self.weekly = WeeklySection(data=self.config)
-        self.advanced = AdvancedConfig(data=self.config)
-
-        logging.debug(f"Using configuration:\n{self.log()}")
+        return config.get() or {}
 
     def __repr__(self) -> str:
-        raw_yaml_data = self.config.dump()
-        json_data = yaml.load(raw_yaml_data, Loader=yaml.FullLoader)
-        return json.dumps(json_data, indent=4)
-
-    @property
-    def all(self) -> dict:
+        return self.snapshot.source
+
+    @property
+    def local_root_folders(self) -> List[str]:
+        """
+        Returns the local folders that any enabled section's paths are globbed from, including the auto-generated
+        pre-roll folder, whether or not they exist yet.
+        """
+        path_globbing_configs = []
+        if self.weekly.enabled:
+            path_globbing_configs.extend(week.path_globbing for week in self.weekly.weeks)
+        if self.monthly.enabled:
+            path_globbing_configs.extend(month.path_globbing for month in self.monthly.months)
+        if self.date_ranges.enabled:
+            path_globbing_configs.extend(date_range.path_globbing for date_range in self.date_ranges.ranges)
+        if self.always.enabled:
+            path_globbing_configs.append(self.always.path_globbing)
+
+        roots = [root for path_globbing in path_globbing_configs for root in path_globbing.local_root_folders]
+        if self.advanced.auto_generation.recently_added.enabled:
+            roots.append(self.advanced.auto_generation.recently_added.local_files_root)
+        return list(dict.fromkeys(roots))
+
+    def _summary(self) -> dict:
         return {
             "Run - Schedule": self.run.schedule,
             "Run - Dry Run": self.run.dry_run,
+            "Run - Update On Schedule Change": self.run.update_on_schedule_change,
             "Plex - URL": self.plex.url,
             "Plex - Token": "Exists" if self.plex.token else "Not Set",
+            "Plex - Max Pre-Roll Length": self.plex.max_pre_roll_length or "No Limit",
+            "Plex - Connection Pool Size": self.plex.connection_pool_size,
             "Always - Enabled": self.always.enabled,
             "Always - Config": self.always,
             "Date Range - Enabled": self.date_ranges.enabled,
@@ -480,6 +633,15 @@ class Config:
             "Advanced - Auto Generation - Recently Added - Enabled": self.advanced.auto_generation.recently_added.enabled,
             "Advanced - Auto Generation - Recently Added - Count": self.advanced.auto_generation.recently_added.count,
             "Advanced - Auto Generation - Recently Added - Trailer Cutoff Year": self.advanced.auto_generation.recently_added.trailer_cutoff_year,
+            "Advanced - Auto Generation - Recently Added - Render Workers": self.advanced.auto_generation.recently_added.render_workers,
+            "Advanced - Auto Generation - Recently Added - Max Queued Renders": self.advanced.auto_generation.recently_added.max_queued_renders,
+            "Advanced - Library Watcher - Enabled": self.advanced.library_watcher.enabled,
+            "Advanced - Library Watcher - Use Inotify": self.advanced.library_watcher.use_inotify,
+            "Advanced - Library Watcher - Poll Interval": self.advanced.library_watcher.poll_interval,
+            "Advanced - Webhook Server - Threads": self.advanced.webhook_server.threads,
+            "Advanced - Webhook Server - Connection Limit": self.advanced.webhook_server.connection_limit,
+            "Advanced - Webhook Server - Channel Timeout": self.advanced.webhook_server.channel_timeout,
+            "Advanced - Webhook Server - Shutdown Timeout": self.advanced.webhook_server.shutdown_timeout,
         }
 
     def log(self) -> str:
@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import modules.logs as logging
+from modules.config_parser import Config
+
+
+def _get_file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Editors often replace the file rather than writing to it, so include the inode as well
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ConfigReloader:
+    """
+    Holds the active config and swaps in a new one whenever the config file changes, without restarting the process.
+
+    The new file is loaded and validated on a background thread. If it fails to load, the previous config stays
+    active until the file changes again.
+    """
+
+    def __init__(self, app_name: str, config_path: str, cache_file_path: str = None, check_interval: int = 5):
+        """
+        :param app_name: The name of the application.
+        :param config_path: The path to the config file.
+        :param cache_file_path: Optional path to store the compiled config at, see Config.
+        :param check_interval: How often to check the config file for changes, in seconds.
+        """
+        self._app_name = app_name
+        self._config_path = config_path
+        self._cache_file_path = cache_file_path
+        self._check_interval = check_interval
+        self._callbacks: List[Callable[[Config], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._file_signature = _get_file_signature(path=config_path)
+        self._config = self._load()  # Unlike reloads, a broken config at startup is fatal
+
+    @property
+    def config(self) -> Config:
+        """
+        The active config. Read it once per unit of work, so a reload mid-way does not mix two configs.
+        """
+        return self._config
+
+    def on_reload(self, callback: Callable[[Config], None]):
+        """
+        Register a callback to run (on the reloader thread) after a new config has been swapped in.
+
+        :param callback: Called with the new config.
+        """
+        self._callbacks.append(callback)
+
+    def _load(self) -> Config:
+        return Config(app_name=self._app_name, config_path=self._config_path, cache_file_path=self._cache_file_path)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Load the config file again if it has changed since it was last loaded.
+
+        :return: True if a new config was swapped in.
+        """
+        file_signature = _get_file_signature(path=self._config_path)
+        if file_signature is None or file_signature == self._file_signature:
+            return False
+
+        # Only try each version of the file once, whether it loads or not
+        self._file_signature = file_signature
+
+        logging.info(f"Config file {self._config_path} changed, reloading...")
+        try:
+            config = self._load()
+        except Exception as e:  # pylint: disable=broad-except # keep running on the previous config
+            logging.error(f"Could not reload config, keeping the previous config: {e}")
+            return False
+
+        # Assigning the attribute is atomic, readers see either the old or the new config, never a mix
+        self._config = config
+        logging.info("Config reloaded")
+
+        for callback in self._callbacks:
+            try:
+                callback(config)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.error(f"Error applying reloaded config: {e}")
+
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ConfigReloader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(timeout=self._check_interval):
+            self.reload_if_changed()
@@ -1,6 +1,240 @@
-import glob
+import fnmatch
 import os
-from typing import List
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Same magic characters as the glob module
+_MAGIC_CHECK = re.compile('[*?[]')
+
+# Directories modified this recently may still change within the same mtime tick (notably on network mounts),
+# so their listings are not trusted and are re-scanned on the next lookup
+_MTIME_GRANULARITY_SECONDS = 2
+
+
+def _has_magic(pattern: str) -> bool:
+    return _MAGIC_CHECK.search(pattern) is not None
+
+
+class _DirectoryEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    is_file: bool
+
+
+class _DirectoryListing(NamedTuple):
+    mtime_ns: int
+    entries: Tuple[_DirectoryEntry, ...]
+
+
+class _PatternResult(NamedTuple):
+    dependencies: Dict[str, Optional[int]]  # Directory path to its mtime when the result was built (None if missing)
+    stable: bool
+    files: Tuple[str, ...]
+
+
+def _get_mtime_ns(directory: str) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_within(path: str, directory: str) -> bool:
+    """
+    Check whether a path is a directory or inside of it.
+
+    Args:
+        path (str): The path to check.
+        directory (str): The directory to check against.
+
+    Returns:
+        bool: True if the path is the directory itself or anywhere underneath it.
+    """
+    path = os.path.abspath(path)
+    directory = os.path.abspath(directory)
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:  # e.g. different drives
+        return False
+
+
+def _is_stable(mtime_ns: Optional[int], checked_at_ns: int) -> bool:
+    return mtime_ns is None or checked_at_ns - mtime_ns > _MTIME_GRANULARITY_SECONDS * 1_000_000_000
+
+
+class DirectoryListingCache:
+    """
+    A cache of directory listings and glob results, revalidated by directory modification times.
+
+    Adding, removing or renaming a file updates the modification time of the directory containing it, so a glob result
+    only needs to be rebuilt when one of the directories it depends on has changed, and only those directories are
+    re-scanned. Listings are read with os.scandir, so file types come from the directory entries rather than from a
+    stat per file.
+
+    Directories under watched roots are kept up to date by a library watcher calling invalidate, so results depending
+    only on those are trusted without checking modification times at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings: Dict[str, _DirectoryListing] = {}
+        self._results: Dict[Tuple[str, str], _PatternResult] = {}
+        self._watched_roots: Tuple[str, ...] = ()
+
+    def watch(self, roots: List[str]):
+        """
+        Trust cached results under these roots until they are invalidated, instead of checking modification times.
+
+        Args:
+            roots (List[str]): The watched root directories. An empty list stops trusting any directory.
+        """
+        with self._lock:
+            self._watched_roots = tuple(roots)
+
+    def invalidate(self, directories: List[str]):
+        """
+        Drop cached listings and results for directories that are known to have changed.
+
+        Args:
+            directories (List[str]): The changed directories.
+        """
+        changed = set(directories)
+        with self._lock:
+            for directory in changed:
+                self._listings.pop(directory, None)
+            self._results = {key: result for key, result in self._results.items()
+                             if changed.isdisjoint(result.dependencies)}
+
+    def _is_watched(self, result: _PatternResult) -> bool:
+        # Results depending on missing directories are never trusted, since their creation is reported on a parent
+        return all(mtime_ns is not None and any(is_within(path=directory, directory=root)
+                                                for root in self._watched_roots)
+                   for directory, mtime_ns in result.dependencies.items())
+
+    def _list_directory(self, directory: str, dependencies: Dict[str, Optional[int]]) -> Tuple[_DirectoryEntry, ...]:
+        mtime_ns = _get_mtime_ns(directory=directory)
+        dependencies[directory] = mtime_ns
+        if mtime_ns is None:
+            self._listings.pop(directory, None)
+            return ()
+
+        listing = self._listings.get(directory)
+        if listing and listing.mtime_ns == mtime_ns and _is_stable(mtime_ns=mtime_ns, checked_at_ns=time.time_ns()):
+            return listing.entries
+
+        entries = []
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    try:
+                        entries.append(_DirectoryEntry(name=entry.name, is_dir=entry.is_dir(),
+                                                       is_file=entry.is_file()))
+                    except OSError:
+                        continue  # e.g. a file removed mid-scan
+        except OSError:
+            self._listings.pop(directory, None)
+            return ()
+
+        entries.sort(key=lambda e: e.name)
+        self._listings[directory] = _DirectoryListing(mtime_ns=mtime_ns, entries=tuple(entries))
+        return self._listings[directory].entries
+
+    def _match(self, directory: str, parts: List[str], dependencies: Dict[str, Optional[int]]) -> List[str]:
+        part, remaining = parts[0], parts[1:]
+
+        if not _has_magic(part):
+            path = os.path.join(directory, part)
+            if remaining:
+                return self._match(directory=path, parts=remaining, dependencies=dependencies)
+            # The file appearing or disappearing changes the modification time of its directory
+            dependencies[directory] = _get_mtime_ns(directory=directory)
+            return [path] if os.path.isfile(path) else []
+
+        matches = []
+        for entry in self._list_directory(directory=directory, dependencies=dependencies):
+            # Like glob, wildcards do not match hidden files unless the pattern explicitly starts with a dot
+            if entry.name.startswith('.') and not part.startswith('.'):
+                continue
+            if not fnmatch.fnmatch(entry.name, part):
+                continue
+
+            path = os.path.join(directory, entry.name)
+            if remaining:
+                if entry.is_dir:
+                    matches.extend(self._match(directory=path, parts=remaining, dependencies=dependencies))
+            elif entry.is_file:
+                matches.append(path)
+
+        return matches
+
+    def _is_valid(self, result: _PatternResult) -> bool:
+        if self._watched_roots and self._is_watched(result=result):
+            return True
+        return result.stable and all(_get_mtime_ns(directory=directory) == mtime_ns
+                                     for directory, mtime_ns in result.dependencies.items())
+
+    def get_all_files_matching_glob_pattern(self, directory: str, pattern: str) -> List[str]:
+        """
+        Get all files matching a glob pattern in a directory, re-scanning only directories that have changed.
+
+        Args:
+            directory (str): The directory to search in.
+            pattern (str): The glob pattern to search for.
+
+        Returns:
+            List[str]: A sorted list of file paths that match the glob pattern.
+        """
+        key = (directory, pattern)
+
+        with self._lock:
+            result = self._results.get(key)
+            if result and self._is_valid(result=result):
+                return list(result.files)
+
+            full_pattern = os.path.join(directory, pattern)
+            anchor, relative_pattern = os.path.splitdrive(full_pattern)
+            if os.path.isabs(relative_pattern):
+                anchor += os.sep
+            parts = [part for part in relative_pattern.split(os.sep) if part]
+            if not parts:
+                return []
+
+            checked_at_ns = time.time_ns()
+            dependencies: Dict[str, Optional[int]] = {}
+            matches = self._match(directory=anchor or os.curdir, parts=parts, dependencies=dependencies)
+            if not anchor:
+                # Keep relative paths relative, like glob does
+                matches = [os.path.relpath(match) for match in matches]
+
+            stable = all(_is_stable(mtime_ns=mtime_ns, checked_at_ns=checked_at_ns)
+                         for mtime_ns in dependencies.values())
+            self._results[key] = _PatternResult(dependencies=dependencies, stable=stable, files=tuple(matches))
+            return matches
+
+
+_directory_listing_cache = DirectoryListingCache()
+
+
+def watch_directories(roots: List[str]):
+    """
+    Trust cached glob results under these roots until they are invalidated by invalidate_directories.
+
+    Args:
+        roots (List[str]): The watched root directories. An empty list stops trusting any directory.
+    """
+    _directory_listing_cache.watch(roots=roots)
+
+
+def invalidate_directories(directories: List[str]):
+    """
+    Drop cached glob results for directories that are known to have changed.
+
+    Args:
+        directories (List[str]): The changed directories.
+    """
+    _directory_listing_cache.invalidate(directories=directories)
 
 
 def get_all_files_matching_glob_pattern(directory: str, pattern: str) -> List[str]:
@@ -14,7 +248,34 @@ def get_all_files_matching_glob_pattern(directory: str, pattern: str) -> List[st
     Returns:
         List[str]: A list of file paths that match the glob pattern.
     """
-    return [file for file in glob.glob(os.path.join(directory, pattern)) if os.path.isfile(file)]
+    return _directory_listing_cache.get_all_files_matching_glob_pattern(directory=directory, pattern=pattern)
+
+
+class GlobCache:
+    """
+    A memo of glob results, keyed by directory and pattern.
+
+    Meant to live for a single run, so that overlapping patterns in different sections only walk the filesystem once.
+    """
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, str], List[str]] = {}
+
+    def get_all_files_matching_glob_pattern(self, directory: str, pattern: str) -> List[str]:
+        """
+        Get all files matching a glob pattern in a directory, reusing a previous result for the same pair if available.
+
+        Args:
+            directory (str): The directory to search in.
+            pattern (str): The glob pattern to search for.
+
+        Returns:
+            List[str]: A list of file paths that match the glob pattern.
+        """
+        key = (directory, pattern)
+        if key not in self._results:
+            self._results[key] = get_all_files_matching_glob_pattern(directory=directory, pattern=pattern)
+        return list(self._results[key])
 
 
 def translate_local_path_to_remote_path(local_path: str, local_root_folder: str, remote_root_folder: str) -> str:
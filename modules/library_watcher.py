@@ -0,0 +1,307 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import modules.files as files
+import modules.logs as logging
+
+# See inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF |
+               _IN_MOVE_SELF | _IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Changes are collected for this long before being reported, so a batch of copied files only triggers one update
+_SETTLE_SECONDS = 2
+
+
+def _walk_directories(root: str) -> Dict[str, int]:
+    """
+    Get the modification time of a directory and all of its subdirectories.
+
+    :param root: The directory to walk.
+    :return: A dictionary of directory paths to their modification times.
+    """
+    directories = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            directories[directory] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as iterator:
+                pending.extend(entry.path for entry in iterator
+                               if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            continue  # Removed mid-walk or not readable, its parent's modification time will reflect that
+
+    return directories
+
+
+def _walk_directories_of_roots(roots: List[str]) -> Dict[str, int]:
+    directories = {}
+    for root in roots:
+        directories.update(_walk_directories(root=root))
+    return directories
+
+
+class _InotifyBackend:
+    """
+    Reports changed directories using Linux inotify, watching every directory under the roots.
+    """
+
+    def __init__(self, roots: List[str]):
+        libc_name = ctypes.util.find_library("c")
+        if sys.platform != "linux" or not libc_name:
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify")
+
+        self._directories: Dict[int, str] = {}
+        try:
+            for root in roots:
+                self._add_tree(root=root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return  # Removed before it could be watched
+            # e.g. ENOSPC when running out of watches, fall back to polling
+            raise OSError(error, f"Could not watch {directory}: {os.strerror(error)}")
+        self._directories[wd] = directory
+
+    def _add_tree(self, root: str):
+        for directory in _walk_directories(root=root):
+            self._add_watch(directory=directory)
+
+    def add_root(self, root: str):
+        self._add_tree(root=root)
+
+    def read_changes(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Wait for changes.
+
+        :param timeout: How long to wait for changes, in seconds.
+        :return: The changed directories, or None if events were lost and everything should be considered changed.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_length]
+                               .rstrip(b"\0"))
+            offset += _EVENT_HEADER.size + name_length
+
+            if mask & _IN_Q_OVERFLOW:
+                return None
+
+            directory = self._directories.get(wd)
+            if directory is None:
+                continue
+
+            if mask & _IN_IGNORED:
+                del self._directories[wd]
+                continue
+
+            changed.add(directory)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                # New subdirectories need their own watches, and may already have contents
+                self._add_tree(root=os.path.join(directory, name))
+                changed.update(_walk_directories(root=os.path.join(directory, name)))
+
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollingBackend:
+    """
+    Reports changed directories by periodically comparing directory modification times.
+
+    Network mounts (e.g. SMB or NFS) do not report changes made by other machines through inotify, so this is the only
+    reliable option for them. It costs one stat per directory per poll, not one per file.
+    """
+
+    def __init__(self, roots: List[str], poll_interval: int, stop_event: threading.Event):
+        self._roots = list(roots)
+        self._poll_interval = poll_interval
+        self._stop_event = stop_event
+        self._directories = _walk_directories_of_roots(roots=self._roots)
+
+    def read_changes(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Wait for changes.
+
+        :param timeout: How long to wait for changes, in seconds.
+        :return: The changed directories.
+        """
+        if self._stop_event.wait(timeout=min(timeout, self._poll_interval)):
+            return set()
+
+        previous, self._directories = self._directories, _walk_directories_of_roots(roots=self._roots)
+        return {directory for directory in previous.keys() | self._directories.keys()
+                if previous.get(directory) != self._directories.get(directory)}
+
+    def add_root(self, root: str):
+        self._roots.append(root)
+        self._directories.update(_walk_directories(root=root))
+
+    def close(self):
+        pass
+
+
+class LibraryWatcher:
+    """
+    Watches the pre-roll library folders and reports which directories changed.
+
+    While running, glob results under the watched roots are trusted until the watcher reports a change, so resolving
+    the paths of a schedule does not touch the filesystem unless something actually changed.
+
+    Roots that do not exist yet (e.g. the auto-generated pre-roll folder before the first render) are checked for every
+    poll interval, also when using inotify, and are watched and reported as changed once they appear.
+    """
+
+    def __init__(self, roots: List[str], on_change: Callable[[Set[str]], None], use_inotify: bool = True,
+                 poll_interval: int = 30):
+        """
+        :param roots: The local root folders to watch, including ones that do not exist yet.
+        :param on_change: Called from the watcher thread with the changed directories.
+        :param use_inotify: Whether to use inotify where available, rather than polling.
+        :param poll_interval: How often to check for changes when polling, in seconds.
+        """
+        self._roots = list(dict.fromkeys(roots))
+        self._watched_roots: List[str] = []  # The roots that exist, and are being watched
+        self._on_change = on_change
+        self._use_inotify = use_inotify
+        self._poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._backend = None
+
+    def _create_backend(self):
+        if self._use_inotify:
+            try:
+                backend = _InotifyBackend(roots=self._watched_roots)
+                logging.info(f"Watching {len(self._watched_roots)} pre-roll folder(s) for changes using inotify")
+                return backend
+            except OSError as e:
+                logging.warning(f"Could not watch pre-roll folders using inotify, falling back to polling: {e}")
+
+        logging.info(f"Watching {len(self._watched_roots)} pre-roll folder(s) for changes every {self._poll_interval} "
+                     f"seconds")
+        return _PollingBackend(roots=self._watched_roots, poll_interval=self._poll_interval,
+                               stop_event=self._stop_event)
+
+    def start(self):
+        if not self._roots:
+            logging.info("No pre-roll folders to watch")
+            return
+
+        self._watched_roots = [root for root in self._roots if os.path.isdir(root)]
+        missing_roots = [root for root in self._roots if root not in self._watched_roots]
+        if missing_roots:
+            logging.info(f"Pre-roll folder(s) do not exist yet, will watch them once they do: {missing_roots}")
+
+        self._backend = self._create_backend()
+        files.watch_directories(roots=self._watched_roots)
+        self._thread = threading.Thread(target=self._run, name="LibraryWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        files.watch_directories(roots=[])
+
+    def _report(self, changed: Set[str]):
+        files.invalidate_directories(directories=list(changed))
+        try:
+            self._on_change(changed)
+        except Exception as e:
+            logging.error(f"Error handling pre-roll folder changes: {e}")
+
+    def _watch_appeared_roots(self) -> Set[str]:
+        """
+        Start watching roots that did not exist before, but do now.
+
+        :return: The directories of the roots that appeared, all of which count as changed.
+        """
+        appeared = set()
+        for root in self._roots:
+            if root in self._watched_roots or not os.path.isdir(root):
+                continue
+            logging.info(f"Pre-roll folder {root} now exists, watching it for changes")
+            self._backend.add_root(root=root)
+            self._watched_roots.append(root)
+            appeared.update(_walk_directories(root=root))
+
+        if appeared:
+            files.invalidate_directories(directories=list(appeared))
+            files.watch_directories(roots=self._watched_roots)
+        return appeared
+
+    def _run(self):
+        pending: Set[str] = set()
+        settle_deadline = None
+        try:
+            while not self._stop_event.is_set():
+                timeout = self._poll_interval if settle_deadline is None \
+                    else max(settle_deadline - time.monotonic(), 0)
+                changed = self._backend.read_changes(timeout=timeout)
+                if changed is None:
+                    logging.warning("Pre-roll folder change events were lost, re-scanning all folders")
+                    changed = set(_walk_directories_of_roots(roots=self._watched_roots))
+                if len(self._watched_roots) < len(self._roots):
+                    changed |= self._watch_appeared_roots()
+
+                if changed:
+                    pending.update(changed)
+                    # Keep the original deadline, so a steady stream of changes still gets reported
+                    settle_deadline = settle_deadline or time.monotonic() + _SETTLE_SECONDS
+
+                if pending and time.monotonic() >= settle_deadline:
+                    self._report(changed=pending)
+                    pending, settle_deadline = set(), None
+        except Exception as e:
+            # Without the watcher, cached results can no longer be trusted
+            files.watch_directories(roots=[])
+            logging.error(f"Pre-roll folder watcher stopped: {e}")
+        finally:
+            self._backend.close()
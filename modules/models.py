@@ -1,53 +1,149 @@
 import random
+from functools import partial
 from datetime import datetime, date, timedelta
-from typing import NamedTuple, List, Union, Tuple, Optional
+from typing import Callable, NamedTuple, List, Union, Tuple, Optional
 
 import modules.logs as logging
-from modules import utils
+from modules import files, utils
 from modules._holidays import get_date_from_holiday_name
 from modules.config_parser import FloatingHolidayConfig
+from modules.recurrence import DateRangeRecurrence, YearlyRecurrence, compile_date_range
 from modules.statics import ScheduleType
 
 
+class LazyPaths:
+    """
+    A list of paths that is only resolved (e.g. globbed from the filesystem) the first time it is needed.
+    """
+
+    def __init__(self, resolver: Callable[[], List[str]]):
+        self._resolver = resolver
+        self._paths: Optional[List[str]] = None
+
+    def __call__(self) -> List[str]:
+        if self._paths is None:
+            self._paths = self._resolver()
+        return self._paths
+
+
+PathSource = Union[List[str], Callable[[], List[str]]]
+
+
+def _lazy_paths(paths: PathSource) -> Union[List[str], LazyPaths]:
+    if callable(paths) and not isinstance(paths, LazyPaths):
+        return LazyPaths(resolver=paths)
+    return paths
+
+
+def _moment_after(end_date: datetime) -> Optional[datetime]:
+    try:
+        return end_date + timedelta(seconds=1)
+    except OverflowError:  # Ends at the end of time, e.g. always schedules, so never becomes inactive
+        return None
+
+
 class ScheduleEntry(NamedTuple):
     type: str
     start_date: datetime
     end_date: datetime
-    paths: List[str]
+    path_source: Union[List[str], LazyPaths]
     weight: int
     name_prefix: str
     disable_always: bool = False
+    local_roots: Tuple[str, ...] = ()  # Local folders the paths are globbed from
+    # Recurring entries are active in every window of their recurrence, the start and end dates are only the window
+    # they were created (or evaluated) in
+    recurrence: Union[DateRangeRecurrence, YearlyRecurrence, None] = None
+
+    @property
+    def paths(self) -> List[str]:
+        if callable(self.path_source):
+            return self.path_source()
+        return self.path_source
 
     @property
     def should_be_used(self) -> bool:
-        now = datetime.now()
-        return self.start_date <= now <= self.end_date
+        return self.is_active_at(moment=datetime.now())
+
+    def is_active_at(self, moment: datetime) -> bool:
+        if self.recurrence:
+            return self.recurrence.is_active_at(moment=moment)
+        return self.start_date <= moment <= self.end_date
+
+    def window_at(self, moment: datetime) -> Tuple[datetime, datetime]:
+        """
+        Get the window of this entry active at a specific moment, or the next one if none is active.
+
+        :param moment: The moment to search from.
+        :return: The start and end of the window.
+        """
+        if self.recurrence:
+            return self.recurrence.window_at(moment=moment)
+        return self.start_date, self.end_date
 
     @property
     def name(self) -> str:
         return f"{self.name_prefix} ({self.start_date} - {self.end_date})"
 
-
-def schedule_entry_from_always(paths: List[str], count: int, weight: int) -> ScheduleEntry:
+    def depends_on(self, directories: List[str]) -> bool:
+        """
+        Check whether changes to any of the provided directories could change the paths of this entry.
+
+        :param directories: The changed directories.
+        :return: True if any of the directories is inside (or is) one of the local folders this entry is globbed from.
+        """
+        return any(files.is_within(path=directory, directory=root)
+                   for directory in directories for root in self.local_roots)
+
+    def next_transition(self, after: datetime) -> Optional[datetime]:
+        """
+        Get the next moment after the provided time at which this entry becomes active or inactive.
+
+        :param after: The time to search from.
+        :return: The next start or end boundary, or None if this entry will not change state again.
+        """
+        if self.recurrence:
+            if self.recurrence.is_active_at(moment=after):
+                end_date = self.recurrence.next_end_after(moment=after)
+                return _moment_after(end_date=end_date) if end_date else None
+            return self.recurrence.next_start_after(moment=after)
+
+        if after < self.start_date:
+            return self.start_date
+        if after <= self.end_date:
+            # End dates are inclusive, so the entry is only inactive once the end date has fully passed
+            return _moment_after(end_date=self.end_date)
+        return None
+
+
+def schedule_entry_from_always(paths: PathSource, count: Union[int, Callable[[List[str]], int]],
+                               weight: int, local_roots: List[str] = None) -> ScheduleEntry:
     start_date = utils.make_midnight(utils.start_of_time())
     end_date = utils.make_right_before_midnight(utils.end_of_time())
 
-    if count > len(paths):
-        logging.warning(f"Always schedule has a count of {count} but only {len(paths)} paths were provided. "
-                        f"Setting count to {len(paths)}")
-        count = len(paths)
+    def _random_paths() -> List[str]:
+        all_paths = paths() if callable(paths) else paths
+        # The count may depend on the resolved paths, pass them along so they are not resolved a second time
+        _count = count(paths=all_paths) if callable(count) else count
+
+        if _count > len(all_paths):
+            logging.warning(f"Always schedule has a count of {_count} but only {len(all_paths)} paths were provided. "
+                            f"Setting count to {len(all_paths)}")
+            _count = len(all_paths)
 
-    random_paths = random.sample(population=paths, k=count)
+        return random.sample(population=all_paths, k=_count)
 
     return ScheduleEntry(type=ScheduleType.always.value,
                          start_date=start_date,
                          end_date=end_date,
-                         paths=random_paths,
+                         path_source=LazyPaths(resolver=_random_paths),
                          weight=weight,
-                         name_prefix="Always")
+                         name_prefix="Always",
+                         local_roots=tuple(local_roots or ()))
 
 
-def schedule_entry_from_auto_generated(name: str, paths: List[str], weight: int) -> ScheduleEntry:
+def schedule_entry_from_auto_generated(name: str, paths: PathSource, weight: int,
+                                       local_roots: List[str] = None) -> ScheduleEntry:
     # Always schedule
     start_date = utils.make_midnight(utils.start_of_time())
     end_date = utils.make_right_before_midnight(utils.end_of_time())
@@ -57,47 +153,58 @@ def schedule_entry_from_auto_generated(name: str, paths: List[str], weight: int)
     return ScheduleEntry(type=ScheduleType.always.value,
                          start_date=start_date,
                          end_date=end_date,
-                         paths=paths,
+                         path_source=_lazy_paths(paths=paths),
                          weight=weight,
-                         name_prefix=f"Auto Generated - {name}")
+                         name_prefix=f"Auto Generated - {name}",
+                         local_roots=tuple(local_roots or ()))
 
 
-def schedule_entry_from_week_number(week_number: int, paths: List[str], weight: int, disable_always: bool = False) -> \
-        Union[ScheduleEntry, None]:
-    start_date = utils.start_of_week_number(week_number=week_number)
-    end_date = utils.end_of_week_number(week_number=week_number)
+def schedule_entry_from_week_number(week_number: int, paths: PathSource, weight: int, disable_always: bool = False,
+                                    at: datetime = None,
+                                    local_roots: List[str] = None) -> Union[ScheduleEntry, None]:
+    recurrence = YearlyRecurrence(
+        resolver=lambda year: (utils.start_of_week_number(week_number=week_number, year=year),
+                               utils.end_of_week_number(week_number=week_number, year=year)))
+    start_date, end_date = recurrence.window_at(moment=at or datetime.now())
 
     return ScheduleEntry(type=ScheduleType.weekly.value,
                          start_date=start_date,
                          end_date=end_date,
-                         paths=paths,
+                         path_source=_lazy_paths(paths=paths),
                          weight=weight,
                          disable_always=disable_always,
-                         name_prefix=f"Week {week_number}")
+                         name_prefix=f"Week {week_number}",
+                         local_roots=tuple(local_roots or ()),
+                         recurrence=recurrence)
 
 
-def schedule_entry_from_month_number(month_number: int, paths: List[str], weight: int, disable_always: bool = False) -> \
-        Union[ScheduleEntry, None]:
-    start_date = utils.start_of_month(month_number=month_number)
-    end_date = utils.end_of_month(month_number=month_number)
+def schedule_entry_from_month_number(month_number: int, paths: PathSource, weight: int,
+                                     disable_always: bool = False,
+                                     at: datetime = None,
+                                     local_roots: List[str] = None) -> Union[ScheduleEntry, None]:
+    recurrence = YearlyRecurrence(
+        resolver=lambda year: (utils.start_of_month(month_number=month_number, year=year),
+                               utils.end_of_month(month_number=month_number, year=year)))
+    start_date, end_date = recurrence.window_at(moment=at or datetime.now())
 
     return ScheduleEntry(type=ScheduleType.monthly.value,
                          start_date=start_date,
                          end_date=end_date,
-                         paths=paths,
+                         path_source=_lazy_paths(paths=paths),
                          weight=weight,
                          disable_always=disable_always,
-                         name_prefix=f"Month {month_number}")
+                         name_prefix=f"Month {month_number}",
+                         local_roots=tuple(local_roots or ()),
+                         recurrence=recurrence)
 
 
-def _get_dates_for_floating_holiday(holiday: FloatingHolidayConfig) -> Tuple[datetime, datetime]:
+def _get_dates_for_floating_holiday(holiday: FloatingHolidayConfig,
+                                    year: int) -> Tuple[Optional[datetime], Optional[datetime]]:
     holiday_dates: list[date] = get_date_from_holiday_name(country_alpha2=holiday.country,
                                                            holiday_name=holiday.name,
+                                                           year=year,
                                                            country_subdivision=holiday.subdivision)
-
     if not holiday_dates:
-        logging.info(f"Floating holiday '{holiday.name}' not found for country '{holiday.country}' "
-                     f"and subdivision '{holiday.subdivision}'. Skipping schedule entry.")
         return None, None
 
     # holiday_dates is already sorted, add/subtract offsets to first/last date
@@ -105,48 +212,54 @@ def _get_dates_for_floating_holiday(holiday: FloatingHolidayConfig) -> Tuple[dat
     end_date = holiday_dates[-1] + timedelta(days=holiday.offset_end)
 
     # Adjust to midnight boundaries
-    start_date = utils.make_midnight(start_date)
-    end_date = utils.make_right_before_midnight(end_date)
-
-    return start_date, end_date
+    return utils.make_midnight(start_date), utils.make_right_before_midnight(end_date)
 
 
 def schedule_entry_from_date_range(start_date_string: Optional[str],
                                    end_date_string: Optional[str],
                                    holiday: FloatingHolidayConfig,
-                                   paths: List[str],
+                                   paths: PathSource,
                                    weight: int,
                                    disable_always: bool = False,
-                                   name: str = None) \
+                                   name: str = None,
+                                   recurrence: DateRangeRecurrence = None,
+                                   at: datetime = None,
+                                   local_roots: List[str] = None) \
         -> Union[ScheduleEntry, None]:
     if not name:
         name = "Date Range"
 
     # If a floating holiday is specified, override schedule calculation
     if holiday.name and holiday.country:
-        start_date, end_date = _get_dates_for_floating_holiday(holiday=holiday)
+        # Offsets can make a holiday span New Year, the recurrence checks the surrounding years too
+        recurrence = YearlyRecurrence(resolver=partial(_get_dates_for_floating_holiday, holiday))
+        start_date, end_date = recurrence.window_at(moment=at or datetime.now())
 
         if not start_date or not end_date:
+            logging.info(f"Floating holiday '{holiday.name}' not found for country '{holiday.country}' "
+                         f"and subdivision '{holiday.subdivision}'. Skipping schedule entry.")
             return None
     else:
-        if not start_date_string or not end_date_string:
-            logging.error(f"{name} is missing a start or end date string.")
+        recurrence = recurrence or compile_date_range(start_date=start_date_string,
+                                                      end_date=end_date_string,
+                                                      name=name)
+        if not recurrence:
+            logging.error(f"{name} has invalid start or end date wildcard patterns. Skipping schedule entry.")
             return None
 
-        start_date, end_date = utils.wildcard_strings_to_datetimes(start_date_string=start_date_string,
-                                                                   end_date_string=end_date_string)
+        # Use the window active at the evaluation time, or the next upcoming one
+        start_date, end_date = recurrence.window_at(moment=at or datetime.now())
 
         if not start_date or not end_date:
-            logging.error(
-                f"{name} has invalid start or end date wildcard patterns. "
-                f"Any wildcard elements must be in the same position in both the start and end date.\n"
-                f"Start date: {start_date_string}\nEnd date: {end_date_string}")
+            logging.error(f"{name} has no valid occurrences. Skipping schedule entry.")
             return None
 
     return ScheduleEntry(type=ScheduleType.date_range.value,
                          start_date=start_date,
                          end_date=end_date,
-                         paths=paths,
+                         path_source=_lazy_paths(paths=paths),
                          weight=weight,
                          disable_always=disable_always,
-                         name_prefix=name)
+                         name_prefix=name,
+                         local_roots=tuple(local_roots or ()),
+                         recurrence=recurrence)
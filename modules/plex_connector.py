@@ -1,8 +1,12 @@
-from typing import List, Union, Tuple
+import threading
+from typing import Callable, Dict, Iterable, List, Union, Tuple, TypeVar
 
-from plexapi.exceptions import BadRequest
+import requests
+from plexapi.exceptions import BadRequest, Unauthorized
 from plexapi.server import PlexServer
+from plexapi.settings import Settings
 from plexapi.video import Movie
+from requests.adapters import HTTPAdapter
 
 import modules.logs as logging
 
@@ -17,40 +21,150 @@ def prepare_pre_roll_string(paths: List[str]) -> Tuple[Union[str, None], int]:
     return ";".join(paths), len(paths)
 
 
+T = TypeVar("T")
+
+# Rating keys per metadata request, keeps the request URL well within common length limits
+_METADATA_BATCH_SIZE = 100
+
+# Errors after which a cached connection is thrown away and made again, e.g. the server restarted or the token changed
+_RECONNECT_ERRORS = (Unauthorized, requests.exceptions.ConnectionError)
+
+
+def _create_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    # Keep up to pool_size connections alive, so concurrent webhook workers do not each open a new connection
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PlexClientManager:
+    """
+    Shares one Plex server connection (and its pooled HTTP session) per server URL and token across the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[Tuple[str, str, int], PlexServer] = {}
+
+    def get(self, host: str, token: str, pool_size: int) -> PlexServer:
+        """
+        Get the shared connection to a Plex server, connecting if there is none yet.
+
+        :param host: The URL of the Plex server
+        :param token: The Plex token
+        :param pool_size: The maximum number of connections to keep alive to the server
+        :return: The Plex server
+        """
+        key = (host, token, pool_size)
+        with self._lock:
+            plex_server = self._servers.get(key)
+            if not plex_server:
+                logging.info(f"Connecting to Plex server at {host}")
+                plex_server = PlexServer(baseurl=host, token=token, session=_create_session(pool_size=pool_size))
+                self._servers[key] = plex_server
+            return plex_server
+
+    def discard(self, host: str, token: str, pool_size: int, plex_server: PlexServer):
+        """
+        Drop a broken connection, so the next call to get reconnects.
+
+        :param host: The URL of the Plex server
+        :param token: The Plex token
+        :param pool_size: The maximum number of connections to keep alive to the server
+        :param plex_server: The broken connection, ignored if another thread has already replaced it
+        """
+        key = (host, token, pool_size)
+        with self._lock:
+            if self._servers.get(key) is plex_server:
+                del self._servers[key]
+                plex_server._session.close()
+
+
+_client_manager = PlexClientManager()
+
+
 class PlexConnector:
-    def __init__(self, host: str, token: str):
+    def __init__(self, host: str, token: str, pool_size: int = 10):
         self._host = host
         self._token = token
-        logging.info(f"Connecting to Plex server at {self._host}")
-        self._plex_server = PlexServer(baseurl=self._host, token=self._token)
+        self._pool_size = pool_size
+        self._plex_server = _client_manager.get(host=self._host, token=self._token, pool_size=self._pool_size)
 
-    def update_pre_roll_paths(self, paths: List[str], testing: bool = False) -> None:
+    def _call(self, func: Callable[[PlexServer], T]) -> T:
+        """
+        Run a request against the Plex server, reconnecting and retrying once if the connection has gone bad.
+        """
+        try:
+            return func(self._plex_server)
+        except _RECONNECT_ERRORS as e:
+            logging.warning(f"Lost connection to Plex server at {self._host}, reconnecting: {e}")
+            _client_manager.discard(host=self._host, token=self._token, pool_size=self._pool_size,
+                                    plex_server=self._plex_server)
+            self._plex_server = _client_manager.get(host=self._host, token=self._token, pool_size=self._pool_size)
+            return func(self._plex_server)
+
+    @staticmethod
+    def _get_settings(plex_server: PlexServer) -> Settings:
+        # PlexServer.settings is cached for the lifetime of the connection, which is shared, so always fetch them fresh
+        return Settings(plex_server, plex_server.query(Settings.key))
+
+    @staticmethod
+    def _save_pre_roll_string(plex_server: PlexServer, pre_roll_string: str) -> bool:
+        """
+        Save the pre-roll string, unless the Plex server already holds it
+
+        :return: True if the pre-roll string was saved, False if it was already set
+        """
+        # The settings read to compare against are the ones saved, so this is one request if nothing changed, two if so
+        settings = PlexConnector._get_settings(plex_server=plex_server)
+        setting = settings.get("cinemaTrailersPrerollID")
+        if setting.value == pre_roll_string:  # type: ignore
+            return False
+        setting.set(pre_roll_string)  # type: ignore
+        settings.save()
+        return True
+
+    def update_pre_roll_paths(self, paths: List[str], testing: bool = False) -> bool:
+        """
+        Update the pre-roll setting on the Plex server, skipping the write if the value would not change
+
+        :param paths: The pre-roll paths to apply
+        :param testing: Whether to only log the change rather than apply it
+        :return: True if the Plex server holds these paths after the call, False otherwise
+        """
         pre_roll_string, count = prepare_pre_roll_string(paths=paths)
         if not pre_roll_string:
             logging.info("No pre-roll paths to update")
-            return
+            return False
 
         logging.info(f"Using {count} pre-roll paths")
 
         if testing:
             logging.debug(f"Testing: Would have updated pre-roll to: {pre_roll_string}")
-            return
-
-        logging.info(f"Updating pre-roll to: {pre_roll_string}")
-
-        self._plex_server.settings.get("cinemaTrailersPrerollID").set(pre_roll_string)  # type: ignore
+            return False
 
         try:
-            self._plex_server.settings.save()  # type: ignore
+            saved = self._call(lambda plex_server: self._save_pre_roll_string(plex_server=plex_server,
+                                                                              pre_roll_string=pre_roll_string))
         except BadRequest as e:
             if "Too Large" in str(e):
-                logging.error("Failed to update pre-roll: Too many paths")
-                return
+                logging.error("Failed to update pre-roll: Too many paths. "
+                              "Set 'max_pre_roll_length' in the 'plex' section to limit the size of the pre-roll")
+                return False
+            logging.error(f"Failed to save pre-roll: {e}")
+            return False
         except Exception as e:
             logging.error(f"Failed to save pre-roll: {e}")
-            return
+            return False
+
+        if not saved:
+            logging.info("Pre-roll is already up to date, skipping update")
+            return True
 
-        logging.info("Successfully updated pre-roll")
+        logging.info(f"Successfully updated pre-roll to: {pre_roll_string}")
+        return True
 
     def get_movie(self, item_key: str) -> Union[None, Movie]:
         """
@@ -60,7 +174,34 @@ class PlexConnector:
         :return: The movie object or None
         """
         try:
-            return self._plex_server.fetchItem(ekey=item_key)
+            return self._call(lambda plex_server: plex_server.fetchItem(ekey=item_key))
         except Exception as e:
             logging.error(f"Failed to get movie: {e}")
             return None
+
+    def get_movies(self, rating_keys: Iterable[str]) -> Dict[str, Movie]:
+        """
+        Get several movies from the Plex server, using one request per batch of movies rather than one per movie
+
+        :param rating_keys: The rating keys of the movies
+        :return: The movies found, by rating key. Keys that are missing or not movies are left out
+        """
+        rating_keys = list(dict.fromkeys(str(rating_key) for rating_key in rating_keys))
+        movies = {}
+        for start in range(0, len(rating_keys), _METADATA_BATCH_SIZE):
+            batch = rating_keys[start:start + _METADATA_BATCH_SIZE]
+            try:
+                items = self._call(lambda plex_server: plex_server.fetchItems(
+                    ekey=f"/library/metadata/{','.join(batch)}", cls=Movie))
+            except Exception as e:
+                logging.error(f"Failed to get {len(batch)} movies: {e}")
+                continue
+
+            for movie in items:
+                # The batch response holds the full metadata of each movie, but plexapi only considers an item complete
+                # when it was loaded from its own URL, and would otherwise request each movie again on the first
+                # empty attribute
+                movie._autoReload = False
+                movies[str(movie.ratingKey)] = movie
+
+        return movies
@@ -0,0 +1,411 @@
+import calendar
+from datetime import datetime, date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import modules.logs as logging
+
+# Fields are ordered from most to least significant: year, month, day, hour, minute, second
+_FIELD_NAMES = ("year", "month", "day", "hour", "minute", "second")
+_YEAR, _MONTH, _DAY, _HOUR, _MINUTE, _SECOND = range(6)
+
+# Bounds used when stepping through recurrences
+_MINIMUMS = (1, 1, 1, 0, 0, 0)
+_MAXIMUMS = (9999, 12, 31, 23, 59, 59)
+
+# Bounds used to expand trailing wildcards, e.g. "xxxx-xx-xx xx:xx:xx" is active from the start to the end of time
+_EXPANDED_MINIMUMS = (1970, 1, 1, 0, 0, 0)
+_EXPANDED_MAXIMUMS = (9999, 12, 31, 23, 59, 59)
+
+_DEFAULT_START_TIME = "00:00:00"
+_DEFAULT_END_TIME = "23:59:59"
+
+Fields = Tuple[Optional[int], ...]
+
+
+def _days_in_month(year: int, month: int) -> int:
+    return calendar.monthrange(year, month)[1]
+
+
+def _field_maximum(index: int, values: List[int]) -> int:
+    if index == _DAY:
+        return _days_in_month(year=values[_YEAR], month=values[_MONTH])
+    return _MAXIMUMS[index]
+
+
+def _fixed_value(fields: Fields, index: int, values: List[int]) -> int:
+    # A fixed day past the end of a month (e.g. the 31st in April) is clamped to the last day of that month
+    if index == _DAY:
+        return min(fields[_DAY], _days_in_month(year=values[_YEAR], month=values[_MONTH]))
+    return fields[index]
+
+
+def _to_values(moment: datetime) -> List[int]:
+    return [moment.year, moment.month, moment.day, moment.hour, moment.minute, moment.second]
+
+
+def _to_datetime(values: List[int]) -> datetime:
+    return datetime(*values)
+
+
+def _fill_from(fields: Fields, values: List[int], index: int, use_maximum: bool) -> datetime:
+    for i in range(index, len(values)):
+        if fields[i] is not None:
+            values[i] = _fixed_value(fields=fields, index=i, values=values)
+        elif use_maximum:
+            values[i] = _field_maximum(index=i, values=values)
+        else:
+            values[i] = _MINIMUMS[i]
+    return _to_datetime(values=values)
+
+
+def _step(fields: Fields, values: List[int], index: int, forward: bool) -> Optional[datetime]:
+    """
+    Move the nearest recurring field more significant than the index by one unit, then fill the remaining fields with
+    their earliest (moving forward) or latest (moving backward) values.
+    """
+    for i in range(index - 1, -1, -1):
+        if fields[i] is not None:
+            continue
+
+        if forward and values[i] < _field_maximum(index=i, values=values):
+            values[i] += 1
+            return _fill_from(fields=fields, values=values, index=i + 1, use_maximum=False)
+        if not forward and values[i] > _MINIMUMS[i]:
+            values[i] -= 1
+            return _fill_from(fields=fields, values=values, index=i + 1, use_maximum=True)
+
+    return None  # No recurring field left to step, the pattern never matches again
+
+
+def _next_match(fields: Fields, moment: datetime) -> Optional[datetime]:
+    """
+    Get the earliest datetime at or after the moment that matches the pattern.
+    """
+    values = _to_values(moment=moment)
+    for i in range(len(values)):
+        if fields[i] is None:
+            continue
+        target = _fixed_value(fields=fields, index=i, values=values)
+        if values[i] == target:
+            continue
+        if values[i] < target:
+            values[i] = target
+            return _fill_from(fields=fields, values=values, index=i + 1, use_maximum=False)
+        return _step(fields=fields, values=values, index=i, forward=True)
+
+    return _to_datetime(values=values)
+
+
+def _previous_match(fields: Fields, moment: datetime) -> Optional[datetime]:
+    """
+    Get the latest datetime at or before the moment that matches the pattern.
+    """
+    values = _to_values(moment=moment)
+    for i in range(len(values)):
+        if fields[i] is None:
+            continue
+        target = _fixed_value(fields=fields, index=i, values=values)
+        if values[i] == target:
+            continue
+        if values[i] > target:
+            values[i] = target
+            return _fill_from(fields=fields, values=values, index=i + 1, use_maximum=True)
+        return _step(fields=fields, values=values, index=i, forward=False)
+
+    return _to_datetime(values=values)
+
+
+def _add_one_unit(moment: datetime, index: int) -> Optional[datetime]:
+    """
+    Add one calendar unit of the given field to a datetime, e.g. one month to January 31st is February 28th/29th.
+    """
+    try:
+        if index == _YEAR:
+            year = moment.year + 1
+            return moment.replace(year=year, day=min(moment.day, _days_in_month(year=year, month=moment.month)))
+        if index == _MONTH:
+            year = moment.year + moment.month // 12
+            month = moment.month % 12 + 1
+            return moment.replace(year=year, month=month, day=min(moment.day, _days_in_month(year=year, month=month)))
+        return moment + {_DAY: timedelta(days=1),
+                         _HOUR: timedelta(hours=1),
+                         _MINUTE: timedelta(minutes=1),
+                         _SECOND: timedelta(seconds=1)}[index]
+    except (ValueError, OverflowError):
+        return None
+
+
+def _instantiate(fields: Fields, base_values: List[int], from_index: int = 0) -> datetime:
+    """
+    Fill the fixed fields of a pattern from the index onwards, keeping the base values for recurring fields.
+    """
+    values = list(base_values)
+    for i in range(from_index, len(values)):
+        if fields[i] is not None:
+            values[i] = fields[i]
+        if i == _DAY:
+            values[i] = min(values[i], _days_in_month(year=values[_YEAR], month=values[_MONTH]))
+    return _to_datetime(values=values)
+
+
+class DateRangeRecurrence:
+    """
+    A compiled, possibly recurring, date range.
+
+    Wildcard fields that are more significant than a specified field (e.g. the year in "xxxx-07-04") recur, and share
+    the same value in the start and end of each window. Wildcard fields with no specified field below them
+    (e.g. the minutes and seconds in "2024-01-01 08:xx:xx") expand to cover their full range.
+    """
+
+    def __init__(self, start_fields: Fields, end_fields: Fields):
+        self._start_fields = start_fields
+        self._end_fields = end_fields
+
+    @property
+    def recurs(self) -> bool:
+        return any(field is None for field in self._start_fields)
+
+    def _window_end(self, window_start: datetime) -> Optional[datetime]:
+        start_values = _to_values(moment=window_start)
+        window_end = _instantiate(fields=self._end_fields, base_values=start_values)
+        if window_end >= window_start or not self.recurs:
+            return window_end
+
+        # The window wraps into the next period, e.g. December 25th to January 5th or 22:00 to 02:00,
+        # so carry into the nearest recurring field above the first field where the end falls before the start
+        end_values = _to_values(moment=window_end)
+        first_difference = next(i for i in range(len(start_values)) if start_values[i] != end_values[i])
+        recurring_above = [i for i in range(first_difference) if self._end_fields[i] is None]
+        if not recurring_above:
+            return None
+
+        carry_index = max(recurring_above)
+        next_period = _add_one_unit(moment=window_start, index=carry_index)
+        if not next_period:
+            return None
+        return _instantiate(fields=self._end_fields,
+                            base_values=_to_values(moment=next_period)[:carry_index + 1] + start_values[carry_index + 1:],
+                            from_index=carry_index + 1)
+
+    def _current_window_start(self, moment: datetime) -> Optional[datetime]:
+        return _previous_match(fields=self._start_fields, moment=moment.replace(microsecond=0))
+
+    def is_active_at(self, moment: datetime) -> bool:
+        """
+        Check whether the range is active at a specific moment.
+
+        :param moment: The moment to check.
+        :return: True if the moment falls within a window of this range, False otherwise.
+        """
+        window_start = self._current_window_start(moment=moment)
+        if not window_start:
+            return False
+        window_end = self._window_end(window_start=window_start)
+        return window_end is not None and window_start <= moment <= window_end
+
+    def next_start_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        Get the start of the next window that begins after a specific moment.
+
+        :param moment: The moment to search from.
+        :return: The start of the next window, or None if the range does not start again.
+        """
+        return _next_match(fields=self._start_fields, moment=moment.replace(microsecond=0) + timedelta(seconds=1))
+
+    def next_end_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        Get the end of the window active at a specific moment, or of the next window if none is active.
+
+        :param moment: The moment to search from.
+        :return: The end of the current or next window, or None if the range does not end again.
+        """
+        return self.window_at(moment=moment)[1]
+
+    def window_at(self, moment: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """
+        Get the window active at a specific moment. If no window is active, get the next one instead, or the last one
+        if the range does not start again.
+
+        :param moment: The moment to search from.
+        :return: The start and end of the window.
+        """
+        window_start = self._current_window_start(moment=moment)
+        if window_start:
+            window_end = self._window_end(window_start=window_start)
+            if window_end and moment <= window_end:
+                return window_start, window_end
+
+        next_window_start = self.next_start_after(moment=moment)
+        if next_window_start:
+            return next_window_start, self._window_end(window_start=next_window_start)
+
+        if window_start:
+            return window_start, self._window_end(window_start=window_start)
+
+        return None, None
+
+
+Window = Tuple[Optional[datetime], Optional[datetime]]
+
+
+class YearlyRecurrence:
+    """
+    A range that occurs (at most) once a year, on dates that are resolved per year rather than matched against a
+    pattern, e.g. a week number or a floating holiday.
+
+    Windows may spill over into the next or previous year, e.g. a holiday on New Year's Day with an offset, so the
+    years around a moment are checked as well.
+    """
+
+    def __init__(self, resolver: Callable[[int], Window]):
+        """
+        :param resolver: Get the start and end of the window in a year, or None and None if there is none that year.
+        """
+        self._resolver = resolver
+        self._windows: Dict[int, Window] = {}  # By year, resolved on first use
+
+    def _window(self, year: int) -> Window:
+        if year not in self._windows:
+            self._windows[year] = self._resolver(year)
+        return self._windows[year]
+
+    def _windows_around(self, moment: datetime) -> List[Tuple[datetime, datetime]]:
+        windows = []
+        for year in (moment.year - 1, moment.year, moment.year + 1):
+            if not _MINIMUMS[_YEAR] <= year <= _MAXIMUMS[_YEAR]:
+                continue
+            start_date, end_date = self._window(year=year)
+            if start_date and end_date:
+                windows.append((start_date, end_date))
+        return windows
+
+    def is_active_at(self, moment: datetime) -> bool:
+        """
+        Check whether the range is active at a specific moment.
+
+        :param moment: The moment to check.
+        :return: True if the moment falls within a window of this range, False otherwise.
+        """
+        return any(start_date <= moment <= end_date for start_date, end_date in self._windows_around(moment=moment))
+
+    def next_start_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        Get the start of the next window that begins after a specific moment.
+
+        :param moment: The moment to search from.
+        :return: The start of the next window, or None if the range does not start again in the coming year.
+        """
+        return min((start_date for start_date, _ in self._windows_around(moment=moment) if start_date > moment),
+                   default=None)
+
+    def next_end_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        Get the end of the window active at a specific moment, or of the next window if none is active.
+
+        :param moment: The moment to search from.
+        :return: The end of the current or next window, or None if the range does not end again.
+        """
+        return self.window_at(moment=moment)[1]
+
+    def window_at(self, moment: datetime) -> Window:
+        """
+        Get the window active at a specific moment. If no window is active, get the next one instead, or the last one
+        if the range does not start again.
+
+        :param moment: The moment to search from.
+        :return: The start and end of the window.
+        """
+        windows = self._windows_around(moment=moment)
+        for start_date, end_date in windows:
+            if moment <= end_date:
+                return start_date, end_date
+
+        return windows[-1] if windows else (None, None)
+
+
+def _to_wildcard_string(value: Union[str, date, datetime]) -> str:
+    # YAML parses unquoted dates and datetimes into date/datetime objects
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return str(value).strip()
+
+
+def _parse_wildcard_string(value: Union[str, date, datetime], default_time: str) -> Optional[Fields]:
+    date_and_time = _to_wildcard_string(value=value).split(' ')
+    if len(date_and_time) > 2:
+        return None
+
+    date_parts = date_and_time[0].split('-')
+    time_parts = (date_and_time[1] if len(date_and_time) > 1 else default_time).split(':')
+    if len(date_parts) != 3 or len(time_parts) != 3:
+        return None
+
+    fields = []
+    for i, part in enumerate(date_parts + time_parts):
+        if part and set(part.lower()) == {'x'}:
+            fields.append(None)
+            continue
+        if not part.isdigit():
+            return None
+        number = int(part)
+        if not _MINIMUMS[i] <= number <= _MAXIMUMS[i]:
+            return None
+        fields.append(number)
+
+    return tuple(fields)
+
+
+def compile_date_range(start_date: Union[str, date, datetime],
+                       end_date: Union[str, date, datetime],
+                       name: str = None) -> Optional[DateRangeRecurrence]:
+    """
+    Compile date or datetime strings with wildcards into a recurrence
+
+    :param start_date: start date or datetime string, e.g. "xxxx-xx-xx 08:00:00"
+    :type start_date: str
+    :param end_date: end date or datetime string, e.g. "xxxx-xx-xx 09:30:00"
+    :type end_date: str
+    :param name: (Optional) name of the date range, for logging
+    :type name: str, optional
+    :return: the compiled recurrence, or None if the strings are invalid
+    :rtype: DateRangeRecurrence
+    """
+    name = name or "Date Range"
+
+    if not start_date or not end_date:
+        logging.error(f"{name} is missing a start or end date string.")
+        return None
+
+    start_fields = _parse_wildcard_string(value=start_date, default_time=_DEFAULT_START_TIME)
+    end_fields = _parse_wildcard_string(value=end_date, default_time=_DEFAULT_END_TIME)
+    if not start_fields or not end_fields:
+        logging.error(f"{name} has invalid start or end date patterns.\nStart date: {start_date}\nEnd date: {end_date}")
+        return None
+
+    # Can't have a wildcard in one and not the other
+    for i, field_name in enumerate(_FIELD_NAMES):
+        if (start_fields[i] is None) != (end_fields[i] is None):
+            logging.error(f"{name} has incompatible {field_name} comparison. "
+                          f"Any wildcard elements must be in the same position in both the start and end date.\n"
+                          f"Start date: {start_date}\nEnd date: {end_date}")
+            return None
+
+    specified = [i for i, field in enumerate(start_fields) if field is not None]
+    least_significant_specified = max(specified) if specified else -1
+
+    # Wildcards with no specified field below them are expanded to cover their full range
+    start_fields = tuple(_EXPANDED_MINIMUMS[i] if field is None and i > least_significant_specified else field
+                         for i, field in enumerate(start_fields))
+    end_fields = tuple(_EXPANDED_MAXIMUMS[i] if field is None and i > least_significant_specified else field
+                       for i, field in enumerate(end_fields))
+
+    recurrence = DateRangeRecurrence(start_fields=start_fields, end_fields=end_fields)
+
+    window_start, window_end = recurrence.window_at(moment=datetime(1970, 1, 1))
+    if not window_start or not window_end or window_end < window_start:
+        logging.error(f"{name} ends before it starts.\nStart date: {start_date}\nEnd date: {end_date}")
+        return None
+
+    return recurrence
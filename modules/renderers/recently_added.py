@@ -1,5 +1,10 @@
+import concurrent.futures
+import glob
+import os
 import textwrap
-from typing import Union, Tuple
+import threading
+import time
+from typing import Callable, Dict, Optional, Union, Tuple
 
 import ffmpeg
 import requests
@@ -12,30 +17,37 @@ from modules.renderers.base import PrerollRenderer
 from modules.config_parser import Config
 
 LENGTH_SECONDS = 33.5
+# The part of the trailer used, skipping the studio logos most trailers start with
+TRAILER_START_SECONDS = 10
+# Only the part of the trailer used is downloaded, plus this much at the end, so rounding to whole frames never
+# leaves the preroll short
+TRAILER_DOWNLOAD_MARGIN_SECONDS = 1
+# The width the trailer is scaled to in the preroll, there is no point in downloading more
+TRAILER_WIDTH = 1600
 
-
-def _trim_background_music(background_music_file_path: str) -> str:
-    logging.info(f"Trimming {background_music_file_path} to {LENGTH_SECONDS} seconds")
-    video_file_path = ffmpeg_utils.trim_audio_file_to_length(audio_file_path=background_music_file_path,
-                                                             length_seconds=LENGTH_SECONDS,
-                                                             fade_in=True,
-                                                             fade_in_length=0.5,
-                                                             fade_out=True,
-                                                             fade_out_length=2)
-    logging.info(f"Converting {video_file_path} to MP3")
-    audio_file_path = f"{video_file_path.split('.')[0]}.mp3"
-    ffmpeg_utils.convert_video_to_audio(video_file_path=video_file_path, audio_file_path=audio_file_path)
-
-    return audio_file_path
+# The assets are retrieved at the same time, the render fails if retrieving any of them takes longer than this
+TRAILER_TIMEOUT_SECONDS = 300
+BACKGROUND_MUSIC_TIMEOUT_SECONDS = 300
+POSTER_TIMEOUT_SECONDS = 60
+BACKGROUND_MUSIC_FADE_IN_SECONDS = 0.5
+BACKGROUND_MUSIC_FADE_OUT_SECONDS = 2
 
 
 class RecentlyAddedPrerollRenderer(PrerollRenderer):
-    def __init__(self, render_folder: str, movie: Movie):
+    def __init__(self, render_folder: str, movie: Movie, asset_folder_name: str = None):
+        """
+        :param render_folder: The folder to create the asset folder in.
+        :param movie: The movie to render a preroll for.
+        :param asset_folder_name: A name for the asset folder that is stable across attempts, so assets retrieved by
+            an interrupted attempt are reused. A new temporary folder is used if not provided.
+        """
         super().__init__()
         self.download_folder = render_folder  # Will be set in render()
+        self._asset_folder_name = asset_folder_name
         self._video_file_name = "video"
         self._audio_file_name = "audio"
         self._poster_file_name = "poster.jpg"
+        self._cancelled = threading.Event()  # Set to stop retrieving the remaining assets once one has failed
         # Needs to end with epoch timestamp to sort correctly during rclone sync
         self._output_file_name = f"{AUTO_GENERATED_RECENTLY_ADDED_PREROLL_PREFIX}-{utils.now_epoch()}.mp4"
         self.movie_title = movie.title
@@ -52,53 +64,150 @@ class RecentlyAddedPrerollRenderer(PrerollRenderer):
         self.movie_audience_rating = getattr(movie, "audienceRating", None)  # 0.0 - 10.0
         self.movie_poster_url = getattr(movie, "posterUrl", None)
 
+    def _find_asset(self, file_name: str) -> Optional[str]:
+        """
+        Find an asset retrieved by an earlier attempt.
+
+        :param file_name: The file name of the asset, without extension.
+        :return: The path to the asset, or None if not retrieved yet.
+        """
+        for file_path in glob.glob(os.path.join(glob.escape(self.download_folder), f"{glob.escape(file_name)}.*")):
+            # Excludes unfinished downloads, e.g. "video.webm.part"
+            if os.path.splitext(os.path.basename(file_path))[0] == file_name:
+                return file_path
+        return None
+
+    def _raise_if_cancelled(self):
+        if self._cancelled.is_set():
+            raise concurrent.futures.CancelledError()
+
     @property
     def youtube_search_query_movie_title(self) -> str:
         return f'"{self.movie_title}" {self.movie_year or ""}'.strip()
 
     def _get_trailer(self, config: Config) -> str:
+        existing_file_path = self._find_asset(file_name=self._video_file_name)
+        if existing_file_path:
+            logging.info(f'Using previously retrieved trailer for "{self.movie_title}": {existing_file_path}')
+            return existing_file_path
+
         search_query = f"{self.youtube_search_query_movie_title} Official Movie Theatrical Trailer"
         logging.info(f'Retrieving trailer for "{self.movie_title}", YouTube search query: "{search_query}"')
         video_id = ytd.run_youtube_search(
             query=f"{self.youtube_search_query_movie_title} Official Movie Theatrical Trailer",
             selector_function=ytd.SelectorPresets.select_first_video,
             results_limit=5)
+        self._raise_if_cancelled()
         video_url = ytd.get_video_url(video_id=video_id)
+        # Only the part of the trailer the preroll uses, at no more than the resolution it uses
         video_file_path = ytd.download_youtube_video(url=video_url,
                                                      config=config,
                                                      output_dir=self.download_folder,
-                                                     output_filename=self._video_file_name)
+                                                     output_filename=self._video_file_name,
+                                                     cancel_event=self._cancelled,
+                                                     section=(TRAILER_START_SECONDS,
+                                                              TRAILER_START_SECONDS + LENGTH_SECONDS
+                                                              + TRAILER_DOWNLOAD_MARGIN_SECONDS),
+                                                     max_width=TRAILER_WIDTH,
+                                                     video_only=True)
         logging.info("Trailer retrieved successfully")
         return video_file_path
 
     def _get_background_music(self, config: Config) -> str:
+        existing_file_path = self._find_asset(file_name=self._audio_file_name)
+        if existing_file_path:
+            logging.info(f'Using previously retrieved background music for "{self.movie_title}": {existing_file_path}')
+            return existing_file_path
+
         search_query = f"{self.youtube_search_query_movie_title} movie soundtrack"
         logging.info(f'Retrieving background music for "{self.movie_title}", YouTube search query: "{search_query}"')
         video_id = ytd.run_youtube_search(query=f"{self.youtube_search_query_movie_title} movie soundtrack",
                                           selector_function=ytd.SelectorPresets.select_first_video,
                                           results_limit=5)
+        self._raise_if_cancelled()
         video_url = ytd.get_video_url(video_id=video_id)
-        video_file_path = ytd.download_youtube_video(url=video_url,
+        # Only the audio, and only as much of it as the preroll uses
+        audio_file_path = ytd.download_youtube_audio(url=video_url,
                                                      config=config,
                                                      output_dir=self.download_folder,
-                                                     output_filename=self._audio_file_name)
+                                                     output_filename=self._audio_file_name,
+                                                     cancel_event=self._cancelled,
+                                                     max_length_seconds=LENGTH_SECONDS)
         logging.info("Background music retrieved successfully")
-        return video_file_path
+        return audio_file_path
 
     def _get_movie_poster(self) -> Union[str, None]:
         logging.info(f'Retrieving poster for "{self.movie_title}"')
         if not self.movie_poster_url:
             logging.warning(f"No poster URL available for {self.movie_title}")
             return None
-        res = requests.get(self.movie_poster_url)
         file_path = f"{self.download_folder}/{self._poster_file_name}"
-        with open(file_path, "wb") as f:
+        if os.path.exists(file_path):
+            logging.info(f'Using previously retrieved poster for "{self.movie_title}"')
+            return file_path
+
+        res = requests.get(self.movie_poster_url, timeout=POSTER_TIMEOUT_SECONDS)
+        self._raise_if_cancelled()
+        # The poster is kept for retries, so an error page saved in its place would fail every one of them
+        res.raise_for_status()
+        content_type = res.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise ValueError(f'Poster for "{self.movie_title}" is not an image: {content_type or "no content type"}')
+        with open(f"{file_path}.partial", "wb") as f:
             f.write(res.content)
+        os.replace(f"{file_path}.partial", file_path)
 
         logging.info("Poster retrieved successfully")
         return file_path
 
-    def render(self, config: Config) -> Tuple[Union[str, None], Union[str, None]]:
+    def _retrieve_assets(self, config: Config) -> Tuple[str, str, Union[str, None]]:
+        """
+        Retrieve the trailer, background music and poster at the same time.
+
+        If retrieving any of them fails or times out, retrieving the others is cancelled and the error is raised once
+        they have stopped, so nothing is still writing to the asset folder when it is cleaned up.
+
+        :param config: The configuration for Plex Prerolls.
+        :return: The paths to the trailer, the background music and the poster.
+        """
+        stages: Dict[str, Tuple[Callable[[], str], int]] = {
+            "trailer": (lambda: self._get_trailer(config=config), TRAILER_TIMEOUT_SECONDS),
+            "background music": (lambda: self._get_background_music(config=config), BACKGROUND_MUSIC_TIMEOUT_SECONDS),
+            "poster": (self._get_movie_poster, POSTER_TIMEOUT_SECONDS),
+        }
+        started = time.monotonic()
+        deadlines = {name: started + timeout for name, (_, timeout) in stages.items()}
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="AssetRetrieval")
+        futures = {name: executor.submit(function) for name, (function, _) in stages.items()}
+        try:
+            pending = set(futures.values())
+            while pending:
+                next_deadline = min(deadlines[name] for name, future in futures.items() if future in pending)
+                done, pending = concurrent.futures.wait(pending, timeout=max(next_deadline - time.monotonic(), 0),
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for name, future in futures.items():
+                    if future in done and future.exception():
+                        logging.error(f'Could not retrieve {name} for "{self.movie_title}", cancelling the others')
+                        raise future.exception()
+                    if future in pending and time.monotonic() >= deadlines[name]:
+                        raise TimeoutError(f'Retrieving {name} for "{self.movie_title}" took longer than '
+                                           f'{stages[name][1]} seconds')
+        except BaseException:
+            self._cancelled.set()
+            # Stages stop at their next check, but ranged downloads only check once they finish, which their stall
+            # timeout bounds
+            running = [name for name, future in futures.items() if future.running()]
+            if running:
+                logging.info(f'Waiting for retrieving {", ".join(running)} for "{self.movie_title}" to stop')
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+        executor.shutdown()
+        return futures["trailer"].result(), futures["background music"].result(), futures["poster"].result()
+
+    def render(self, config: Config,
+               on_rendering: Callable[[], None] = None) -> Tuple[Union[str, None], Union[str, None]]:
         if not self.movie_title:
             logging.warning("No movie title available, cannot build preroll")
             return None, None
@@ -111,13 +220,16 @@ class RecentlyAddedPrerollRenderer(PrerollRenderer):
             logging.warning("Movie is too old, not going to attempt to build preroll")
             return None, None
 
-        self.download_folder = utils.get_temporary_directory_path(parent_directory=self.download_folder)
+        if self._asset_folder_name:
+            self.download_folder = os.path.join(self.download_folder, self._asset_folder_name)
+            utils.create_directory(directory=self.download_folder)
+        else:
+            self.download_folder = utils.get_temporary_directory_path(parent_directory=self.download_folder)
         logging.info(f'Retrieving assets for preroll of "{self.movie_title}", saving to {self.download_folder}')
-        video_path = self._get_trailer(config=config)
-        audio_path = self._get_background_music(config=config)
-        audio_path = _trim_background_music(background_music_file_path=audio_path)
-        poster_path = self._get_movie_poster()
+        video_path, audio_path, poster_path = self._retrieve_assets(config=config)
 
+        if on_rendering:
+            on_rendering()
         logging.info(f'Rendering preroll for "{self.movie_title}"')
         title_position_offset = (len(self.movie_title) * 33) / 2 - 7
         if title_position_offset > 716:
@@ -137,9 +249,15 @@ class RecentlyAddedPrerollRenderer(PrerollRenderer):
         description_font = f"{ASSETS_DIR}/Roboto-Light.ttf"
 
         # Prepare preroll video
-        ffmpeg_command = ffmpeg.input(video_path, ss=10, t=LENGTH_SECONDS)
-        ffmpeg_command = ffmpeg.filter(ffmpeg_command, "scale", 1600, -1)
-        ffmpeg_audio_command = ffmpeg.input(audio_path)
+        # The downloaded part of the trailer starts exactly where the part used does
+        ffmpeg_command = ffmpeg.input(video_path, t=LENGTH_SECONDS)
+        ffmpeg_command = ffmpeg.filter(ffmpeg_command, "scale", TRAILER_WIDTH, -1)
+        # Trimmed, faded and encoded as part of the render, rather than written to an intermediate file first
+        ffmpeg_audio_command = ffmpeg_utils.trim_and_fade_audio_stream(
+            audio_file_path=audio_path,
+            length_seconds=LENGTH_SECONDS,
+            fade_in_length=BACKGROUND_MUSIC_FADE_IN_SECONDS,
+            fade_out_length=BACKGROUND_MUSIC_FADE_OUT_SECONDS)
         ffmpeg_command = ffmpeg.overlay(sidebar, ffmpeg_command, x=300, y=125)
         ffmpeg_command = ffmpeg.overlay(ffmpeg_command, poster, x=40, y=195, enable="gte(t,1)")
 
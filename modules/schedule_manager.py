@@ -1,5 +1,10 @@
-from typing import List
+import math
+import random
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+import modules.files as files
 import modules.logs as logging
 from modules import models
 from modules.config_parser import (
@@ -8,35 +13,158 @@ from modules.config_parser import (
 from modules.models import ScheduleEntry
 
 
+class ScheduleEvaluation(NamedTuple):
+    """
+    The immutable result of evaluating all schedules at a single moment in time.
+    """
+    evaluated_at: datetime
+    weekly_schedules: Tuple[ScheduleEntry, ...]
+    monthly_schedules: Tuple[ScheduleEntry, ...]
+    date_range_schedules: Tuple[ScheduleEntry, ...]
+    always_schedules: Tuple[ScheduleEntry, ...]
+    auto_generated_schedules: Tuple[ScheduleEntry, ...]
+    disable_always: bool
+    paths: Tuple[str, ...]
+
+    @property
+    def all_schedules(self) -> Tuple[ScheduleEntry, ...]:
+        return (self.weekly_schedules + self.monthly_schedules + self.date_range_schedules +
+                self.always_schedules + self.auto_generated_schedules)
+
+
+def _active_schedules(schedules: List[ScheduleEntry], at: datetime) -> Tuple[ScheduleEntry, ...]:
+    active_schedules = []
+    for schedule in schedules:
+        if schedule.is_active_at(moment=at):
+            # Recurring schedules carry the window active at the evaluation time, not the one they were created in
+            start_date, end_date = schedule.window_at(moment=at)
+            active_schedules.append(schedule._replace(start_date=start_date, end_date=end_date))
+    return tuple(active_schedules)
+
+
+def _weighted_paths(schedules: Tuple[ScheduleEntry, ...]) -> Tuple[str, ...]:
+    """
+    Build the smallest list of paths in which each path appears in proportion to its total weight.
+
+    Plex picks randomly from the list, so only the relative number of copies matters: copy counts are summed across
+    schedules (so shared paths are deduplicated) and then divided by their greatest common divisor.
+
+    :param schedules: The active schedules.
+    :return: The weighted paths, in order of first appearance.
+    """
+    copies: Dict[str, int] = {}
+    for schedule in schedules:
+        for path in schedule.paths:
+            if path:
+                copies[path] = copies.get(path, 0) + schedule.weight
+
+    divisor = math.gcd(*copies.values()) if copies else 1
+
+    paths = []
+    for path, count in copies.items():
+        paths.extend([path] * (count // divisor))
+
+    return tuple(paths)
+
+
+def _path_length(path: str) -> int:
+    return len(path.encode("utf-8")) + 1  # Including the separator
+
+
+def _budgeted_paths(schedules: Tuple[ScheduleEntry, ...], max_length: int) -> Tuple[str, ...]:
+    """
+    Select a weighted random subset of paths whose pre-roll string fits within a maximum length.
+
+    The selection is stratified by schedule: each schedule gets the same fraction of the budget as it takes up in the
+    full weighted list, so the odds of each schedule playing are kept. A new subset is picked on every call, so the
+    whole library still rotates through over time.
+
+    :param schedules: The active schedules.
+    :param max_length: The maximum length of the pre-roll string, in bytes. 0 for no limit.
+    :return: The weighted paths, all of them if they fit.
+    """
+    paths = _weighted_paths(schedules=schedules)
+    budget = max_length + 1  # The last path has no separator
+    if not max_length or sum(_path_length(path=path) for path in paths) <= budget:
+        return paths
+
+    pools = [[path for path in dict.fromkeys(schedule.paths) if path] for schedule in schedules]
+    pool_lengths = [sum(_path_length(path=path) for path in pool) for pool in pools]
+    weighted_lengths = [schedule.weight * pool_length for schedule, pool_length in zip(schedules, pool_lengths)]
+    total_length = sum(weighted_lengths)
+
+    # Schedules whose share is too small for any of their paths still get one random path, so none is left out
+    selected: List[List[str]] = [[] for _ in schedules]
+    reserved = set()
+    for index, pool in enumerate(pools):
+        if pool and budget * weighted_lengths[index] // total_length < min(map(_path_length, pool)):
+            fitting = [path for path in pool if _path_length(path=path) <= budget]
+            if fitting:
+                selected[index].append(random.choice(fitting))
+                budget -= _path_length(path=selected[index][0])
+            reserved.add(index)
+            total_length -= weighted_lengths[index]
+
+    for index, pool in enumerate(pools):
+        if index in reserved or not pool:
+            continue
+
+        share = budget * weighted_lengths[index] // total_length
+        # Heavily weighted schedules may have room for every path more than once
+        copies, share = divmod(share, pool_lengths[index])
+        selected[index].extend(pool * copies)
+        for path in random.sample(population=pool, k=len(pool)):
+            if _path_length(path=path) <= share:
+                selected[index].append(path)
+                share -= _path_length(path=path)
+
+    logging.info(f"Pre-roll paths do not fit in {max_length} bytes, using a random subset of "
+                 f"{sum(len(schedule_paths) for schedule_paths in selected)} of {len(paths)} paths")
+
+    return tuple(path for schedule_paths in selected for path in schedule_paths)
+
+
+def _log_message(schedules: Tuple[ScheduleEntry, ...]) -> str:
+    return "".join(f"- {schedule.name}\n" for schedule in schedules)
+
+
 class ScheduleManager:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, at: datetime = None):
         self._config = config
+        self._at = at or datetime.now()  # The initial evaluation time
         self.weekly_schedules: List[ScheduleEntry] = []
         self.monthly_schedules: List[ScheduleEntry] = []
         self.date_range_schedules: List[ScheduleEntry] = []
         self.always_schedules: List[ScheduleEntry] = []
         self.auto_generated_schedules: List[ScheduleEntry] = []
+        self._glob_cache = files.GlobCache()  # Shared by all sections, so overlapping patterns are only globbed once
         self._parse_schedules()  # Only call this once, otherwise it will duplicate schedules
+        self.evaluation: ScheduleEvaluation = self.evaluate(at=self._at)
 
     def _parse_schedules(self):
         logging.info("Parsing schedules...")
+        # Paths are only resolved (globbed) if and when their schedule is active at evaluation time
         if self._config.weekly.enabled:
             for week in self._config.weekly.weeks:
                 self.weekly_schedules.append(models.schedule_entry_from_week_number(
                     week_number=week.number,
-                    paths=week.all_paths(
-                        advanced_settings=self._config.advanced),
+                    paths=partial(week.all_paths, advanced_settings=self._config.advanced,
+                                  glob_cache=self._glob_cache),
                     weight=week.weight,
-                    disable_always=week.disable_always))
+                    disable_always=week.disable_always,
+                    at=self._at,
+                    local_roots=week.path_globbing.local_root_folders))
 
         if self._config.monthly.enabled:
             for month in self._config.monthly.months:
                 self.monthly_schedules.append(models.schedule_entry_from_month_number(
                     month_number=month.number,
-                    paths=month.all_paths(
-                        advanced_settings=self._config.advanced),
+                    paths=partial(month.all_paths, advanced_settings=self._config.advanced,
+                                  glob_cache=self._glob_cache),
                     weight=month.weight,
-                    disable_always=month.disable_always))
+                    disable_always=month.disable_always,
+                    at=self._at,
+                    local_roots=month.path_globbing.local_root_folders))
 
         if self._config.date_ranges.enabled:
             for date_range in self._config.date_ranges.ranges:
@@ -44,149 +172,176 @@ class ScheduleManager:
                     start_date_string=date_range.start_date,
                     end_date_string=date_range.end_date,
                     holiday=date_range.holiday,
-                    paths=date_range.all_paths(
-                        advanced_settings=self._config.advanced),
+                    paths=partial(date_range.all_paths, advanced_settings=self._config.advanced,
+                                  glob_cache=self._glob_cache),
                     weight=date_range.weight,
                     name=date_range.name,
-                    disable_always=date_range.disable_always)
+                    disable_always=date_range.disable_always,
+                    recurrence=date_range.recurrence,
+                    at=self._at,
+                    local_roots=date_range.path_globbing.local_root_folders)
                 if entry:
                     self.date_range_schedules.append(entry)
 
         if self._config.always.enabled:
             self.always_schedules.append(models.schedule_entry_from_always(
-                paths=self._config.always.all_paths(
-                    advanced_settings=self._config.advanced),
-                count=self._config.always.random_count(
-                    advanced_settings=self._config.advanced),
-                weight=self._config.always.weight))
+                paths=partial(self._config.always.all_paths, advanced_settings=self._config.advanced,
+                              glob_cache=self._glob_cache),
+                count=partial(self._config.always.random_count, advanced_settings=self._config.advanced),
+                weight=self._config.always.weight,
+                local_roots=self._config.always.path_globbing.local_root_folders))
 
         if self._config.advanced.auto_generation.recently_added.enabled:
             self.auto_generated_schedules.append(models.schedule_entry_from_auto_generated(
                 name="Recently Added",
-                paths=self._config.advanced.auto_generation.recently_added.all_paths(
-                    advanced_settings=self._config.advanced),
-                weight=1))
+                paths=partial(self._config.advanced.auto_generation.recently_added.all_paths,
+                              advanced_settings=self._config.advanced,
+                              glob_cache=self._glob_cache),
+                weight=1,
+                local_roots=[self._config.advanced.auto_generation.recently_added.local_files_root]))
+
+    def evaluate(self, at: datetime) -> ScheduleEvaluation:
+        """
+        Evaluate all schedules at a single moment in time. Recurring schedules are checked against the window they have
+        at that moment, so any moment can be evaluated, not only the one the schedules were parsed at.
+
+        :param at: The moment to evaluate the schedules at.
+        :return: The active schedules, whether the always schedules are disabled and the weighted paths.
+        """
+        weekly_schedules = _active_schedules(schedules=self.weekly_schedules, at=at)
+        monthly_schedules = _active_schedules(schedules=self.monthly_schedules, at=at)
+        date_range_schedules = _active_schedules(schedules=self.date_range_schedules, at=at)
+
+        disable_always = any(schedule.disable_always
+                             for schedule in weekly_schedules + monthly_schedules + date_range_schedules)
+
+        always_schedules = ()
+        auto_generated_schedules = ()
+        if not disable_always:
+            always_schedules = _active_schedules(schedules=self.always_schedules, at=at)
+            auto_generated_schedules = _active_schedules(schedules=self.auto_generated_schedules, at=at)
+
+        paths = _budgeted_paths(schedules=weekly_schedules + monthly_schedules + date_range_schedules +
+                                          always_schedules + auto_generated_schedules,
+                                max_length=self._config.plex.max_pre_roll_length)
+
+        return ScheduleEvaluation(evaluated_at=at,
+                                  weekly_schedules=weekly_schedules,
+                                  monthly_schedules=monthly_schedules,
+                                  date_range_schedules=date_range_schedules,
+                                  always_schedules=always_schedules,
+                                  auto_generated_schedules=auto_generated_schedules,
+                                  disable_always=disable_always,
+                                  paths=paths)
 
     @property
     def valid_weekly_schedules(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.weekly_schedules if schedule.should_be_used]
+        return list(self.evaluation.weekly_schedules)
 
     @property
     def valid_weekly_schedule_count(self) -> int:
-        return len(self.valid_weekly_schedules)
+        return len(self.evaluation.weekly_schedules)
 
     @property
     def valid_weekly_schedule_log_message(self) -> str:
-        valid_schedules = ""
-        for schedule in self.valid_weekly_schedules:
-            valid_schedules += f"- {schedule.name}\n"
-        return valid_schedules
+        return _log_message(schedules=self.evaluation.weekly_schedules)
 
     @property
     def valid_monthly_schedules(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.monthly_schedules if schedule.should_be_used]
+        return list(self.evaluation.monthly_schedules)
 
     @property
     def valid_monthly_schedule_count(self) -> int:
-        return len(self.valid_monthly_schedules)
+        return len(self.evaluation.monthly_schedules)
 
     @property
     def valid_monthly_schedule_log_message(self) -> str:
-        valid_schedules = ""
-        for schedule in self.valid_monthly_schedules:
-            valid_schedules += f"- {schedule.name}\n"
-        return valid_schedules
+        return _log_message(schedules=self.evaluation.monthly_schedules)
 
     @property
     def valid_date_range_schedules(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.date_range_schedules if schedule.should_be_used]
+        return list(self.evaluation.date_range_schedules)
 
     @property
     def valid_date_range_schedule_count(self) -> int:
-        return len(self.valid_date_range_schedules)
+        return len(self.evaluation.date_range_schedules)
 
     @property
     def valid_date_range_schedule_log_message(self) -> str:
-        valid_schedules = ""
-        for schedule in self.valid_date_range_schedules:
-            valid_schedules += f"- {schedule.name}\n"
-        return valid_schedules
+        return _log_message(schedules=self.evaluation.date_range_schedules)
 
     @property
     def valid_always_schedules(self) -> List[ScheduleEntry]:
-        if self.disable_always:
-            return []
-
-        return [schedule for schedule in self.always_schedules if schedule.should_be_used]
+        return list(self.evaluation.always_schedules)
 
     @property
     def valid_always_schedule_count(self) -> int:
-        return len(self.valid_always_schedules)
+        return len(self.evaluation.always_schedules)
 
     @property
     def valid_always_schedule_log_message(self) -> str:
-        valid_schedules = ""
-        for schedule in self.valid_always_schedules:
-            valid_schedules += f"- {schedule.name}\n"
-        return valid_schedules
+        return _log_message(schedules=self.evaluation.always_schedules)
 
     @property
     def valid_auto_generated_schedules(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.auto_generated_schedules if schedule.should_be_used]
+        return list(self.evaluation.auto_generated_schedules)
 
     @property
     def valid_auto_generated_schedule_count(self) -> int:
-        return len(self.valid_auto_generated_schedules)
+        return len(self.evaluation.auto_generated_schedules)
 
     @property
     def auto_generated_schedules_log_message(self) -> str:
-        valid_schedules = ""
-        for schedule in self.valid_auto_generated_schedules:
-            valid_schedules += f"- {schedule.name}\n"
-        return valid_schedules
+        return _log_message(schedules=self.evaluation.auto_generated_schedules)
 
     @property
     def all_schedules_except_always(self) -> List[ScheduleEntry]:
         # Auto generated schedules are not included, considered "Always"
         return self.weekly_schedules + self.monthly_schedules + self.date_range_schedules
 
-    @property
-    def all_valid_schedule_except_always(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.all_schedules_except_always if schedule.should_be_used]
-
     @property
     def disable_always(self) -> bool:
-        return any([schedule.disable_always for schedule in self.all_valid_schedule_except_always])
-
-    @property
-    def all_schedules(self) -> List[ScheduleEntry]:
-        schedules = self.all_schedules_except_always
-
-        if not self.disable_always:
-            schedules += self.always_schedules
-            schedules += self.auto_generated_schedules
-
-        return schedules
+        return self.evaluation.disable_always
 
     @property
     def all_valid_schedules(self) -> List[ScheduleEntry]:
-        return [schedule for schedule in self.all_schedules if schedule.should_be_used]
+        return list(self.evaluation.all_schedules)
 
     @property
     def all_valid_paths(self) -> List[str]:
         """
-        Returns a list of all valid paths from all valid schedules. Accounts for weight.
+        Returns a list of all valid paths from all valid schedules. Accounts for weight, using as few copies as possible.
         """
-        paths = []
-        for schedule in self.all_valid_schedules:
-            for _ in range(schedule.weight):
-                paths.extend(schedule.paths)
+        return list(self.evaluation.paths)
 
-        return paths
+    def next_transition(self, after: datetime) -> Optional[datetime]:
+        """
+        Get the next moment after the provided time at which the set of valid schedules may change.
+
+        :param after: The time to search from.
+        :return: The earliest upcoming start or end boundary across all schedules, or None if there is none.
+        """
+        transitions = []
+
+        for schedule in self.all_schedules_except_always + self.always_schedules + self.auto_generated_schedules:
+            transition = schedule.next_transition(after=after)
+            if transition:
+                transitions.append(transition)
+
+        return min(transitions, default=None)
+
+    def is_affected_by(self, directories: List[str]) -> bool:
+        """
+        Check whether changes to any of the provided directories could change the currently valid paths.
+
+        :param directories: The changed directories.
+        :return: True if any currently valid schedule globs paths from one of the directories.
+        """
+        return any(schedule.depends_on(directories=directories) for schedule in self.evaluation.all_schedules)
 
     @property
     def valid_schedule_count(self) -> int:
-        return len(self.all_valid_schedules)
+        return len(self.evaluation.all_schedules)
 
     @property
     def valid_schedule_count_log_message(self) -> str:
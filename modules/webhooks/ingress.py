@@ -0,0 +1,137 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+import pydantic_core
+from flask import request as flask_request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from modules.webhooks.plex import PlexWebhook
+
+# Quotes inside JSON strings are escaped, so this only matches the key itself, which Plex only uses at the top level
+_EVENT_PATTERN = re.compile(r'"event"\s*:\s*"([^"\\]*)"')
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+def _read_limited(request: flask_request, size: int, received: int, max_body_size: int) -> bytes:
+    chunk = request.stream.read(size)
+    if received + len(chunk) > max_body_size:
+        raise RequestEntityTooLarge()
+    return chunk
+
+
+def read_form_field(request: flask_request, field_name: str, max_body_size: int) -> Optional[str]:
+    """
+    Read a single field of a form, streaming the body rather than parsing and buffering all of it.
+
+    Multipart bodies are only read up to the end of the field, and file parts before it are skipped without being
+    buffered, e.g. the thumbnail Plex attaches to some webhooks.
+
+    :param request: The request to read the form from.
+    :param field_name: The name of the field.
+    :param max_body_size: The maximum number of bytes to read, in total.
+    :return: The value of the field, or None if the form does not have the field or cannot be parsed.
+    :raises RequestEntityTooLarge: If the body is larger than max_body_size.
+    """
+    if request.content_length is not None and request.content_length > max_body_size:
+        raise RequestEntityTooLarge()
+
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
+        body = _read_limited(request=request, size=max_body_size + 1, received=0, max_body_size=max_body_size)
+        values = parse_qs(body.decode("utf-8", errors="replace")).get(field_name)
+        return values[0] if values else None
+
+    decoder = MultipartDecoder(boundary=boundary.encode("latin-1"))
+    received = 0
+    in_field = False
+    value = bytearray()
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                chunk = _read_limited(request=request, size=_READ_CHUNK_SIZE, received=received,
+                                      max_body_size=max_body_size)
+                received += len(chunk)
+                decoder.receive_data(chunk or None)  # None marks the end of the body
+            elif isinstance(event, Field):
+                in_field = event.name == field_name
+            elif isinstance(event, File):
+                in_field = False
+            elif isinstance(event, Data) and in_field:
+                value.extend(event.data)
+                if not event.more_data:
+                    return value.decode("utf-8", errors="replace")
+            elif isinstance(event, Epilogue):
+                return None
+    except ValueError:  # Malformed multipart body
+        return None
+
+
+class WebhookFilter:
+    """
+    Drops webhooks that cannot become a render job using only their event and metadata type, and only validates the
+    full payload of the rest.
+
+    Plex sends every event to the same endpoint, and playback events outnumber new media by far, so most payloads are
+    dropped after a single regular expression search.
+    """
+
+    def __init__(self, event: str, metadata_type: str):
+        """
+        :param event: The only event to accept, e.g. "library.new".
+        :param metadata_type: The only metadata type to accept, e.g. "movie".
+        """
+        self._event = event
+        self._metadata_type = metadata_type
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def accept(self, payload: str) -> Optional[PlexWebhook]:
+        """
+        Check whether a webhook payload can become a render job.
+
+        :param payload: The raw JSON payload of the webhook.
+        :return: The validated webhook, or None if it should be dropped.
+        """
+        match = _EVENT_PATTERN.search(payload)
+        if not match or match.group(1) != self._event:
+            self._count(outcome="dropped_event")
+            return None
+
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            self._count(outcome="dropped_invalid")
+            return None
+
+        metadata = data.get("Metadata") if isinstance(data, dict) else None
+        if not isinstance(metadata, dict) or metadata.get("type") != self._metadata_type:
+            self._count(outcome="dropped_type")
+            return None
+
+        try:
+            webhook = PlexWebhook(**data)
+        except pydantic_core.ValidationError:
+            self._count(outcome="dropped_invalid")
+            return None
+
+        self._count(outcome="accepted")
+        return webhook
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {outcome: self._counts[outcome]
+                      for outcome in ("accepted", "dropped_event", "dropped_type", "dropped_invalid")}
+        counts["dropped"] = counts["dropped_event"] + counts["dropped_type"] + counts["dropped_invalid"]
+        return counts
@@ -0,0 +1,84 @@
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from plexapi.video import Movie
+
+import modules.logs as logging
+from modules.config_parser import Config
+from modules.plex_connector import PlexConnector
+from modules.webhooks.plex import PlexWebhook
+
+
+class _PendingWebhook(NamedTuple):
+    webhook: PlexWebhook
+    config: Config
+    output_dir: str
+
+
+class MetadataBatcher:
+    """
+    Collects the movies of incoming webhooks for a short window, then looks them all up in Plex at once.
+
+    Plex sends one webhook per movie, so importing a few hundred movies costs a few Plex requests instead of hundreds.
+    """
+
+    def __init__(self, on_resolved: Callable[[PlexWebhook, Optional[Movie], Config, str], None],
+                 window_seconds: float = 2):
+        """
+        :param on_resolved: Called with each webhook, its movie (None if not found), config and output directory.
+        :param window_seconds: How long to collect webhooks for after the first one arrives, in seconds.
+        """
+        self._on_resolved = on_resolved
+        self._window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending: List[_PendingWebhook] = []
+
+    def add(self, webhook: PlexWebhook, config: Config, output_dir: str, max_pending: int = None) -> bool:
+        """
+        Queue a webhook to be resolved with the next batch.
+
+        :param webhook: The webhook of a newly added movie.
+        :param config: The config to process the webhook with.
+        :param output_dir: The directory to render the pre-roll in.
+        :param max_pending: Optionally the maximum number of webhooks waiting for the next batch.
+        :return: True if the webhook was queued, False if max_pending webhooks are already waiting.
+        """
+        with self._lock:
+            if max_pending is not None and len(self._pending) >= max_pending:
+                return False
+            self._pending.append(_PendingWebhook(webhook=webhook, config=config, output_dir=output_dir))
+            if len(self._pending) > 1:
+                return True  # A flush is already scheduled
+
+        timer = threading.Timer(interval=self._window_seconds, function=self.flush)
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def flush(self):
+        """
+        Resolve all queued webhooks now.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        # The config may have been reloaded during the window, look up each group with the config it arrived with
+        groups: Dict[int, Tuple[Config, List[_PendingWebhook]]] = {}
+        for item in pending:
+            groups.setdefault(id(item.config), (item.config, []))[1].append(item)
+
+        for config, items in groups.values():
+            logging.info(f"Retrieving information from Plex for {len(items)} recently added movie(s)")
+            rating_keys = [item.webhook.rating_key for item in items]
+            try:
+                plex_connector = PlexConnector(host=config.plex.url, token=config.plex.token,
+                                               pool_size=config.plex.connection_pool_size)
+            except Exception as e:
+                logging.error(f"Could not connect to Plex to process {len(items)} recently added movie(s): {e}")
+                continue
+            movies = plex_connector.get_movies(rating_keys=[rating_key for rating_key in rating_keys if rating_key])
+            for item, rating_key in zip(items, rating_keys):
+                try:
+                    self._on_resolved(item.webhook, movies.get(rating_key), config, item.output_dir)
+                except Exception as e:
+                    logging.error(f'Error processing recently added movie "{item.webhook.metadata.title}": {e}')
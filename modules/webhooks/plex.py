@@ -81,3 +81,13 @@ class PlexWebhook(BaseModel):
     @property
     def event_type(self) -> PlexWebhookEventType:
         return PlexWebhookEventType(self.event)
+
+    @property
+    def rating_key(self) -> Optional[str]:
+        if not self.metadata:
+            return None
+        if self.metadata.ratingKey:
+            return self.metadata.ratingKey
+        if self.metadata.key:
+            return self.metadata.key.rstrip("/").rsplit("/", 1)[-1]  # e.g. "/library/metadata/123"
+        return None
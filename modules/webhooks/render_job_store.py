@@ -0,0 +1,75 @@
+import sqlite3
+import threading
+from typing import List, NamedTuple
+
+
+class StoredRenderJob(NamedTuple):
+    key: str
+    title: str
+    priority: float
+    state: str
+    payload: str
+
+
+class RenderJobStore:
+    """
+    Keeps unfinished render jobs in a SQLite database, so they can be resumed after a restart.
+
+    Jobs are removed once they finish, the database only ever holds work that still has to be done.
+    """
+
+    def __init__(self, database_path: str):
+        """
+        :param database_path: The path to the SQLite database file, created if it does not exist.
+        """
+        self._lock = threading.Lock()
+        # Shared by the webhook and worker threads, access is serialized with the lock
+        self._connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                key TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                priority REAL NOT NULL,
+                state TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def save(self, key: str, title: str, priority: float, state: str, payload: str):
+        """
+        Store a job, replacing any stored job with the same key.
+
+        :param key: The unique key of the job, e.g. the rating key of the movie.
+        :param title: A description of the job.
+        :param priority: The priority of the job.
+        :param state: The state of the job.
+        :param payload: Everything needed to run the job again, e.g. the webhook as JSON.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO render_jobs (key, title, priority, state, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, title, priority, state, payload))
+
+    def update_state(self, key: str, state: str):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE render_jobs SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?", (state, key))
+
+    def remove(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM render_jobs WHERE key = ?", (key,))
+
+    def all(self) -> List[StoredRenderJob]:
+        """
+        Get all stored jobs, highest priority first.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, title, priority, state, payload FROM render_jobs ORDER BY priority DESC").fetchall()
+        return [StoredRenderJob(*row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
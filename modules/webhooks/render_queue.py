@@ -0,0 +1,258 @@
+import collections
+import enum
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import modules.logs as logging
+from modules.webhooks.render_job_store import RenderJobStore
+
+
+class RenderJobState(enum.Enum):
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    RENDERING = "rendering"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+class RenderJob:
+    def __init__(self, job_id: int, title: str, priority: float = 0, key: str = None,
+                 on_state_change: Callable[['RenderJob'], None] = None):
+        self.id = job_id
+        self.title = title
+        self.priority = priority
+        self.key = key
+        self.state = RenderJobState.QUEUED
+        self.error: Optional[str] = None
+        self.queued_at = datetime.now()
+        self.updated_at = self.queued_at
+        self._on_state_change = on_state_change
+
+    @property
+    def is_finished(self) -> bool:
+        return self.state in (RenderJobState.DONE, RenderJobState.FAILED, RenderJobState.SKIPPED)
+
+    def set_state(self, state: RenderJobState, error: str = None):
+        self.state = state
+        self.error = error
+        self.updated_at = datetime.now()
+        if self._on_state_change:
+            self._on_state_change(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "key": self.key,
+            "title": self.title,
+            "priority": self.priority,
+            "state": self.state.value,
+            "error": self.error,
+            "queued_at": self.queued_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class RenderQueue:
+    """
+    Runs pre-roll renders on a fixed number of worker threads, so a burst of webhooks cannot start an unbounded number
+    of downloads and encodes at once.
+
+    Jobs start in the downloading state when a worker picks them up, the task moves them on to rendering. A task that
+    returns marks its job as done, a task that raises marks it as failed.
+
+    Jobs submitted with a key are stored while unfinished if a store is given, see RenderJobStore. Submitting a job
+    with the same key as an unfinished job returns the existing job.
+
+    Waiting jobs are run highest priority first. If only a number of outputs are kept, waiting jobs that would not
+    rank among them once everything queued has run are skipped rather than rendered only to be deleted.
+    """
+
+    def __init__(self, worker_count: int = 1, max_queue_depth: int = 50, retain_count: Optional[int] = None,
+                 history_size: int = 100, store: RenderJobStore = None):
+        """
+        :param worker_count: The number of jobs to run at the same time.
+        :param max_queue_depth: The maximum number of jobs waiting for a worker, further jobs are rejected.
+        :param retain_count: The number of highest priority outputs that are kept, None to keep all.
+        :param history_size: The number of finished jobs to keep for reporting.
+        :param store: Where to keep unfinished jobs, so they survive a restart.
+        """
+        self._store = store
+        self._condition = threading.Condition()
+        self._pending: Deque[Tuple[RenderJob, Callable[[RenderJob], None]]] = collections.deque()
+        self._jobs: Dict[int, RenderJob] = {}
+        self._workers: Dict[int, threading.Thread] = {}
+        self._job_ids = itertools.count(1)
+        self._history_size = history_size
+        self._worker_count = 0
+        self._max_queue_depth = 0
+        self._retain_count: Optional[int] = None
+        self._stopped = False
+        self.configure(worker_count=worker_count, max_queue_depth=max_queue_depth, retain_count=retain_count)
+
+    def configure(self, worker_count: int, max_queue_depth: int, retain_count: Optional[int] = None):
+        """
+        Change the number of workers and the queue limits. Removed workers finish their current job first.
+
+        :param worker_count: The number of jobs to run at the same time.
+        :param max_queue_depth: The maximum number of jobs waiting for a worker.
+        :param retain_count: The number of highest priority outputs that are kept, None to keep all.
+        """
+        with self._condition:
+            self._worker_count = 0 if self._stopped else worker_count
+            self._max_queue_depth = max_queue_depth
+            self._retain_count = retain_count
+            self._skip_unretained_jobs()
+            for index in range(self._worker_count):
+                if index not in self._workers:
+                    worker = threading.Thread(target=self._run, args=(index,), name=f"RenderWorker-{index}",
+                                              daemon=True)
+                    self._workers[index] = worker
+                    worker.start()
+            self._condition.notify_all()
+
+    def shutdown(self, timeout: float) -> bool:
+        """
+        Stop starting jobs, and wait for the running jobs to finish. Waiting jobs stay queued, and stored if a store is
+        given, so they can be resumed after a restart.
+
+        :param timeout: How long to wait for the running jobs, in seconds.
+        :return: True if all running jobs finished in time.
+        """
+        with self._condition:
+            self._stopped = True
+            self._worker_count = 0
+            self._condition.notify_all()
+            workers = list(self._workers.values())
+
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.join(timeout=max(deadline - time.monotonic(), 0))
+        return not any(worker.is_alive() for worker in workers)
+
+    @property
+    def is_full(self) -> bool:
+        return self.remaining_capacity == 0
+
+    @property
+    def remaining_capacity(self) -> int:
+        """
+        The number of jobs that can still be queued before the queue is full.
+        """
+        with self._condition:
+            return max(self._max_queue_depth - len(self._pending), 0)
+
+    def submit(self, title: str, task: Callable[[RenderJob], None], priority: float = 0, key: str = None,
+               payload: str = None) -> Optional[RenderJob]:
+        """
+        Queue a job.
+
+        :param title: A description of the job, for reporting.
+        :param task: Called on a worker thread with the job, to run it.
+        :param priority: Jobs with a higher priority run first, and are kept over lower ones. Ties go to the newer job.
+        :param key: A unique key for the job, e.g. the rating key of the movie.
+        :param payload: What to store to be able to submit the job again after a restart, requires a key.
+        :return: The queued job, the job in the SKIPPED state if its output would not be kept, or None if the queue is
+            full.
+        """
+        with self._condition:
+            if key:
+                existing = next((job for job in self._jobs.values() if job.key == key and not job.is_finished), None)
+                if existing:
+                    logging.info(f'Render job {existing.id} for "{title}" is already {existing.state.value}')
+                    return existing
+
+            job = RenderJob(job_id=next(self._job_ids), title=title, priority=priority, key=key,
+                            on_state_change=self._persist)
+            self._jobs[job.id] = job
+            self._pending.append((job, task))
+            # Make room by skipping jobs that would not be kept first, possibly including this one
+            self._skip_unretained_jobs()
+            if job.state == RenderJobState.SKIPPED:
+                self._prune_history()
+                return job
+            if len(self._pending) > self._max_queue_depth:
+                self._pending.pop()
+                del self._jobs[job.id]
+                logging.warning(f'Render queue is full ({self._max_queue_depth} jobs), skipping "{title}"')
+                return None
+
+            if self._store and key and payload is not None and job.state == RenderJobState.QUEUED:
+                self._store.save(key=key, title=title, priority=priority, state=job.state.value, payload=payload)
+
+            self._prune_history()
+            self._condition.notify()
+            logging.info(f'Queued render job {job.id} for "{title}" ({len(self._pending)} waiting)')
+
+        return job
+
+    def _persist(self, job: RenderJob):
+        if not self._store or not job.key:
+            return
+        try:
+            if job.is_finished:
+                self._store.remove(key=job.key)
+            else:
+                self._store.update_state(key=job.key, state=job.state.value)
+        except Exception as e:
+            logging.error(f'Could not store the state of render job {job.id} for "{job.title}": {e}')
+
+    @staticmethod
+    def _rank(job: RenderJob) -> Tuple[float, int]:
+        return job.priority, job.id
+
+    def _skip_unretained_jobs(self):
+        if self._retain_count is None:
+            return
+
+        running = [job for job in self._jobs.values()
+                   if job.state in (RenderJobState.DOWNLOADING, RenderJobState.RENDERING)]
+        candidates = sorted(running + [job for job, _ in self._pending], key=self._rank, reverse=True)
+        retained = {job.id for job in candidates[:self._retain_count]}
+
+        kept = collections.deque()
+        for job, task in self._pending:
+            if job.id in retained:
+                kept.append((job, task))
+                continue
+            logging.info(f'Skipping render job {job.id} for "{job.title}", '
+                         f'its output would not be among the {self._retain_count} kept')
+            job.set_state(RenderJobState.SKIPPED)
+        self._pending = kept
+
+    def _prune_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(len(finished) - self._history_size, 0)]:
+            del self._jobs[job_id]
+
+    @property
+    def status(self) -> dict:
+        with self._condition:
+            return {
+                "workers": self._worker_count,
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self._max_queue_depth,
+                "jobs": [job.to_dict() for job in self._jobs.values()],
+            }
+
+    def _run(self, index: int):
+        while True:
+            with self._condition:
+                while not self._pending and index < self._worker_count:
+                    self._condition.wait()
+                if index >= self._worker_count:
+                    del self._workers[index]
+                    return
+                job, task = max(self._pending, key=lambda pending: self._rank(pending[0]))
+                self._pending.remove((job, task))
+                job.set_state(RenderJobState.DOWNLOADING)
+
+            try:
+                task(job)
+                job.set_state(RenderJobState.DONE)
+            except Exception as e:
+                logging.error(f'Render job {job.id} for "{job.title}" failed: {e}')
+                job.set_state(RenderJobState.FAILED, error=str(e))
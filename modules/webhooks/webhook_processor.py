@@ -1,7 +1,7 @@
 import datetime
-import json
+import os
 import threading
-from typing import Union
+from typing import Optional, Union
 
 import pydantic_core
 from flask import (
@@ -11,28 +11,80 @@ from flask import (
 from plexapi.video import Movie
 
 import modules.logs as logging
-from consts import LAST_RUN_CHECK_FILE
+from consts import LAST_RUN_CHECK_FILE, RENDER_JOBS_DATABASE_FILE, WEBHOOK_MAX_BODY_SIZE
 from modules import utils
 from modules.config_parser import Config
-from modules.plex_connector import PlexConnector
 from modules.renderers import RecentlyAddedPrerollRenderer
 from modules.webhooks.plex import PlexWebhook, PlexWebhookEventType, PlexWebhookMetadataType
 from modules.webhooks.last_run import LastRunWithinTimeframeCheck
+from modules.webhooks.ingress import WebhookFilter, read_form_field
+from modules.webhooks.metadata_batcher import MetadataBatcher
+from modules.webhooks.render_job_store import RenderJobStore
+from modules.webhooks.render_queue import RenderJob, RenderJobState, RenderQueue
+
+_render_queue: Optional[RenderQueue] = None
+_render_queue_lock = threading.Lock()
+_render_job_store: Optional[RenderJobStore] = None
+
 
 class WebhookProcessor:
     def __init__(self):
         pass
 
-    @classmethod
-    def _extract_body(cls, request: flask_request) -> dict:
+    @staticmethod
+    def init_render_jobs(config: Config, output_dir: str) -> None:
         """
-        Extract the body from a Flask request.
+        Keep render jobs in the renders directory from now on, and resume the jobs left unfinished by a previous run.
         """
-        try:
-            form_data = request.form.get('payload', '{}')
-            return json.loads(form_data)
-        except Exception as e:
-            return {}
+        global _render_job_store
+        utils.create_directory(directory=output_dir)
+        _render_job_store = RenderJobStore(database_path=os.path.join(output_dir, RENDER_JOBS_DATABASE_FILE))
+        WebhookProcessor.configure_render_queue(config=config)
+
+        stored_jobs = _render_job_store.all()
+        if stored_jobs:
+            logging.info(f"Resuming {len(stored_jobs)} unfinished render job(s)")
+        for stored_job in stored_jobs:
+            try:
+                webhook = PlexWebhook.model_validate_json(stored_job.payload)
+            except pydantic_core.ValidationError as e:
+                logging.error(f'Could not resume render job for "{stored_job.title}": {e}')
+                _render_job_store.remove(key=stored_job.key)
+                continue
+            # Looked up in Plex again, the stored metadata only identifies the movie
+            _recently_added_batcher.add(webhook=webhook, config=config, output_dir=output_dir)
+
+    @staticmethod
+    def shutdown_render_jobs(timeout: float) -> None:
+        """
+        Let running renders finish, leaving queued renders to be resumed on the next start.
+        """
+        if not _render_queue:
+            return
+        logging.info(f"Waiting up to {timeout} seconds for running renders to finish...")
+        if not _render_queue.shutdown(timeout=timeout):
+            logging.warning("Renders still running, they will be resumed on the next start")
+        if _render_job_store:
+            _render_job_store.close()
+
+    @staticmethod
+    def configure_render_queue(config: Config) -> RenderQueue:
+        """
+        Create the render queue, or apply the limits of a reloaded config to it.
+        """
+        global _render_queue
+        recently_added = config.advanced.auto_generation.recently_added
+        with _render_queue_lock:
+            if _render_queue:
+                _render_queue.configure(worker_count=recently_added.render_workers,
+                                        max_queue_depth=recently_added.max_queued_renders,
+                                        retain_count=recently_added.count)
+            else:
+                _render_queue = RenderQueue(worker_count=recently_added.render_workers,
+                                            max_queue_depth=recently_added.max_queued_renders,
+                                            retain_count=recently_added.count,
+                                            store=_render_job_store)
+            return _render_queue
 
     @staticmethod
     def process_ping(request: flask_request, config: Config) -> [Union[str, None], int]:
@@ -83,56 +135,123 @@ class WebhookProcessor:
         """
         Process a recently added webhook from Tautulli.
         """
-        json_data = WebhookProcessor._extract_body(request=request)
-
-        try:
-            webhook = PlexWebhook(**json_data)
-        except pydantic_core._pydantic_core.ValidationError as e:
-            # If we receive a validation error (incoming webhook does not have the payload we expect), simply ignore it
-            # This can happen, e.g. when we receive a playback start webhook for a cinema trailer, which does not have a librarySectionID
+        # Plex sends every event here, only new movies are fully parsed and validated
+        # Payloads that do not validate are ignored too, e.g. a cinema trailer, which does not have a librarySectionID
+        payload = read_form_field(request=request, field_name="payload", max_body_size=WEBHOOK_MAX_BODY_SIZE)
+        webhook = _recently_added_filter.accept(payload=payload or "{}")
+        if not webhook:
             return jsonify({}), 200
 
-        match webhook.event_type:
-            case PlexWebhookEventType.MEDIA_ADDED:
-                if webhook.metadata.type == PlexWebhookMetadataType.MOVIE.value:  # Skip if new content is not a movie
-                    thread = threading.Thread(target=WebhookProcessor._process_recently_added_preroll_render,
-                                              args=(webhook, config, output_dir))
-                    thread.start()
-            case _:  # pragma: no cover
-                pass
+        # Movies arriving close together are looked up in Plex with a single request. Webhooks waiting for that
+        # count towards the queue limit too, as each of them becomes a render job.
+        render_queue = WebhookProcessor.configure_render_queue(config=config)
+        if not _recently_added_batcher.add(webhook=webhook, config=config, output_dir=output_dir,
+                                           max_pending=render_queue.remaining_capacity):
+            logging.warning("Render queue is full, ignoring recently added webhook")
+            return jsonify({"error": "Render queue is full"}), 503
 
         return jsonify({}), 200
 
     @staticmethod
-    def _process_recently_added_preroll_render(webhook: PlexWebhook, config: Config, output_dir: str) -> None:
+    def process_recently_added_stats() -> [Union[str, None], int]:
         """
-        Process the preroll render for a recently added webhook.
+        Process a request for the number of recently added webhooks accepted and dropped.
+        """
+        return jsonify(_recently_added_filter.counts), 200
+
+    @staticmethod
+    def process_render_status() -> [Union[str, None], int]:
+        """
+        Process a request for the state of the render queue.
+        Return the queue depth and the state of recent render jobs.
+        """
+        if not _render_queue:
+            return jsonify({"workers": 0, "queue_depth": 0, "max_queue_depth": 0, "jobs": []}), 200
+        return jsonify(_render_queue.status), 200
+
+    @staticmethod
+    def _queue_recently_added_preroll_render(webhook: PlexWebhook, plex_movie: Optional[Movie], config: Config,
+                                             output_dir: str) -> None:
+        """
+        Queue the preroll render for a recently added webhook, once the movie has been retrieved from Plex.
         """
-        plex_connector = PlexConnector(host=config.plex.url, token=config.plex.token)
-        logging.info(f'Retrieving information from Plex for recently added movie: "{webhook.metadata.title}"')
-        plex_movie: Movie = plex_connector.get_movie(item_key=webhook.metadata.key)
         if not plex_movie:
             logging.warning(f'Could not find movie in Plex: "{webhook.metadata.title}"')  # Not an error, just a warning
+            WebhookProcessor._forget_render_job(webhook=webhook)
             return
-        
+
+
         # Check if the current library is in the exclusion list
         library_name = getattr(plex_movie, "librarySectionTitle", "").lower()
         logging.debug(f'plex_movie librarySectionTitle: "{library_name}"')
         excluded_libraries = config.advanced.auto_generation.recently_added.excluded_libraries
         if library_name in excluded_libraries:
             logging.info(f'Skipping preroll render for "{webhook.metadata.title}" from excluded library: "{library_name}"')
+            WebhookProcessor._forget_render_job(webhook=webhook)
             return
-        
+
+        # Only the most recently added movies are kept, so render newest first and skip any that would be pruned
+        added_at = WebhookProcessor._get_added_at(webhook=webhook, plex_movie=plex_movie)
+        job = WebhookProcessor.configure_render_queue(config=config).submit(
+            title=webhook.metadata.title,
+            task=lambda job: WebhookProcessor._process_recently_added_preroll_render(plex_movie=plex_movie,
+                                                                                     added_at=added_at,
+                                                                                     config=config,
+                                                                                     output_dir=output_dir,
+                                                                                     job=job),
+            priority=added_at,
+            key=webhook.rating_key,
+            payload=webhook.model_dump_json(by_alias=True))
+        if not job or job.state == RenderJobState.SKIPPED:
+            # Not going to be rendered, so a resumed job should not be resumed again either
+            WebhookProcessor._forget_render_job(webhook=webhook)
+
+    @staticmethod
+    def _forget_render_job(webhook: PlexWebhook) -> None:
+        """
+        Remove a resumed render job that will not be queued again.
+        """
+        if _render_job_store and webhook.rating_key:
+            _render_job_store.remove(key=webhook.rating_key)
+
+    @staticmethod
+    def _get_added_at(webhook: PlexWebhook, plex_movie: Movie) -> float:
+        """
+        Get when a movie was added to Plex, as an epoch timestamp.
+        """
+        added_at = getattr(plex_movie, "addedAt", None)
+        if added_at:
+            return added_at.timestamp()
+        return webhook.metadata.addedAt or utils.now_epoch()
+
+    @staticmethod
+    def _process_recently_added_preroll_render(plex_movie: Movie, added_at: float, config: Config, output_dir: str,
+                                               job: RenderJob) -> None:
+        """
+        Process the preroll render for a recently added movie, on a render queue worker.
+        """
+        # Named after the movie, so a render resumed after a restart finds the assets retrieved before it
+        asset_folder_name = f"recently-added-{job.key}" if job.key else None
         renderer = RecentlyAddedPrerollRenderer(render_folder=output_dir,
-                                                movie=plex_movie)
-        asset_folder, local_file_path = renderer.render(config=config)
+                                                movie=plex_movie,
+                                                asset_folder_name=asset_folder_name)
+        try:
+            asset_folder, local_file_path = renderer.render(
+                config=config, on_rendering=lambda: job.set_state(RenderJobState.RENDERING))
+        except Exception:
+            # A failed job is not resumed, so its assets will not be used again
+            if asset_folder_name:
+                utils.delete_directory(directory=os.path.join(output_dir, asset_folder_name))
+            raise
 
         if not local_file_path:  # error has already been logged
             return
 
         destination_folder = f"{config.advanced.auto_generation.recently_added.local_files_root}"
         utils.create_directory(directory=destination_folder)
-        utils.copy_file(source=local_file_path, destination=destination_folder)
+        destination_file_path = utils.copy_file(source=local_file_path, destination=destination_folder)
+        # Retention keeps the newest files by modification time, make that the time the movie was added
+        os.utime(destination_file_path, (added_at, added_at))
 
         files_to_delete = utils.get_all_files_in_directory_beyond_most_recent_x_count(directory=destination_folder,
                                                                                       count=config.advanced.auto_generation.recently_added.count)
@@ -143,3 +262,8 @@ class WebhookProcessor:
 
         logging.info(f"Cleaning up local preroll assets folder: '{asset_folder}'")
         utils.delete_directory(directory=asset_folder)
+
+
+_recently_added_batcher = MetadataBatcher(on_resolved=WebhookProcessor._queue_recently_added_preroll_render)
+_recently_added_filter = WebhookFilter(event=PlexWebhookEventType.MEDIA_ADDED.value,
+                                       metadata_type=PlexWebhookMetadataType.MOVIE.value)
@@ -1,4 +1,5 @@
-from typing import Callable
+import threading
+from typing import Callable, Tuple
 
 import youtubesearchpython
 import yt_dlp
@@ -7,6 +8,9 @@ import os
 import modules.logs as logging
 from modules.config_parser import Config
 
+# Downloads that receive no data for this long fail, rather than block the render (and cancellation) indefinitely
+_STALL_TIMEOUT_SECONDS = 30
+
 
 class SelectorPresets:
     @staticmethod
@@ -99,7 +103,27 @@ def run_youtube_search(query: str, selector_function: Callable[[dict], str], res
     return selector_function(videos)
 
 
-def download_youtube_video(url: str, config: Config, output_dir: str, output_filename: str = None) -> str:
+def _cancellation_hook(cancel_event: threading.Event) -> Callable[[dict], None]:
+    def hook(d):
+        # Called with every chunk downloaded, raising here makes yt-dlp abort the download.
+        # Ranged downloads run in an ffmpeg process instead, which only calls this once it has finished.
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled()
+
+    return hook
+
+
+def _stall_timeout_options() -> dict:
+    return {
+        'socket_timeout': _STALL_TIMEOUT_SECONDS,
+        # Ranged downloads are made by ffmpeg, which does not use the socket timeout (in microseconds)
+        'external_downloader_args': {'ffmpeg_i': ['-rw_timeout', str(_STALL_TIMEOUT_SECONDS * 1_000_000)]},
+    }
+
+
+def download_youtube_video(url: str, config: Config, output_dir: str, output_filename: str = None,
+                           cancel_event: threading.Event = None, section: Tuple[float, float] = None,
+                           max_width: int = None, video_only: bool = False) -> str:
     """
     Download a YouTube video as a video file.
 
@@ -107,7 +131,15 @@ def download_youtube_video(url: str, config: Config, output_dir: str, output_fil
     :param config: The configuration for Plex Prerolls.
     :param output_dir: The output directory.
     :param output_filename: The output filename.
+    :param cancel_event: Optional event to abort the download with, from another thread. Ranged downloads cannot be
+        aborted once started, they are only checked against the event when they finish.
+    :param section: Optionally only download this part of the video, as start and end in seconds. The part is
+        re-encoded so it starts exactly at the start, rather than at the keyframe before it.
+    :param max_width: Optionally the maximum width of the video to download, in pixels.
+    :param video_only: Whether to skip the audio of the video.
     :return: The path to the downloaded file.
+    :raises yt_dlp.utils.DownloadCancelled: If the event was set during the download, for ranged downloads only once
+        they finish.
     """
     cookies_file = config.advanced.auto_generation.cookies_file
     options = {
@@ -115,48 +147,72 @@ def download_youtube_video(url: str, config: Config, output_dir: str, output_fil
         'logger': YouTubeDownloaderLogger(),
         # 'progress_hooks': [_download_progress_hook],
         "overwrites": True,
+        **_stall_timeout_options(),
     }
+    if cancel_event:
+        options['progress_hooks'] = [_cancellation_hook(cancel_event=cancel_event)]
     if output_filename:
         options['outtmpl'] = f"{output_filename}.%(ext)s"
     if cookies_file:
         options['cookiefile'] = cookies_file
+    if max_width or video_only:
+        width_filter = f"[width<={max_width}]" if max_width else ""
+        if video_only:
+            # Falls back to a format with audio, the audio is then simply not used
+            options['format'] = f"bestvideo{width_filter}/best{width_filter}/best"
+        else:
+            options['format'] = f"bestvideo{width_filter}+bestaudio/best{width_filter}/best"
+    if section:
+        # Ranged downloads go through ffmpeg, which only fetches the part of the stream it needs
+        options['download_ranges'] = yt_dlp.utils.download_range_func(None, [section])
+        options['force_keyframes_at_cuts'] = True
 
     with yt_dlp.YoutubeDL(params=options) as ydl:
         # download the file and extract info
         info = ydl.extract_info(url, download=True)
-        # return the file path
-        return ydl.prepare_filename(info)
+        # The path the file was actually written to, which can differ from the template, e.g. for ranged downloads
+        requested_downloads = info.get('requested_downloads') or [{}]
+        return requested_downloads[0].get('filepath') or ydl.prepare_filename(info)
 
 
-def download_youtube_audio(url: str, config: Config, output_dir: str, output_filename: str = None) -> str:
+def download_youtube_audio(url: str, config: Config, output_dir: str, output_filename: str = None,
+                           cancel_event: threading.Event = None, max_length_seconds: float = None) -> str:
     """
-    Download a YouTube video as an audio file.
+    Download the best audio-only stream of a YouTube video, as is, without re-encoding it.
 
     :param url: The YouTube video URL.
     :param config: The configuration for Plex Prerolls.
     :param output_dir: The output directory.
     :param output_filename: The output filename.
+    :param cancel_event: Optional event to abort the download with, from another thread. Ranged downloads cannot be
+        aborted once started, they are only checked against the event when they finish.
+    :param max_length_seconds: Optionally only download the start of the audio, up to this many seconds.
     :return: The path to the downloaded file.
+    :raises yt_dlp.utils.DownloadCancelled: If the event was set during the download, for ranged downloads only once
+        they finish.
     """
     cookies_file = config.advanced.auto_generation.cookies_file
     options = {
         "paths": {"home": output_dir},
-        'format': 'm4a/bestaudio/best',
-        'postprocessors': [{  # Extract audio using ffmpeg
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'm4a',
-        }],
+        'format': 'bestaudio/best',
         'logger': YouTubeDownloaderLogger(),
         # 'progress_hooks': [_download_progress_hook],
         "overwrites": True,
+        **_stall_timeout_options(),
     }
     if output_filename:
         options['outtmpl'] = f"{output_filename}.%(ext)s"
     if cookies_file:
         options['cookiefile'] = cookies_file
+    if cancel_event:
+        options['progress_hooks'] = [_cancellation_hook(cancel_event=cancel_event)]
+    if max_length_seconds:
+        # Ranged downloads go through ffmpeg, which only fetches the part of the stream it needs
+        options['download_ranges'] = yt_dlp.utils.download_range_func(None, [(0, max_length_seconds)])
 
     with yt_dlp.YoutubeDL(params=options) as ydl:
         # download the file and extract info
         info = ydl.extract_info(url, download=True)
-        # return the file path
-        return ydl.prepare_filename(info)
+        # The path the file was actually written to, which can differ from the template, e.g. for ranged downloads
+        requested_downloads = info.get('requested_downloads') or [{}]
+        return requested_downloads[0].get('filepath') or ydl.prepare_filename(info)
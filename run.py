@@ -1,7 +1,9 @@
 import argparse
+import os
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 from time import sleep
+from typing import Optional, Set
 
 from croniter import croniter
 from flask import (
@@ -21,9 +23,15 @@ from consts import (
     FLASK_ADDRESS,
     FLASK_PORT,
     LAST_RUN_CHECK_FILE,
+    HOLIDAYS_CACHE_FILE,
+    CONFIG_CACHE_DIR,
+    CONFIG_CACHE_FILE,
 )
+from modules import _holidays
 from modules.config_parser import Config
+from modules.config_reloader import ConfigReloader
 from modules.errors import determine_exit_code
+from modules.library_watcher import LibraryWatcher
 from modules.plex_connector import PlexConnector
 from modules.schedule_manager import ScheduleManager
 from modules.webhooks.webhook_processor import WebhookProcessor
@@ -46,7 +54,15 @@ logging.init(app_name=APP_NAME,
              log_file_dir=args.log,
              file_log_level=FILE_LOG_LEVEL)
 
-_config = Config(app_name=APP_NAME, config_path=f"{args.config}")
+_holidays.init_cache(cache_file_path=os.path.join(args.log, HOLIDAYS_CACHE_FILE))
+
+_config_reloader = ConfigReloader(app_name=APP_NAME, config_path=f"{args.config}",
+                                  cache_file_path=os.path.join(CONFIG_CACHE_DIR, CONFIG_CACHE_FILE))
+
+# Set to wake the run loop early, when the config is reloaded or files used by an active schedule change
+_update_requested = threading.Event()
+_current_schedule_manager: Optional[ScheduleManager] = None
+_library_watcher: Optional[LibraryWatcher] = None
 
 
 def run_with_potential_exit_on_error(func):
@@ -61,36 +77,135 @@ def run_with_potential_exit_on_error(func):
 
     return wrapper
 
-@run_with_potential_exit_on_error
-def pre_roll_update(config: Config):
+def _update_pre_rolls(config: Config, at: datetime) -> ScheduleManager:
+    logging.info(f"Running pre-roll update...")
+
+    schedule_manager = ScheduleManager(config=config, at=at)
+
+    logging.info(f"Found {schedule_manager.valid_schedule_count} valid schedules")
+    logging.info(schedule_manager.valid_schedule_count_log_message)
+
+    all_valid_paths = schedule_manager.all_valid_paths
+
+    # Compared against the value on the Plex server rather than the last value applied, so changes made in Plex itself
+    # are corrected too. Only saved if it differs.
+    plex_connector = PlexConnector(host=config.plex.url, token=config.plex.token,
+                                   pool_size=config.plex.connection_pool_size)
+    plex_connector.update_pre_roll_paths(paths=all_valid_paths, testing=config.run.dry_run)
+
+    logging.write_to_last_run_file(logs_folder=args.log, last_run_file=LAST_RUN_CHECK_FILE)
+
+    global _current_schedule_manager
+    _current_schedule_manager = schedule_manager
+
+    return schedule_manager
+
+
+def _on_library_change(directories: Set[str]):
+    schedule_manager = _current_schedule_manager
+    if schedule_manager and not schedule_manager.is_affected_by(directories=list(directories)):
+        logging.debug(f"Pre-roll folder changes do not affect any active schedule: {sorted(directories)}")
+        return
+
+    logging.info("Pre-roll folder changes affect an active schedule")
+    _update_requested.set()
+
+
+def _sleep_until(wake_time: datetime) -> bool:
+    """
+    Sleep until the provided time, or until an update is requested.
+
+    :param wake_time: The time to wake up at.
+    :return: True if woken early because an update was requested.
+    """
+    while datetime.now() < wake_time:
+        if _update_requested.wait(timeout=max((wake_time - datetime.now()).total_seconds(), 0)):
+            _update_requested.clear()
+            return True
+    return False
+
+
+def _pre_roll_update_on_cron(config: Config):
     cron_pattern = config.run.schedule
     while True:
         now = datetime.now()
         if not croniter.match(cron_pattern, now):
             # Cron only goes to minutes, not seconds, so we don't need to recheck as often
-            sleep(30)  # Sleep/check every 30 seconds
+            if _sleep_until(wake_time=now + timedelta(seconds=30)):  # Sleep/check every 30 seconds
+                if _config_reloader.config is not config:
+                    return  # Start over with the new config
+                _update_pre_rolls(config=config, at=datetime.now())
             continue
 
         logging.info(f"Current time {now} matches cron pattern '{cron_pattern}'")
-        logging.info(f"Running pre-roll update...")
+        _update_pre_rolls(config=config, at=now)
+
+        sleep(60)  # Sleep at least a minute to avoid running multiple times in the same minute
+
 
-        schedule_manager = ScheduleManager(config=config)
+def _pre_roll_update_on_cron_and_schedule_changes(config: Config):
+    cron_pattern = config.run.schedule
+    while True:
+        now = datetime.now()
+        schedule_manager = _update_pre_rolls(config=config, at=now)
 
-        logging.info(f"Found {schedule_manager.valid_schedule_count} valid schedules")
-        logging.info(schedule_manager.valid_schedule_count_log_message)
+        next_cron_run = croniter(cron_pattern, now).get_next(datetime)
+        next_schedule_change = schedule_manager.next_transition(after=now)
+        if next_schedule_change and next_schedule_change < next_cron_run:
+            logging.info(f"Next update at {next_schedule_change} (schedule change)")
+            _sleep_until(wake_time=next_schedule_change)
+        else:
+            logging.info(f"Next update at {next_cron_run} (cron pattern '{cron_pattern}')")
+            _sleep_until(wake_time=next_cron_run)
 
-        all_valid_paths = schedule_manager.all_valid_paths
+        if _config_reloader.config is not config:
+            return  # Start over with the new config
 
-        plex_connector = PlexConnector(host=config.plex.url, token=config.plex.token)
-        plex_connector.update_pre_roll_paths(paths=all_valid_paths, testing=config.run.dry_run)
 
-        logging.write_to_last_run_file(logs_folder=args.log, last_run_file=LAST_RUN_CHECK_FILE)
+def _restart_library_watcher(config: Config):
+    global _library_watcher
+    if _library_watcher:
+        _library_watcher.stop()
+        _library_watcher = None
 
-        sleep(60)  # Sleep at least a minute to avoid running multiple times in the same minute
+    if not config.advanced.library_watcher.enabled:
+        return
+
+    _library_watcher = LibraryWatcher(roots=config.local_root_folders,
+                                      on_change=_on_library_change,
+                                      use_inotify=config.advanced.library_watcher.use_inotify,
+                                      poll_interval=config.advanced.library_watcher.poll_interval)
+    _library_watcher.start()
+
+
+def _on_config_reload(config: Config):
+    # The watched folders may have changed
+    _restart_library_watcher(config=config)
+    # Re-evaluate the schedules with the new config right away
+    _update_requested.set()
+
+
+@run_with_potential_exit_on_error
+def pre_roll_update(config_reloader: ConfigReloader):
+    _restart_library_watcher(config=config_reloader.config)
+    config_reloader.on_reload(callback=_on_config_reload)
+    config_reloader.start()
+
+    reloaded = False
+    while True:
+        # Each run loop returns once a new config has been loaded, the next one is chosen using the new config
+        config = config_reloader.config
+        if config.run.update_on_schedule_change:
+            _pre_roll_update_on_cron_and_schedule_changes(config=config)  # Always updates when starting
+        else:
+            if reloaded:
+                _update_pre_rolls(config=config, at=datetime.now())
+            _pre_roll_update_on_cron(config=config)
+        reloaded = True
 
 
 if __name__ == '__main__':
     # logging.info(splash_logo())
     logging.info(f"Starting {APP_NAME}...")
 
-    pre_roll_update(config=_config)
+    pre_roll_update(config_reloader=_config_reloader)
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+CONFIG = """
+plex:
+  url: http://localhost:32400
+  token: token
+weekly:
+  enabled: true
+  weeks:
+    - number: 1
+      paths:
+        - "/weekly/1.mp4"
+      weight: 2
+"""
+
+
+def _write_config(contents: str) -> str:
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as config_file:
+        config_file.write(contents)
+    return config_file.name
+
+
+class TestConfig(unittest.TestCase):
+    def test_snapshot_is_immutable(self):
+        import dataclasses
+        from modules.config_parser import Config
+
+        config_path = _write_config(contents=CONFIG)
+        try:
+            config = Config(app_name="Plex Prerolls Tests", config_path=config_path)
+        finally:
+            os.remove(config_path)
+
+        self.assertEqual(config.weekly.weeks[0].number, 1)
+        self.assertEqual(config.weekly.weeks[0].weight, 2)
+        self.assertEqual(config.plex.port, 80)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            config.weekly.weeks[0].weight = 3
+
+    def test_invalid_values_are_rejected_at_load(self):
+        from modules.config_parser import Config
+
+        config_path = _write_config(contents=CONFIG.replace("number: 1", "number: 54"))
+        try:
+            with self.assertRaises(ValueError):
+                Config(app_name="Plex Prerolls Tests", config_path=config_path)
+        finally:
+            os.remove(config_path)
+
+    def test_cached_snapshot_is_reused(self):
+        from modules.config_parser import Config
+
+        config_path = _write_config(contents=CONFIG)
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache_file_path = os.path.join(cache_directory, "config_cache.pickle")
+            try:
+                config = Config(app_name="Plex Prerolls Tests", config_path=config_path, cache_file_path=cache_file_path)
+                with mock.patch.object(Config, "_read_file", side_effect=AssertionError("Config was re-parsed")):
+                    cached_config = Config(app_name="Plex Prerolls Tests", config_path=config_path,
+                                           cache_file_path=cache_file_path)
+
+                with open(config_path, "a") as config_file:
+                    config_file.write("run:\n  dry_run: true\n")
+                changed_config = Config(app_name="Plex Prerolls Tests", config_path=config_path,
+                                        cache_file_path=cache_file_path)
+            finally:
+                os.remove(config_path)
+
+        self.assertEqual(cached_config.snapshot, config.snapshot)
+        self.assertTrue(changed_config.run.dry_run)
+
+    def test_local_root_folders_come_from_enabled_sections(self):
+        from modules.config_parser import Config
+
+        config_path = _write_config(contents=CONFIG + """
+    - number: 2
+      path_globbing:
+        enabled: true
+        pairs:
+          - root_path: /files/weekly
+            plex_path: /plex/weekly
+            patterns:
+              - "*.mp4"
+monthly:
+  enabled: false
+  months:
+    - number: 1
+      path_globbing:
+        enabled: true
+        pairs:
+          - root_path: /files/monthly
+            plex_path: /plex/monthly
+            patterns:
+              - "*.mp4"
+advanced:
+  auto_generation:
+    recently_added:
+      enabled: true
+""")
+        try:
+            config = Config(app_name="Plex Prerolls Tests", config_path=config_path)
+        finally:
+            os.remove(config_path)
+
+        self.assertEqual(config.local_root_folders,
+                         ["/files/weekly", config.advanced.auto_generation.recently_added.local_files_root])
+
+    def test_cache_writable_by_other_users_is_ignored(self):
+        from modules.config_parser import Config
+
+        config_path = _write_config(contents=CONFIG)
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache_file_path = os.path.join(cache_directory, "config_cache.pickle")
+            try:
+                Config(app_name="Plex Prerolls Tests", config_path=config_path, cache_file_path=cache_file_path)
+                self.assertEqual(os.listdir(cache_directory), ["config_cache.pickle"])
+
+                os.chmod(cache_directory, 0o777)
+                with mock.patch.object(Config, "_read_file", wraps=Config._read_file) as read_file:
+                    Config(app_name="Plex Prerolls Tests", config_path=config_path, cache_file_path=cache_file_path)
+            finally:
+                os.remove(config_path)
+
+        read_file.assert_called_once()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+CONFIG = """
+plex:
+  url: http://localhost:32400
+  token: token
+run:
+  dry_run: false
+"""
+
+
+class TestConfigReloader(unittest.TestCase):
+    def _write(self, path: str, contents: str, mtime: int):
+        with open(path, "w") as config_file:
+            config_file.write(contents)
+        os.utime(path, (mtime, mtime))  # Make sure the change is visible even on coarse mtime filesystems
+
+    def test_reload_swaps_config_and_keeps_previous_on_error(self):
+        from modules.config_reloader import ConfigReloader
+
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.yaml")
+            self._write(path=config_path, contents=CONFIG, mtime=1_000)
+
+            reloaded = []
+            config_reloader = ConfigReloader(app_name="Plex Prerolls Tests", config_path=config_path)
+            config_reloader.on_reload(callback=reloaded.append)
+            original = config_reloader.config
+
+            self.assertFalse(config_reloader.reload_if_changed())
+
+            self._write(path=config_path, contents=CONFIG.replace("dry_run: false", "dry_run: true"), mtime=2_000)
+            self.assertTrue(config_reloader.reload_if_changed())
+            self.assertTrue(config_reloader.config.run.dry_run)
+            self.assertIsNot(config_reloader.config, original)
+            self.assertEqual(reloaded, [config_reloader.config])
+
+            valid = config_reloader.config
+            self._write(path=config_path, contents=CONFIG.replace("dry_run: false", "dry_run: maybe"), mtime=3_000)
+            self.assertFalse(config_reloader.reload_if_changed())
+            self.assertIs(config_reloader.config, valid)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+
+def _touch(path: str):
+    open(path, "w").close()
+
+
+def _age(path: str, seconds: int):
+    # Directory listings are only trusted once their modification time is old enough to be stable
+    timestamp = time.time() - seconds
+    os.utime(path, (timestamp, timestamp))
+
+
+class TestDirectoryListingCache(unittest.TestCase):
+    def test_matches_like_glob(self):
+        import modules.files as files
+
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "christmas", "nested"))
+            _touch(os.path.join(directory, "christmas", "a.mp4"))
+            _touch(os.path.join(directory, "christmas", ".hidden.mp4"))
+            _touch(os.path.join(directory, "christmas", "b.mkv"))
+            _touch(os.path.join(directory, "root.mp4"))
+
+            cache = files.DirectoryListingCache()
+
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*/*.mp4"),
+                             [os.path.join(directory, "christmas", "a.mp4")])
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="christmas/*"),
+                             [os.path.join(directory, "christmas", "a.mp4"),
+                              os.path.join(directory, "christmas", "b.mkv")])
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="root.mp4"),
+                             [os.path.join(directory, "root.mp4")])
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="missing/*"), [])
+
+    def test_only_changed_directories_are_rescanned(self):
+        import modules.files as files
+
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "a"))
+            os.makedirs(os.path.join(directory, "b"))
+            _touch(os.path.join(directory, "a", "1.mp4"))
+            _touch(os.path.join(directory, "b", "1.mp4"))
+            for path in (directory, os.path.join(directory, "a"), os.path.join(directory, "b")):
+                _age(path=path, seconds=60)
+
+            cache = files.DirectoryListingCache()
+            cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*/*.mp4")
+
+            with mock.patch("modules.files.os.scandir", wraps=os.scandir) as scandir_mock:
+                cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*/*.mp4")
+                self.assertEqual(scandir_mock.call_count, 0)
+
+                _touch(os.path.join(directory, "b", "2.mp4"))
+                _age(path=os.path.join(directory, "b"), seconds=30)
+                matches = cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*/*.mp4")
+
+                scandir_mock.assert_called_once_with(os.path.join(directory, "b"))
+
+            self.assertEqual(matches, [os.path.join(directory, "a", "1.mp4"),
+                                       os.path.join(directory, "b", "1.mp4"),
+                                       os.path.join(directory, "b", "2.mp4")])
+
+
+class TestGlobCache(unittest.TestCase):
+    def test_same_pattern_is_only_resolved_once(self):
+        import modules.files as files
+
+        with tempfile.TemporaryDirectory() as directory:
+            _touch(os.path.join(directory, "a.mp4"))
+
+            glob_cache = files.GlobCache()
+            with mock.patch("modules.files.get_all_files_matching_glob_pattern",
+                            wraps=files.get_all_files_matching_glob_pattern) as glob_mock:
+                first = glob_cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*.mp4")
+                second = glob_cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*.mp4")
+
+            self.assertEqual(first, [os.path.join(directory, "a.mp4")])
+            self.assertEqual(first, second)
+            self.assertEqual(glob_mock.call_count, 1)
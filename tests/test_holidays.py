@@ -36,12 +36,15 @@ class TestHolidays(unittest.TestCase):
         self.assertIn(name, schedule_entry.name_prefix)
 
         # Dates should be between YYYY-11-22 and YYYY-11-28 for Thanksgiving (4th Thursday of November)
-        current_year = utils.now().year
-        self.assertEqual(schedule_entry.start_date.year, current_year)
+        # Once this year's Thanksgiving has passed, next year's is used instead
+        now = utils.now()
+        expected_year = now.year if now <= schedule_entry.end_date else now.year + 1
+        self.assertGreaterEqual(schedule_entry.end_date, now)
+        self.assertEqual(schedule_entry.start_date.year, expected_year)
         self.assertEqual(schedule_entry.start_date.month, 11)
         self.assertTrue(22 <= schedule_entry.start_date.day <= 28)
         self.assertEqual(schedule_entry.start_date.weekday(), 3)  # Thursday
-        self.assertEqual(schedule_entry.end_date.year, current_year)
+        self.assertEqual(schedule_entry.end_date.year, expected_year)
         self.assertEqual(schedule_entry.end_date.month, 11)
         self.assertTrue(22 <= schedule_entry.end_date.day <= 28)
         self.assertEqual(schedule_entry.end_date.weekday(), 3)  # Thursday
@@ -98,4 +101,51 @@ class TestHolidays(unittest.TestCase):
         )
 
         self.assertIsNone(schedule_entry)
-        # Logs should include an ERROR about the invalid country code, and an INFO about the holiday not being found.
\ No newline at end of file
+        # Logs should include an ERROR about the invalid country code, and an INFO about the holiday not being found.
+
+    def test_floating_holiday_spanning_new_year(self):
+        from datetime import datetime
+        from modules.models import schedule_entry_from_date_range
+        from modules.config_parser import FloatingHolidayConfig
+
+        floating_holiday_config = FloatingHolidayConfig(
+            data={
+                "name": "New Year's Day",
+                "country": "US",
+                "offset_start": -1,
+            }
+        )
+
+        schedule_entry = schedule_entry_from_date_range(
+            start_date_string=None,
+            end_date_string=None,
+            holiday=floating_holiday_config,
+            paths=["/media/holiday1"],
+            weight=1,
+            name="New Year's Eve",
+            at=datetime(2024, 12, 31, 12, 0, 0)
+        )
+
+        self.assertEqual(schedule_entry.start_date, datetime(2024, 12, 31, 0, 0, 0))
+        self.assertEqual(schedule_entry.end_date, datetime(2025, 1, 1, 23, 59, 59))
+
+    def test_holiday_resolver_disk_cache(self):
+        import os
+        import tempfile
+        from datetime import date
+        from modules._holidays import HolidayResolver
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_file_path = os.path.join(cache_dir, "holidays_cache.json")
+
+            resolver = HolidayResolver(cache_file_path=cache_file_path)
+            dates = resolver.get_dates(country_alpha2="US", holiday_name="thanksgiving", year=2024)
+            self.assertEqual(dates, [date(2024, 11, 28)])
+            resolver.save()  # Rather than wait for the scheduled write
+            self.assertTrue(os.path.exists(cache_file_path))
+
+            # A new resolver should answer from the disk cache without building a holiday index
+            cached_resolver = HolidayResolver(cache_file_path=cache_file_path)
+            cached_dates = cached_resolver.get_dates(country_alpha2="US", holiday_name="thanksgiving", year=2024)
+            self.assertEqual(cached_dates, [date(2024, 11, 28)])
+            self.assertEqual(cached_resolver._indexes, {})
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+import unittest
+
+
+class TestLibraryWatcher(unittest.TestCase):
+    def _assert_reports_change(self, use_inotify: bool):
+        import modules.files as files
+        from modules.library_watcher import LibraryWatcher
+
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "christmas"))
+            self.assertEqual(files.get_all_files_matching_glob_pattern(directory=directory, pattern="christmas/*"), [])
+
+            reported = []
+            changed_event = threading.Event()
+
+            def on_change(directories):
+                reported.append(directories)
+                changed_event.set()
+
+            watcher = LibraryWatcher(roots=[directory], on_change=on_change, use_inotify=use_inotify, poll_interval=1)
+            watcher.start()
+            try:
+                open(os.path.join(directory, "christmas", "a.mp4"), "w").close()
+                self.assertTrue(changed_event.wait(timeout=10))
+            finally:
+                watcher.stop()
+
+            self.assertIn(os.path.join(directory, "christmas"), reported[0])
+            self.assertEqual(files.get_all_files_matching_glob_pattern(directory=directory, pattern="christmas/*"),
+                             [os.path.join(directory, "christmas", "a.mp4")])
+
+    def test_inotify(self):
+        self._assert_reports_change(use_inotify=True)
+
+    def test_polling(self):
+        self._assert_reports_change(use_inotify=False)
+
+    def test_root_created_after_start(self):
+        from modules.library_watcher import LibraryWatcher
+
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.join(directory, "Recently Added")
+            reported = []
+            changed_event = threading.Event()
+
+            def on_change(directories):
+                reported.append(directories)
+                changed_event.set()
+
+            watcher = LibraryWatcher(roots=[root], on_change=on_change, use_inotify=True, poll_interval=1)
+            watcher.start()
+            try:
+                os.makedirs(root)
+                open(os.path.join(root, "a.mp4"), "w").close()
+                self.assertTrue(changed_event.wait(timeout=10))
+                self.assertIn(root, reported[0])
+
+                # From then on, the root is watched like any other
+                changed_event.clear()
+                open(os.path.join(root, "b.mp4"), "w").close()
+                self.assertTrue(changed_event.wait(timeout=10))
+            finally:
+                watcher.stop()
+
+
+class TestWatchedDirectoryListingCache(unittest.TestCase):
+    def test_watched_results_are_trusted_until_invalidated(self):
+        import modules.files as files
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = files.DirectoryListingCache()
+            cache.watch(roots=[directory])
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*"), [])
+
+            open(os.path.join(directory, "a.mp4"), "w").close()
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*"), [])
+
+            cache.invalidate(directories=[directory])
+            self.assertEqual(cache.get_all_files_matching_glob_pattern(directory=directory, pattern="*"),
+                             [os.path.join(directory, "a.mp4")])
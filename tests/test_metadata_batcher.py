@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+
+class TestMetadataBatcher(unittest.TestCase):
+    def test_webhooks_in_one_window_are_resolved_with_one_lookup(self):
+        from modules.webhooks import metadata_batcher
+        from modules.webhooks.metadata_batcher import MetadataBatcher
+        from modules.webhooks.plex import PlexWebhook
+
+        config = mock.MagicMock()
+        resolved = []
+        batcher = MetadataBatcher(on_resolved=lambda webhook, movie, _, __: resolved.append((webhook, movie)),
+                                  window_seconds=60)
+
+        webhooks = [PlexWebhook(event="library.new", user=True, owner=True,
+                                Metadata={"type": "movie", "key": f"/library/metadata/{rating_key}"})
+                    for rating_key in (1, 2, 3)]
+
+        with mock.patch.object(metadata_batcher, "PlexConnector") as plex_connector_class:
+            plex_connector_class.return_value.get_movies.return_value = {"1": "movie 1", "3": "movie 3"}
+            for webhook in webhooks:
+                self.assertTrue(batcher.add(webhook=webhook, config=config, output_dir="renders", max_pending=3))
+            # Waiting webhooks count towards the limit
+            self.assertFalse(batcher.add(webhook=webhooks[0], config=config, output_dir="renders", max_pending=3))
+            batcher.flush()
+
+            plex_connector_class.return_value.get_movies.assert_called_once_with(rating_keys=["1", "2", "3"])
+
+        self.assertEqual(resolved, [(webhooks[0], "movie 1"), (webhooks[1], None), (webhooks[2], "movie 3")])
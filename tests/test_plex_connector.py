@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+
+class TestPlexClientManager(unittest.TestCase):
+    def test_connection_is_shared_and_replaced_after_connection_error(self):
+        import requests
+
+        from modules import plex_connector
+        from modules.plex_connector import PlexClientManager, PlexConnector
+
+        with mock.patch.object(plex_connector, "PlexServer") as plex_server_class, \
+                mock.patch.object(plex_connector, "_client_manager", PlexClientManager()):
+            first = PlexConnector(host="http://localhost:32400", token="token")
+            second = PlexConnector(host="http://localhost:32400", token="token")
+            self.assertEqual(plex_server_class.call_count, 1)
+
+            broken_server = plex_server_class.return_value
+            broken_server.fetchItem.side_effect = requests.exceptions.ConnectionError("Connection reset")
+            plex_server_class.return_value = mock.MagicMock()
+            plex_server_class.return_value.fetchItem.return_value = "movie"
+
+            self.assertEqual(first.get_movie(item_key="/library/metadata/1"), "movie")
+            self.assertEqual(plex_server_class.call_count, 2)
+            broken_server._session.close.assert_called_once()
+
+            # The other connector still holds the broken connection, and picks up the replacement rather than
+            # making a third one
+            self.assertEqual(second.get_movie(item_key="/library/metadata/1"), "movie")
+            self.assertEqual(plex_server_class.call_count, 2)
+
+
+class TestPreRollUpdate(unittest.TestCase):
+    def test_setting_is_read_once_and_only_saved_if_changed(self):
+        from modules import plex_connector
+        from modules.plex_connector import PlexClientManager, PlexConnector
+
+        with mock.patch.object(plex_connector, "PlexServer") as plex_server_class, \
+                mock.patch.object(plex_connector, "_client_manager", PlexClientManager()), \
+                mock.patch.object(plex_connector, "Settings") as settings_class:
+            setting = settings_class.return_value.get.return_value
+            setting.value = "/a.mp4;/b.mp4"
+            connector = PlexConnector(host="http://localhost:32400", token="token")
+
+            self.assertTrue(connector.update_pre_roll_paths(paths=["/a.mp4", "/b.mp4"]))
+            settings_class.return_value.save.assert_not_called()
+
+            self.assertTrue(connector.update_pre_roll_paths(paths=["/c.mp4"]))
+            setting.set.assert_called_once_with("/c.mp4")
+            settings_class.return_value.save.assert_called_once()
+
+            # One settings request per update, the value compared against is the one saved
+            self.assertEqual(plex_server_class.return_value.query.call_count, 2)
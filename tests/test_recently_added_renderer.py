@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+class TestAssetRetrieval(unittest.TestCase):
+    def _renderer(self):
+        from modules.renderers.recently_added import RecentlyAddedPrerollRenderer
+
+        movie = mock.MagicMock(title="Movie", year=2020, duration=0, summary="", rating=None, audienceRating=None)
+        return RecentlyAddedPrerollRenderer(render_folder="renders", movie=movie)
+
+    def test_assets_are_retrieved_at_the_same_time(self):
+        renderer = self._renderer()
+        barrier = threading.Barrier(3, timeout=5)  # Only passes if all three stages run at once
+
+        def stage(result):
+            barrier.wait()
+            return result
+
+        with mock.patch.object(renderer, "_get_trailer", side_effect=lambda config: stage("video.webm")), \
+                mock.patch.object(renderer, "_get_background_music", side_effect=lambda config: stage("audio.webm")), \
+                mock.patch.object(renderer, "_get_movie_poster", side_effect=lambda: stage("poster.jpg")):
+            self.assertEqual(renderer._retrieve_assets(config=None), ("video.webm", "audio.webm", "poster.jpg"))
+
+    def test_failed_or_slow_stage_cancels_the_others(self):
+        from modules.renderers import recently_added
+
+        renderer = self._renderer()
+        music_cancelled = threading.Event()
+
+        def slow_music(config):
+            while not renderer._cancelled.is_set():
+                time.sleep(0.01)
+            music_cancelled.set()
+
+        def failing_trailer(config):
+            raise RuntimeError("No trailer found")
+
+        with mock.patch.object(renderer, "_get_trailer", side_effect=failing_trailer), \
+                mock.patch.object(renderer, "_get_background_music", side_effect=slow_music), \
+                mock.patch.object(renderer, "_get_movie_poster", return_value="poster.jpg"):
+            with self.assertRaisesRegex(RuntimeError, "No trailer found"):
+                renderer._retrieve_assets(config=None)
+        # The other stages have stopped by the time the error is raised, before the asset folder is cleaned up
+        self.assertTrue(music_cancelled.is_set())
+
+        renderer = self._renderer()
+        with mock.patch.object(recently_added, "BACKGROUND_MUSIC_TIMEOUT_SECONDS", 0.2), \
+                mock.patch.object(renderer, "_get_trailer", return_value="video.webm"), \
+                mock.patch.object(renderer, "_get_background_music",
+                                  side_effect=lambda config: renderer._cancelled.wait(timeout=5)), \
+                mock.patch.object(renderer, "_get_movie_poster", return_value="poster.jpg"):
+            with self.assertRaises(TimeoutError):
+                renderer._retrieve_assets(config=None)
+        self.assertTrue(renderer._cancelled.is_set())
+
+    def test_error_page_is_not_saved_as_poster(self):
+        import os
+        import tempfile
+        import requests
+
+        renderer = self._renderer()
+        renderer.movie_poster_url = "http://plex/poster"
+        error_page = requests.Response()
+        error_page.status_code = 404
+        error_page.headers["Content-Type"] = "text/html"
+        with tempfile.TemporaryDirectory() as directory:
+            renderer.download_folder = directory
+            with mock.patch.object(requests, "get", return_value=error_page):
+                with self.assertRaises(requests.HTTPError):
+                    renderer._get_movie_poster()
+
+            error_page.status_code = 200
+            with mock.patch.object(requests, "get", return_value=error_page):
+                with self.assertRaises(ValueError):
+                    renderer._get_movie_poster()
+
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_background_music_is_trimmed_and_faded_in_the_render_graph(self):
+        import ffmpeg
+
+        from modules import ffmpeg_utils
+
+        audio = ffmpeg_utils.trim_and_fade_audio_stream(audio_file_path="audio.webm", length_seconds=33.5,
+                                                        fade_in_length=0.5, fade_out_length=2)
+        video = ffmpeg.input("video.webm", ss=10, t=33.5)
+        arguments = ffmpeg.output(audio, video, "preroll.mp4").get_args()
+
+        # A single ffmpeg process reads the downloaded audio and writes no intermediate audio file
+        self.assertEqual([argument for argument in arguments if argument.endswith((".webm", ".mp3", ".mp4"))],
+                         ["audio.webm", "video.webm", "preroll.mp4"])
+        filter_graph = arguments[arguments.index("-filter_complex") + 1]
+        self.assertIn("afade=d=0.5:st=0:t=in", filter_graph)
+        self.assertIn("afade=d=2:st=31.5:t=out", filter_graph)
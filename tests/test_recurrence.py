@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime, date
+
+
+class TestRecurrence(unittest.TestCase):
+    def test_fixed_date_range(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date=date(2020, 1, 1), end_date=date(2020, 1, 2))
+
+        self.assertTrue(recurrence.is_active_at(datetime(2020, 1, 2, 23, 59, 59)))
+        self.assertFalse(recurrence.is_active_at(datetime(2020, 1, 3)))
+        self.assertIsNone(recurrence.next_start_after(datetime(2020, 1, 1)))
+        self.assertEqual(recurrence.window_at(datetime(2019, 6, 1)),
+                         (datetime(2020, 1, 1), datetime(2020, 1, 2, 23, 59, 59)))
+
+    def test_yaml_datetime_keeps_time(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date=datetime(2024, 1, 1, 8), end_date=datetime(2024, 1, 1, 9, 30))
+
+        self.assertFalse(recurrence.is_active_at(datetime(2024, 1, 1, 10)))
+        self.assertTrue(recurrence.is_active_at(datetime(2024, 1, 1, 9)))
+
+    def test_daily_time_range(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date="xxxx-xx-xx 08:00:00", end_date="xxxx-xx-xx 09:30:00")
+
+        self.assertTrue(recurrence.is_active_at(datetime(2024, 12, 31, 8, 30)))
+        self.assertFalse(recurrence.is_active_at(datetime(2024, 12, 31, 10)))
+        self.assertEqual(recurrence.next_start_after(datetime(2024, 12, 31, 10)), datetime(2025, 1, 1, 8))
+        self.assertEqual(recurrence.next_end_after(datetime(2024, 12, 31, 8, 30)), datetime(2024, 12, 31, 9, 30))
+
+    def test_daily_time_range_across_midnight(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date="xxxx-xx-xx 22:00:00", end_date="xxxx-xx-xx 02:00:00")
+
+        self.assertTrue(recurrence.is_active_at(datetime(2024, 12, 31, 23)))
+        self.assertTrue(recurrence.is_active_at(datetime(2025, 1, 1, 1)))
+        self.assertFalse(recurrence.is_active_at(datetime(2025, 1, 1, 3)))
+
+    def test_yearly_range_across_new_year(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date="xxxx-12-25", end_date="xxxx-01-05")
+
+        self.assertTrue(recurrence.is_active_at(datetime(2024, 12, 31)))
+        self.assertTrue(recurrence.is_active_at(datetime(2025, 1, 3)))
+        self.assertFalse(recurrence.is_active_at(datetime(2025, 1, 6)))
+        self.assertEqual(recurrence.window_at(datetime(2025, 1, 3)),
+                         (datetime(2024, 12, 25), datetime(2025, 1, 5, 23, 59, 59)))
+
+    def test_monthly_range_across_month_end(self):
+        from modules.recurrence import compile_date_range
+
+        recurrence = compile_date_range(start_date="xxxx-xx-31", end_date="xxxx-xx-01")
+
+        # December rolls over into January of the next year
+        self.assertTrue(recurrence.is_active_at(datetime(2025, 1, 1, 12)))
+        # The 31st is clamped to the last day of shorter months
+        self.assertTrue(recurrence.is_active_at(datetime(2024, 4, 30, 12)))
+        self.assertFalse(recurrence.is_active_at(datetime(2025, 1, 2)))
+        self.assertEqual(recurrence.next_start_after(datetime(2025, 1, 2)), datetime(2025, 1, 31))
+
+    def test_invalid_ranges(self):
+        from modules.recurrence import compile_date_range
+
+        self.assertIsNone(compile_date_range(start_date="xxxx-01-01", end_date="2024-01-01"))
+        self.assertIsNone(compile_date_range(start_date="2024-01-02", end_date="2024-01-01"))
+        self.assertIsNone(compile_date_range(start_date="2024-13-01", end_date="2024-13-02"))
+        self.assertIsNone(compile_date_range(start_date=None, end_date="2024-01-01"))
@@ -0,0 +1,149 @@
+import threading
+import time
+import unittest
+
+
+class TestRenderQueue(unittest.TestCase):
+    def test_jobs_run_on_bounded_workers_and_full_queue_rejects(self):
+        from modules.webhooks.render_queue import RenderJobState, RenderQueue
+
+        release = threading.Event()
+        started = threading.Event()
+        finished = threading.Event()
+
+        def blocking_task(job):
+            started.set()
+            release.wait(timeout=5)
+
+        def failing_task(job):
+            job.set_state(RenderJobState.RENDERING)
+            finished.set()
+            raise RuntimeError("ffmpeg failed")
+
+        render_queue = RenderQueue(worker_count=1, max_queue_depth=1)
+        running = render_queue.submit(title="Running", task=blocking_task)
+        self.assertTrue(started.wait(timeout=5))
+
+        queued = render_queue.submit(title="Queued", task=failing_task)
+        self.assertEqual(queued.state, RenderJobState.QUEUED)
+        self.assertTrue(render_queue.is_full)
+        self.assertIsNone(render_queue.submit(title="Rejected", task=blocking_task))
+        self.assertEqual(running.state, RenderJobState.DOWNLOADING)
+
+        release.set()
+        self.assertTrue(finished.wait(timeout=5))
+        for _ in range(50):
+            if queued.is_finished:
+                break
+            time.sleep(0.1)
+
+        self.assertEqual(running.state, RenderJobState.DONE)
+        self.assertEqual(queued.state, RenderJobState.FAILED)
+        self.assertEqual(queued.error, "ffmpeg failed")
+        self.assertEqual([job["title"] for job in render_queue.status["jobs"]], ["Running", "Queued"])
+
+    def test_only_jobs_that_would_be_retained_are_run_newest_first(self):
+        from modules.webhooks.render_queue import RenderJobState, RenderQueue
+
+        release = threading.Event()
+        started = threading.Event()
+        order = []
+
+        def blocking_task(job):
+            started.set()
+            release.wait(timeout=5)
+
+        render_queue = RenderQueue(worker_count=1, max_queue_depth=10, retain_count=3)
+        render_queue.submit(title="Running", task=blocking_task, priority=100)
+        self.assertTrue(started.wait(timeout=5))
+
+        jobs = [render_queue.submit(title=f"Added {added_at}", task=lambda job: order.append(job.priority),
+                                    priority=added_at)
+                for added_at in (1, 5, 2, 4, 3)]
+
+        self.assertEqual([job.state for job in jobs],
+                         [RenderJobState.SKIPPED, RenderJobState.QUEUED, RenderJobState.SKIPPED,
+                          RenderJobState.QUEUED, RenderJobState.SKIPPED])
+
+        release.set()
+        for _ in range(50):
+            if all(job.is_finished for job in jobs):
+                break
+            time.sleep(0.1)
+
+        self.assertEqual(order, [5, 4])
+
+    def test_skipped_job_is_not_queued(self):
+        from unittest import mock
+
+        from modules.webhooks import render_queue as render_queue_module
+        from modules.webhooks.render_queue import RenderJobState, RenderQueue
+
+        render_queue = RenderQueue(worker_count=0, max_queue_depth=10, retain_count=1)
+        render_queue.submit(title="Newer", task=lambda job: None, priority=2)
+        with mock.patch.object(render_queue_module.logging, "info") as log_info:
+            job = render_queue.submit(title="Older", task=lambda job: None, priority=1)
+
+        self.assertEqual(job.state, RenderJobState.SKIPPED)
+        self.assertEqual(render_queue.status["queue_depth"], 1)
+        self.assertFalse(any("Queued render job" in call.args[0] for call in log_info.call_args_list))
+
+    def test_unfinished_jobs_are_stored_until_they_finish(self):
+        import os
+        import tempfile
+
+        from modules.webhooks.render_job_store import RenderJobStore
+        from modules.webhooks.render_queue import RenderJobState, RenderQueue
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = RenderJobStore(database_path=os.path.join(directory, "render_jobs.db"))
+            release = threading.Event()
+            started = threading.Event()
+
+            def blocking_task(job):
+                started.set()
+                release.wait(timeout=5)
+
+            render_queue = RenderQueue(worker_count=1, max_queue_depth=10, store=store)
+            running = render_queue.submit(title="Running", task=blocking_task, key="1", payload="{}")
+            self.assertTrue(started.wait(timeout=5))
+            queued = render_queue.submit(title="Queued", task=lambda job: None, key="2", payload="{}")
+
+            # Submitting a movie again while it is unfinished does not queue it twice
+            self.assertIs(render_queue.submit(title="Queued", task=lambda job: None, key="2", payload="{}"), queued)
+
+            # As a restarted process would see them
+            reopened_store = RenderJobStore(database_path=os.path.join(directory, "render_jobs.db"))
+            self.assertEqual({(job.key, job.state) for job in reopened_store.all()},
+                             {("1", RenderJobState.DOWNLOADING.value), ("2", RenderJobState.QUEUED.value)})
+
+            release.set()
+            for _ in range(50):
+                if queued.is_finished:
+                    break
+                time.sleep(0.1)
+
+            self.assertEqual(reopened_store.all(), [])
+            reopened_store.close()
+            store.close()
+
+    def test_shutdown_waits_for_running_jobs_and_leaves_waiting_jobs_queued(self):
+        from modules.webhooks.render_queue import RenderJobState, RenderQueue
+
+        started = threading.Event()
+
+        def slow_task(job):
+            started.set()
+            time.sleep(0.3)
+
+        render_queue = RenderQueue(worker_count=1, max_queue_depth=10)
+        running = render_queue.submit(title="Running", task=slow_task)
+        self.assertTrue(started.wait(timeout=5))
+        waiting = render_queue.submit(title="Waiting", task=slow_task)
+
+        self.assertTrue(render_queue.shutdown(timeout=5))
+        render_queue.configure(worker_count=1, max_queue_depth=10)  # e.g. a webhook arriving during shutdown
+        time.sleep(0.1)
+
+        self.assertEqual(running.state, RenderJobState.DONE)
+        self.assertEqual(waiting.state, RenderJobState.QUEUED)
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+CONFIG = """
+plex:
+  url: http://localhost:32400
+  token: token
+always:
+  enabled: true
+  paths:
+    - "/always/1.mp4"
+    - "/always/2.mp4"
+date_range:
+  enabled: true
+  ranges:
+    - name: "Morning"
+      start_date: "2024-01-01 08:00:00"
+      end_date: "2024-01-01 09:30:00"
+      paths:
+        - "/morning/1.mp4"
+      weight: 2
+    - name: "New Years"
+      start_date: 2024-01-01
+      end_date: 2024-01-01
+      paths:
+        - "/new_years/1.mp4"
+      disable_always: true
+monthly:
+  enabled: true
+  months:
+    - number: 3
+      paths:
+        - "/march/1.mp4"
+advanced:
+  auto_generation:
+    recently_added:
+      enabled: false
+"""
+
+
+def _make_config():
+    from modules.config_parser import Config
+
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as config_file:
+        config_file.write(CONFIG)
+
+    try:
+        return Config(app_name="Plex Prerolls Tests", config_path=config_file.name)
+    finally:
+        os.remove(config_file.name)
+
+
+class TestScheduleManager(unittest.TestCase):
+    def test_evaluate_at_explicit_time(self):
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 1, 8, 30, 0))
+        evaluation = schedule_manager.evaluation
+
+        self.assertEqual(evaluation.evaluated_at, datetime(2024, 1, 1, 8, 30, 0))
+        self.assertEqual(len(evaluation.date_range_schedules), 2)
+        self.assertTrue(evaluation.disable_always)
+        self.assertEqual(evaluation.always_schedules, ())
+        self.assertEqual(sorted(evaluation.paths), ["/morning/1.mp4", "/morning/1.mp4", "/new_years/1.mp4"])
+        self.assertEqual(schedule_manager.valid_schedule_count, 2)
+
+    def test_evaluate_outside_of_date_ranges(self):
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 2, 8, 30, 0))
+        evaluation = schedule_manager.evaluation
+
+        self.assertEqual(evaluation.date_range_schedules, ())
+        self.assertFalse(evaluation.disable_always)
+        self.assertEqual(len(evaluation.always_schedules), 1)
+        self.assertEqual(sorted(evaluation.paths), ["/always/1.mp4", "/always/2.mp4"])
+
+    def test_evaluations_are_independent(self):
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 1, 8, 30, 0))
+        later = schedule_manager.evaluate(at=datetime(2024, 1, 1, 10, 0, 0))
+
+        self.assertEqual(len(later.date_range_schedules), 1)
+        self.assertEqual(len(schedule_manager.evaluation.date_range_schedules), 2)
+
+    def test_inactive_schedules_are_not_resolved(self):
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 1, 10, 0, 0))
+        morning, new_years = schedule_manager.date_range_schedules
+
+        self.assertIsNone(morning.path_source._paths)
+        self.assertEqual(new_years.path_source._paths, ["/new_years/1.mp4"])
+
+    def test_weighted_paths_are_compacted(self):
+        from modules.models import schedule_entry_from_auto_generated
+        from modules.schedule_manager import _weighted_paths
+
+        christmas = schedule_entry_from_auto_generated(name="Christmas", paths=["/a.mp4", "/b.mp4"], weight=10)
+        winter = schedule_entry_from_auto_generated(name="Winter", paths=["/b.mp4", "/c.mp4"], weight=20)
+
+        # a: 10, b: 30, c: 20 copies, reduced by their common divisor of 10
+        self.assertEqual(_weighted_paths(schedules=(christmas, winter)),
+                         ("/a.mp4", "/b.mp4", "/b.mp4", "/b.mp4", "/c.mp4", "/c.mp4"))
+
+    def test_budgeted_paths_fit_and_keep_schedule_odds(self):
+        from modules.models import schedule_entry_from_auto_generated
+        from modules.schedule_manager import _budgeted_paths
+
+        light = schedule_entry_from_auto_generated(name="Light", paths=[f"/light/{i:03}.mp4" for i in range(100)],
+                                                   weight=1)
+        heavy = schedule_entry_from_auto_generated(name="Heavy", paths=[f"/heavy/{i:03}.mp4" for i in range(100)],
+                                                   weight=3)
+        tiny = schedule_entry_from_auto_generated(name="Tiny", paths=["/tiny.mp4"], weight=1)
+
+        paths = _budgeted_paths(schedules=(light, heavy, tiny), max_length=600)
+
+        self.assertLessEqual(len(";".join(paths)), 600)
+        light_count = len([path for path in paths if path.startswith("/light/")])
+        heavy_count = len([path for path in paths if path.startswith("/heavy/")])
+        self.assertAlmostEqual(heavy_count / light_count, 3, delta=0.5)
+        self.assertIn("/tiny.mp4", paths)
+
+        self.assertEqual(_budgeted_paths(schedules=(tiny,), max_length=600), ("/tiny.mp4",))
+
+    def test_next_transition_with_always_and_auto_generated_schedules(self):
+        from modules.models import schedule_entry_from_auto_generated
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 1, 8, 30, 0))
+        schedule_manager.auto_generated_schedules.append(
+            schedule_entry_from_auto_generated(name="Recently Added", paths=["/recently_added/1.mp4"], weight=1))
+
+        # Always schedules never end, only the end of the morning range is upcoming
+        self.assertEqual(schedule_manager.next_transition(after=datetime(2024, 1, 1, 8, 30, 0)),
+                         datetime(2024, 1, 1, 9, 30, 1))
+
+    def test_evaluate_far_from_parse_time(self):
+        from modules.schedule_manager import ScheduleManager
+
+        schedule_manager = ScheduleManager(config=_make_config(), at=datetime(2024, 1, 1, 8, 30, 0))
+
+        # Monthly schedules were parsed in 2024, but recur every year
+        evaluation = schedule_manager.evaluate(at=datetime(2026, 3, 15, 12, 0, 0))
+        march, = evaluation.monthly_schedules
+        self.assertEqual(march.start_date, datetime(2026, 3, 1))
+        self.assertEqual(schedule_manager.evaluate(at=datetime(2026, 4, 15, 12, 0, 0)).monthly_schedules, ())
+        self.assertEqual(schedule_manager.next_transition(after=datetime(2026, 4, 15, 12, 0, 0)),
+                         datetime(2027, 3, 1))
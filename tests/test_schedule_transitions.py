@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime
+
+
+class TestScheduleTransitions(unittest.TestCase):
+    def test_next_transition_before_start(self):
+        from modules.models import ScheduleEntry, ScheduleType
+
+        schedule_entry = ScheduleEntry(type=ScheduleType.date_range.value,
+                                       start_date=datetime(2024, 1, 1, 8, 0, 0),
+                                       end_date=datetime(2024, 1, 1, 9, 30, 0),
+                                       path_source=[],
+                                       weight=1,
+                                       name_prefix="Morning")
+
+        self.assertEqual(schedule_entry.next_transition(after=datetime(2024, 1, 1, 7, 59, 0)),
+                         datetime(2024, 1, 1, 8, 0, 0))
+
+    def test_next_transition_while_active(self):
+        from modules.models import ScheduleEntry, ScheduleType
+
+        schedule_entry = ScheduleEntry(type=ScheduleType.date_range.value,
+                                       start_date=datetime(2024, 1, 1, 8, 0, 0),
+                                       end_date=datetime(2024, 1, 1, 9, 30, 0),
+                                       path_source=[],
+                                       weight=1,
+                                       name_prefix="Morning")
+
+        # End date is inclusive, entry becomes inactive one second after it
+        self.assertEqual(schedule_entry.next_transition(after=datetime(2024, 1, 1, 8, 0, 0)),
+                         datetime(2024, 1, 1, 9, 30, 1))
+
+    def test_next_transition_after_end(self):
+        from modules.models import ScheduleEntry, ScheduleType
+
+        schedule_entry = ScheduleEntry(type=ScheduleType.date_range.value,
+                                       start_date=datetime(2024, 1, 1, 8, 0, 0),
+                                       end_date=datetime(2024, 1, 1, 9, 30, 0),
+                                       path_source=[],
+                                       weight=1,
+                                       name_prefix="Morning")
+
+        self.assertIsNone(schedule_entry.next_transition(after=datetime(2024, 1, 1, 9, 31, 0)))
+
+    def test_recurring_entry_follows_its_recurrence(self):
+        from modules.config_parser import FloatingHolidayConfig
+        from modules.models import schedule_entry_from_date_range
+
+        schedule_entry = schedule_entry_from_date_range(start_date_string="xxxx-xx-xx 08:00:00",
+                                                        end_date_string="xxxx-xx-xx 09:30:00",
+                                                        holiday=FloatingHolidayConfig(data={}),
+                                                        paths=[],
+                                                        weight=1,
+                                                        name="Morning",
+                                                        at=datetime(2024, 1, 1, 8, 0, 0))
+
+        # Not only in the window it was created in, but in every later one too
+        self.assertTrue(schedule_entry.is_active_at(moment=datetime(2024, 1, 5, 8, 30, 0)))
+        self.assertFalse(schedule_entry.is_active_at(moment=datetime(2024, 1, 5, 10, 0, 0)))
+        self.assertEqual(schedule_entry.next_transition(after=datetime(2024, 1, 5, 7, 0, 0)),
+                         datetime(2024, 1, 5, 8, 0, 0))
+        self.assertEqual(schedule_entry.next_transition(after=datetime(2024, 1, 5, 8, 30, 0)),
+                         datetime(2024, 1, 5, 9, 30, 1))
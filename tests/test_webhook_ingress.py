@@ -0,0 +1,54 @@
+import json
+import unittest
+
+
+class TestWebhookFilter(unittest.TestCase):
+    def test_only_new_movies_are_parsed(self):
+        from modules.webhooks.ingress import WebhookFilter
+
+        webhook_filter = WebhookFilter(event="library.new", metadata_type="movie")
+
+        def payload(event: str, metadata_type: str, title: str = "Title") -> str:
+            return json.dumps({"event": event, "user": True, "owner": True,
+                               "Metadata": {"type": metadata_type, "title": title, "key": "/library/metadata/1"}})
+
+        self.assertIsNone(webhook_filter.accept(payload=payload(event="media.play", metadata_type="movie",
+                                                                title='Not "event": "library.new"')))
+        self.assertIsNone(webhook_filter.accept(payload=payload(event="library.new", metadata_type="episode")))
+        self.assertIsNone(webhook_filter.accept(payload='{"event": "library.new", "Metadata": {"type": "movie"}}'))
+        webhook = webhook_filter.accept(payload=payload(event="library.new", metadata_type="movie"))
+
+        self.assertEqual(webhook.rating_key, "1")
+        self.assertEqual(webhook_filter.counts, {"accepted": 1, "dropped_event": 1, "dropped_type": 1,
+                                                 "dropped_invalid": 1, "dropped": 3})
+
+
+class TestReadFormField(unittest.TestCase):
+    def _request(self, body: bytes, content_type: str):
+        from werkzeug.test import EnvironBuilder
+        from werkzeug.wrappers import Request
+
+        return Request(EnvironBuilder(method="POST", data=body, content_type=content_type).get_environ())
+
+    def test_payload_is_read_without_the_thumbnail(self):
+        from werkzeug.exceptions import RequestEntityTooLarge
+
+        from modules.webhooks.ingress import read_form_field
+
+        thumbnail = b"\xff\xd8" + b"\0" * 100_000
+        body = (b'--boundary\r\nContent-Disposition: form-data; name="payload"\r\n\r\n{"event": "library.new"}\r\n'
+                b'--boundary\r\nContent-Disposition: form-data; name="thumb"; filename="thumb.jpg"\r\n'
+                b'Content-Type: image/jpeg\r\n\r\n' + thumbnail + b'\r\n--boundary--\r\n')
+        content_type = "multipart/form-data; boundary=boundary"
+
+        request = self._request(body=body, content_type=content_type)
+        self.assertEqual(read_form_field(request=request, field_name="payload", max_body_size=len(body)),
+                         '{"event": "library.new"}')
+
+        # The thumbnail is skipped over while looking for the field
+        request = self._request(body=body, content_type=content_type)
+        self.assertIsNone(read_form_field(request=request, field_name="missing", max_body_size=len(body)))
+
+        with self.assertRaises(RequestEntityTooLarge):
+            read_form_field(request=self._request(body=body, content_type=content_type), field_name="payload",
+                            max_body_size=len(body) - 1)